@@ -7,8 +7,9 @@ from pydantic import ValidationError
 from app.crud import user as crud_user
 from app.db import get_session
 from app.models import User
-from app.schemas.jwt import TokenData
-from app.security import verify_password, decode_access_token
+from app.schemas.jwt import TokenData, TokenClaims
+from app.schemas.user import Principal
+from app.security import verify_password_async, decode_access_token
 from app.config import settings
 
 # Схема OAuth2, указывает URL для получения токена
@@ -29,32 +30,53 @@ async def authenticate_user(
     user = await crud_user.get_user_by_username(db, username=username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
 
-async def _get_user_from_token(db: AsyncSession, token: str) -> User:
-    """
-    Вспомогательная функция для декодирования токена и получения пользователя.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception(www_authenticate: str = "Bearer") -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
-        headers={"WWW-Authenticate": "Bearer"},
+        headers={"WWW-Authenticate": www_authenticate},
     )
+
+
+def _decode_token(token: str) -> dict:
+    """
+    Вспомогательная функция для декодирования токена и проверки обязательного claim "sub".
+    """
+    credentials_exception = _credentials_exception()
     try:
         payload = decode_access_token(token)
         username: str | None = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
+        TokenData(username=username)
     except (JWTError, ValidationError):
         raise credentials_exception
+    return payload
 
-    user = await crud_user.get_user_by_username(db, username=token_data.username)
-    if user is None:
-        raise credentials_exception
+
+def _check_token_version(payload: dict, token_version: int | None) -> None:
+    """
+    Отклоняет токен, если пользователь удален или его токены были отозваны.
+    Токены старого формата (без claim "ver") проверяются только по существованию пользователя.
+    """
+    if token_version is None:
+        raise _credentials_exception()
+    if "ver" in payload and payload["ver"] != token_version:
+        raise _credentials_exception()
+
+
+async def _get_user_from_token(db: AsyncSession, token: str) -> User:
+    """
+    Вспомогательная функция для декодирования токена и получения пользователя.
+    """
+    payload = _decode_token(token)
+    user = await crud_user.get_user_by_username(db, username=payload["sub"])
+    _check_token_version(payload, user.token_version if user else None)
     return user
 
 
@@ -73,39 +95,135 @@ async def get_current_user(
     return await _get_user_from_token(db, token)
 
 
-async def get_user_by_token_or_telegram_id(
+async def _get_principal_from_telegram_header(db: AsyncSession, telegram_id_str: str) -> Principal:
+    try:
+        telegram_id = int(telegram_id_str)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Неверный формат X-Telegram-User-ID.")
+    principal = await crud_user.get_principal_by_telegram_id(db, telegram_id=telegram_id)
+    if principal is None:
+        # Если заголовок есть, но юзер не найден - это ошибка.
+        raise HTTPException(status_code=404, detail="Пользователь с указанным Telegram ID не найден.")
+    return principal
+
+
+async def _get_principal_from_payload(db: AsyncSession, payload: dict) -> Principal:
+    principal = await crud_user.get_principal_by_username(db, username=payload["sub"])
+    _check_token_version(payload, principal.token_version if principal else None)
+    return principal
+
+
+async def get_current_principal(
     request: Request,
     db: AsyncSession = Depends(get_session),
-) -> User:
+) -> Principal:
     """
-    Универсальная зависимость для получения пользователя:
+    Универсальная зависимость для получения идентификационных данных пользователя:
     1. По заголовку X-Telegram-User-ID.
     2. По JWT токену в заголовке Authorization.
+
+    Загружает только колонки из PRINCIPAL_COLUMNS, без профиля и связей.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Не удалось проверить учетные данные",
-        headers={"WWW-Authenticate": 'Bearer, "X-Telegram-User-ID"'},
-    )
-    
     telegram_id_str = request.headers.get("X-Telegram-User-ID")
 
     # Приоритет отдается аутентификации по Telegram ID, если заголовок присутствует
     if telegram_id_str:
-        try:
-            telegram_id = int(telegram_id_str)
-            user = await crud_user.get_user_by_telegram_id(db, telegram_id=telegram_id)
-            if user:
-                return user
-            else:
-                # Если заголовок есть, но юзер не найден - это ошибка.
-                raise HTTPException(status_code=404, detail="Пользователь с указанным Telegram ID не найден.")
-        except (ValueError, TypeError):
-            raise HTTPException(status_code=400, detail="Неверный формат X-Telegram-User-ID.")
-    
-    # Если заголовка нет, пробуем аутентификацию по токену
-    token = await oauth2_scheme(request)
+        principal = await _get_principal_from_telegram_header(db, telegram_id_str)
+    else:
+        # Если заголовка нет, пробуем аутентификацию по токену
+        token = await oauth2_scheme(request)
+        if token is None:
+            raise _credentials_exception('Bearer, "X-Telegram-User-ID"')
+        principal = await _get_principal_from_payload(db, _decode_token(token))
+
+    # Ключ read-your-writes (app/db.py): один для всех клиентов пользователя
+    request.state.user_id = principal.id
+    return principal
+
+
+async def get_current_claims(
+    request: Request,
+    db: AsyncSession = Depends(get_session),
+) -> TokenClaims:
+    """
+    Зависимость для маршрутов, которым нужен только ID пользователя.
+
+    Для JWT с claim "uid" пользователь из БД не загружается: проверяется только
+    версия токенов (из кэша). Запросы бота используют кэш telegram_id -> Principal,
+    токены старого формата проходят обычную загрузку Principal.
+    """
+    telegram_id_str = request.headers.get("X-Telegram-User-ID")
+    if telegram_id_str:
+        principal = await _get_principal_from_telegram_header(db, telegram_id_str)
+    else:
+        token = await oauth2_scheme(request)
+        if token is None:
+            raise _credentials_exception('Bearer, "X-Telegram-User-ID"')
+        payload = _decode_token(token)
+
+        user_id = payload.get("uid")
+        if user_id is not None:
+            token_version = await crud_user.get_token_version(db, user_id)
+            _check_token_version(payload, token_version)
+            request.state.user_id = user_id
+            return TokenClaims(user_id=user_id, username=payload["sub"], token_version=token_version)
+
+        principal = await _get_principal_from_payload(db, payload)
+
+    request.state.user_id = principal.id
+    return TokenClaims(user_id=principal.id, username=principal.username, token_version=principal.token_version)
+
+
+async def get_current_token_claims(
+    request: Request,
+    token: str | None = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_session),
+) -> TokenClaims:
+    """
+    Как get_current_claims, но только для JWT нового формата (claims "uid" и "ver"):
+    для операций над токенами самого пользователя (POST /auth/logout-all).
+    Отозванный токен отклоняется проверкой версии.
+    """
     if token is None:
-        raise credentials_exception
-        
-    return await _get_user_from_token(db, token)
+        raise _credentials_exception()
+    payload = _decode_token(token)
+    user_id = payload.get("uid")
+    if user_id is None or "ver" not in payload:
+        raise _credentials_exception()
+    token_version = await crud_user.get_token_version(db, user_id)
+    _check_token_version(payload, token_version)
+    request.state.user_id = user_id
+    return TokenClaims(user_id=user_id, username=payload["sub"], token_version=token_version)
+
+
+def get_current_user_with(*relationships: str):
+    """
+    Фабрика зависимостей: возвращает модель текущего пользователя,
+    загружая только перечисленные связи (например, "preferences").
+
+    Пример: ``current_user: User = Depends(get_current_user_with("preferences"))``
+    """
+    async def dependency(
+        principal: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_session),
+    ) -> User:
+        user = await crud_user.get_user_with_relationships(db, principal.id, relationships)
+        if user is None:
+            raise _credentials_exception()
+        return user
+
+    return dependency
+
+
+async def get_user_by_token_or_telegram_id(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_session),
+) -> User:
+    """
+    Зависимость для получения модели текущего пользователя с профилем, но без связей.
+    Для маршрутов, которым нужен только ID, используйте get_current_principal.
+    """
+    user = await crud_user.get_user_with_relationships(db, principal.id)
+    if user is None:
+        raise _credentials_exception()
+    return user
@@ -4,10 +4,49 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Профили пула соединений. Любой параметр можно переопределить одноименной переменной окружения.
+DB_POOL_PROFILES = {
+    "default": {
+        "DB_POOL_SIZE": 5,
+        "DB_MAX_OVERFLOW": 10,
+        "DB_POOL_TIMEOUT": 30,
+        "DB_POOL_RECYCLE": -1,
+        "DB_POOL_PRE_PING": True,
+        "DB_STATEMENT_CACHE_SIZE": 100,
+        "DB_PREPARED_STATEMENT_CACHE_SIZE": 100,
+    },
+    # Для production: пул рассчитан на один воркер uvicorn (итого соединений на под:
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)), вместо pre-ping на каждом checkout
+    # соединения пересоздаются по DB_POOL_RECYCLE.
+    "production": {
+        "DB_POOL_SIZE": 10,
+        "DB_MAX_OVERFLOW": 5,
+        "DB_POOL_TIMEOUT": 10,
+        "DB_POOL_RECYCLE": 1800,
+        "DB_POOL_PRE_PING": False,
+        "DB_STATEMENT_CACHE_SIZE": 500,
+        "DB_PREPARED_STATEMENT_CACHE_SIZE": 500,
+    },
+}
+
+
 class Settings:
     # --- App ---
     PROJECT_NAME: str = "Pro100 Gym"
     DEBUG: bool = os.getenv("DEBUG", "false").lower() in ("true", "1", "t")
+    # Энкодер JSON-ответов: "auto" (orjson, если установлен), "orjson" или "stdlib"
+    JSON_ENCODER: str = os.getenv("JSON_ENCODER", "auto").lower()
+
+    # --- Compression ---
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("true", "1", "t")
+    # Ответы меньше порога (в байтах) отправляются без сжатия
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    # Пути, для которых сжатые байты переиспользуются, пока не изменится ETag ответа
+    COMPRESSION_PRECOMPRESSED_PATHS: tuple = tuple(
+        p for p in os.getenv("COMPRESSION_PRECOMPRESSED_PATHS", "/options/").split(",") if p
+    )
 
     # --- Database ---
     # DATABASE_URL имеет приоритет. Если ее нет, собираем из частей.
@@ -20,13 +59,88 @@ class Settings:
         DB_NAME: str = os.getenv("DB_NAME", "pro_db")
         DB_URL: str = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+    # Необязательная реплика для read-only маршрутов. Если не задана, чтение идет с primary.
+    DB_REPLICA_URL: str | None = os.getenv("DATABASE_REPLICA_URL") or None
+    # Сколько секунд после записи запросы того же пользователя читают с primary (read-your-writes).
+    # Отметка локальна для воркера; между воркерами чтение проверяет LSN из заголовка
+    # X-Read-After-LSN, который клиенты (бот, фронтенд) повторяют после записи (app/db.py).
+    DB_REPLICA_STICKY_SECONDS: float = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+    # Строгий режим загрузки связей ORM: любое обращение к незагруженной связи — ошибка.
+    # Включается в тестах и при разработке, чтобы ловить незапланированные lazy load.
+    ORM_STRICT_LOADING: bool = os.getenv("ORM_STRICT_LOADING", "false").lower() in ("true", "1", "t")
+
+    # Сколько хранится ключ идемпотентности (и сохраненный ответ) пакетной отметки подходов
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+    # Удаление истекших ключей (app/idempotency_purge.py): фоновая задача в процессе API
+    # включена по умолчанию; при запуске CLI по расписанию ее можно выключить
+    IDEMPOTENCY_PURGE_ENABLED: bool = os.getenv("IDEMPOTENCY_PURGE_ENABLED", "true").lower() in ("true", "1", "t")
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = int(os.getenv("IDEMPOTENCY_PURGE_BATCH_SIZE", "1000"))
+
+    # In-memory хранилище активных сессий с отложенной записью в БД (app/hot_sessions.py).
+    # Хранилище локально для процесса: при нескольких воркерах нужна sticky-маршрутизация по пользователю.
+    HOT_SESSION_STORE_ENABLED: bool = os.getenv("HOT_SESSION_STORE_ENABLED", "false").lower() in ("true", "1", "t")
+    # Как часто изменения из памяти записываются в БД (верхняя граница потерь при аварии)
+    HOT_SESSION_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("HOT_SESSION_FLUSH_INTERVAL_SECONDS", "2"))
+    # Через сколько секунд без обращений сессия вытесняется из памяти
+    HOT_SESSION_IDLE_SECONDS: float = float(os.getenv("HOT_SESSION_IDLE_SECONDS", "600"))
+
+    # Брошенные тренировки: сессии IN_PROGRESS старше STALE_SESSION_MAX_AGE_HOURS
+    # завершаются (finish) или удаляются (cancel) пакетами (app/session_reaper.py).
+    # Фоновая задача в процессе API включается флагом; то же доступно как CLI.
+    STALE_SESSION_REAPER_ENABLED: bool = os.getenv("STALE_SESSION_REAPER_ENABLED", "false").lower() in ("true", "1", "t")
+    STALE_SESSION_MAX_AGE_HOURS: float = float(os.getenv("STALE_SESSION_MAX_AGE_HOURS", "12"))
+    STALE_SESSION_ACTION: str = os.getenv("STALE_SESSION_ACTION", "finish")
+    STALE_SESSION_REAPER_INTERVAL_SECONDS: float = float(os.getenv("STALE_SESSION_REAPER_INTERVAL_SECONDS", "600"))
+    STALE_SESSION_REAPER_BATCH_SIZE: int = int(os.getenv("STALE_SESSION_REAPER_BATCH_SIZE", "500"))
+
+    # Кэш готовых ответов GET /statistics/me по (user_id, period). Сбрасывается при завершении
+    # сессий пользователя в этом процессе; TTL ограничивает устаревание на других воркерах
+    # (и при чтении с отстающей реплики). STATISTICS_CACHE_SIZE=0 отключает кэш.
+    STATISTICS_CACHE_SIZE: int = int(os.getenv("STATISTICS_CACHE_SIZE", "10000"))
+    STATISTICS_CACHE_TTL: float = float(os.getenv("STATISTICS_CACHE_TTL", "30"))
+
+    # --- Database pool ---
+    DB_POOL_PROFILE: str = os.getenv("DB_POOL_PROFILE", "default")
+    _pool_defaults = DB_POOL_PROFILES.get(DB_POOL_PROFILE, DB_POOL_PROFILES["default"])
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", _pool_defaults["DB_POOL_SIZE"]))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", _pool_defaults["DB_MAX_OVERFLOW"]))
+    # Сколько секунд ждать свободное соединение, прежде чем выбросить TimeoutError
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", _pool_defaults["DB_POOL_TIMEOUT"]))
+    # Время жизни соединения в секундах (-1 — без ограничения)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", _pool_defaults["DB_POOL_RECYCLE"]))
+    DB_POOL_PRE_PING: bool = os.getenv(
+        "DB_POOL_PRE_PING", str(_pool_defaults["DB_POOL_PRE_PING"])
+    ).lower() in ("true", "1", "t")
+    # Кэш подготовленных выражений asyncpg и SQLAlchemy (на соединение)
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", _pool_defaults["DB_STATEMENT_CACHE_SIZE"]))
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(
+        os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", _pool_defaults["DB_PREPARED_STATEMENT_CACHE_SIZE"])
+    )
+
     # --- JWT ---
     SECRET_KEY: str = os.getenv("SECRET_KEY", "a_very_secret_key_that_should_be_in_env")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_DAYS: int = 14
+    # Кэш версий токенов: отзыв на других воркерах вступает в силу не позже чем через TTL
+    TOKEN_VERSION_CACHE_TTL: float = float(os.getenv("TOKEN_VERSION_CACHE_TTL", "30"))
+    TOKEN_VERSION_CACHE_SIZE: int = int(os.getenv("TOKEN_VERSION_CACHE_SIZE", "10000"))
+
+    # --- Password hashing ---
+    # Стоимость bcrypt (log2 числа раундов). Влияет только на новые хеши.
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Пул для bcrypt вне event loop: "thread" или "process"
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # Максимум одновременных операций хеширования; остальные ждут в очереди
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))
 
     # --- Telegram ---
     TELEGRAM_BOT_USERNAME: str = os.getenv("TELEGRAM_BOT_USERNAME", "your_bot_username")
+    # Кэш соответствия telegram_id -> пользователь (запросы бота)
+    TELEGRAM_PRINCIPAL_CACHE_TTL: float = float(os.getenv("TELEGRAM_PRINCIPAL_CACHE_TTL", "60"))
+    TELEGRAM_PRINCIPAL_CACHE_SIZE: int = int(os.getenv("TELEGRAM_PRINCIPAL_CACHE_SIZE", "10000"))
 
 
 settings = Settings()
@@ -2,12 +2,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 
+from app.crud import loaders
 from app.models import Exercise
 
 
 async def get_all_exercises(db: AsyncSession) -> List[Exercise]:
     """
-    Асинхронно извлекает все упражнения из базы данных.
+    Асинхронно извлекает все упражнения из базы данных вместе с основной группой мышц.
 
     Args:
         db: Сессия базы данных.
@@ -15,5 +16,5 @@ async def get_all_exercises(db: AsyncSession) -> List[Exercise]:
     Returns:
         Список всех упражнений.
     """
-    result = await db.execute(select(Exercise))
+    result = await db.execute(select(Exercise).options(*loaders.EXERCISE_CATALOG))
     return result.scalars().all()
@@ -0,0 +1,94 @@
+import datetime
+import hashlib
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import IdempotencyKey
+
+
+def hash_request(body: bytes) -> str:
+    """
+    Хеш тела запроса для сверки повторов с тем же ключом.
+    """
+    return hashlib.sha256(body).hexdigest()
+
+
+async def claim_key(
+    db: AsyncSession, user_id: int, key: str, request_hash: str
+) -> Optional[IdempotencyKey]:
+    """
+    Резервирует ключ идемпотентности в текущей транзакции.
+
+    Если ключ свободен (или истек), вставляет запись без ответа и возвращает None:
+    запрос нужно выполнить и сохранить результат через store_response в той же транзакции.
+    Параллельный запрос с тем же ключом ждет на уникальном индексе, пока первая
+    транзакция не завершится. Если ключ уже использован, возвращает существующую запись;
+    ответ сохраняется в той же транзакции, что и резервирование, поэтому у зафиксированной
+    записи он всегда есть (при ошибке резервирование откатывается вместе с запросом).
+
+    :param db: Сессия базы данных.
+    :param user_id: ID пользователя (ключи уникальны в пределах пользователя).
+    :param key: Значение заголовка Idempotency-Key.
+    :param request_hash: Хеш тела запроса (hash_request).
+    :return: Существующая запись или None, если ключ зарезервирован этим запросом.
+    """
+    expires_at = func.now() + datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+    statement = (
+        insert(IdempotencyKey)
+        .values(user_id=user_id, key=key, request_hash=request_hash, expires_at=expires_at)
+        .on_conflict_do_update(
+            constraint="uq_idempotency_keys_user_key",
+            set_={
+                "request_hash": request_hash,
+                "status_code": None,
+                "response": None,
+                "created_at": func.now(),
+                "expires_at": expires_at,
+            },
+            # Перезаписываем только истекшие ключи
+            where=IdempotencyKey.expires_at <= func.now(),
+        )
+        .returning(IdempotencyKey.id)
+    )
+    result = await db.execute(statement)
+    if result.scalar_one_or_none() is not None:
+        return None
+
+    result = await db.execute(
+        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    return result.scalar_one()
+
+
+async def store_response(db: AsyncSession, user_id: int, key: str, status_code: int, response: dict) -> None:
+    """
+    Сохраняет результат запроса для ключа, зарезервированного claim_key.
+    Коммит выполняет вызывающий код вместе с основными изменениями.
+    """
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status_code=status_code, response=response)
+    )
+
+
+async def purge_expired_keys(db: AsyncSession, batch_size: int) -> int:
+    """
+    Удаляет до batch_size истекших ключей идемпотентности и коммитит.
+
+    :return: Количество удаленных записей.
+    """
+    expired_ids = (
+        select(IdempotencyKey.id)
+        .where(IdempotencyKey.expires_at <= func.now())
+        .limit(batch_size)
+        # Параллельный проход другого воркера пропускает уже удаляемые строки
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired_ids)))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,74 @@
+"""
+Именованные профили загрузки связей ORM.
+
+Модели не загружают связи неявно (см. RELATIONSHIP_LAZY в app/models.py), поэтому
+каждая CRUD-функция явно указывает нужный ей подграф одним из профилей ниже.
+Все, что не перечислено в профиле, при обращении вызывает ошибку вместо запроса.
+"""
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app.models import (
+    Exercise,
+    MuscleFocus,
+    RestrictionRule,
+    SessionDay,
+    SessionExercise,
+    SessionSet,
+    User,
+    UserPreferences,
+    WorkoutSession,
+)
+
+# Дерево сессии: дни -> упражнения -> подходы (ответ ActiveWorkoutSession)
+SESSION_TREE = (
+    selectinload(WorkoutSession.session_days)
+    .selectinload(SessionDay.session_exercises)
+    .selectinload(SessionExercise.session_sets),
+)
+
+# Подход с цепочкой владельцев (проверка прав) и соседями на каждом уровне
+# (пересчет статусов упражнения, дня и сессии)
+SET_WITH_OWNER = (
+    joinedload(SessionSet.session_exercise).options(
+        selectinload(SessionExercise.session_sets),
+        joinedload(SessionExercise.session_day).options(
+            selectinload(SessionDay.session_exercises),
+            joinedload(SessionDay.session).selectinload(WorkoutSession.session_days),
+        ),
+    ),
+)
+
+# История сессий: глубина дерева для параметра expand (без expand дерево не загружается)
+SESSION_HISTORY_EXPAND = {
+    "days": (selectinload(WorkoutSession.session_days),),
+    "exercises": (selectinload(WorkoutSession.session_days).selectinload(SessionDay.session_exercises),),
+    "sets": SESSION_TREE,
+}
+
+# Только строка сессии (проверка прав, отмена: потомков удаляет ON DELETE CASCADE)
+SESSION_ONLY = (raiseload("*"),)
+
+# Только план: JSONB с днями, без пользователя
+PLAN_ONLY = (raiseload("*"),)
+
+# Выбранные пользователем ограничения и акценты (ответ UserPreferencesResponse)
+PREFERENCES_SELECTIONS = (
+    selectinload(UserPreferences.restriction_rules),
+    selectinload(UserPreferences.muscle_focuses),
+)
+
+# Пользователь с предпочтениями в объеме, нужном генератору планов
+USER_WITH_PREFERENCES = (
+    selectinload(User.preferences).options(
+        selectinload(UserPreferences.restriction_rules).selectinload(RestrictionRule.restricted_exercises),
+        selectinload(UserPreferences.muscle_focuses).joinedload(MuscleFocus.muscle_group),
+    ),
+)
+
+# Каталог упражнений с основной группой мышц (генератор планов)
+EXERCISE_CATALOG = (joinedload(Exercise.primary_muscle_group),)
+
+# Профили для get_user_with_relationships по имени связи User
+USER_RELATIONSHIP_PROFILES = {
+    "preferences": USER_WITH_PREFERENCES,
+}
@@ -2,37 +2,49 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import select
 
-from app.models import User, UserPreferences, RestrictionRule, MuscleFocus
+from app.crud import loaders
+from app.models import UserPreferences, RestrictionRule, MuscleFocus
 from app.schemas.preferences import UserPreferencesUpdate
 
 
-async def get_or_create_preferences(db: AsyncSession, user_id: int) -> UserPreferences:
+async def _get_preferences(db: AsyncSession, user_id: int) -> UserPreferences | None:
     """
-    Получает или создает профиль предпочтений для пользователя.
+    Загружает предпочтения пользователя с выбранными правилами и акцентами
+    (профиль PREFERENCES_SELECTIONS), перечитывая уже загруженный объект.
     """
     result = await db.execute(
-        select(UserPreferences).filter_by(user_id=user_id)
+        select(UserPreferences)
+        .filter_by(user_id=user_id)
+        .options(*loaders.PREFERENCES_SELECTIONS)
+        .execution_options(populate_existing=True)
     )
-    preferences = result.scalars().first()
+    return result.scalars().first()
+
+
+async def get_or_create_preferences(db: AsyncSession, user_id: int) -> UserPreferences:
+    """
+    Получает или создает профиль предпочтений для пользователя.
+    """
+    preferences = await _get_preferences(db, user_id)
 
     if not preferences:
         preferences = UserPreferences(user_id=user_id) # No JSONB fields to initialize anymore
         db.add(preferences)
         await db.commit()
-        await db.refresh(preferences)
+        preferences = await _get_preferences(db, user_id)
 
     return preferences
 
 
 async def update_user_preferences(
     db: AsyncSession,
-    user: User,
+    user_id: int,
     data: UserPreferencesUpdate
 ) -> UserPreferences:
     """
     Обновляет предпочтения пользователя, используя ID для реляционных связей.
     """
-    preferences = await get_or_create_preferences(db, user.id)
+    preferences = await get_or_create_preferences(db, user_id)
 
     # Обновление правил ограничений
     if data.restriction_rule_ids is not None:
@@ -59,5 +71,4 @@ async def update_user_preferences(
             preferences.muscle_focuses.extend(selected_focuses)
 
     await db.commit()
-    await db.refresh(preferences)
-    return preferences
+    return await _get_preferences(db, user_id)
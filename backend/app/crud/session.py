@@ -1,28 +1,48 @@
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
-from typing import List, Optional
+from sqlalchemy import select, insert, update, delete, and_, func, case, exists, literal, values, column, cast, tuple_, Integer
+from sqlalchemy.engine import Row
+from typing import Dict, List, Optional, Tuple
 
+from app.config import settings
 from app.models import (
-    User, WorkoutPlan, WorkoutSession, SessionDay, SessionExercise, SessionSet, SessionStatus
+    WorkoutPlan, WorkoutSession, SessionDay, SessionExercise, SessionSet, SessionStatus
+)
+from app.schemas.session import (
+    ActiveWorkoutSession,
+    NextSessionSet,
+    SessionDay as SessionDaySchema,
+    SessionExercise as SessionExerciseSchema,
+    SessionSet as SessionSetSchema,
+    SessionSetUpdateResult,
+    SessionHistoryDay,
+    SessionHistoryExercise,
+    SessionHistoryItem,
+    SessionHistoryPage,
+    SetResultItem,
+    SetResultsBatchResponse,
 )
 from app.schemas.workout import WorkoutDay, WorkoutExercise  # For parsing the plan structure
-from sqlalchemy.orm import selectinload
+from app.crud import loaders, statistics as crud_statistics
 
 
 async def create_session_from_plan(
         db: AsyncSession,
-        user: User,
+        user_id: int,
         workout_plan: WorkoutPlan,
         day_index: int
-) -> WorkoutSession:
+) -> ActiveWorkoutSession:
     """
     Создает новую WorkoutSession и всю ее дочернюю иерархию (SessionDay, SessionExercise, SessionSet)
     на основе WorkoutPlan и указанного дня.
+
+    Каждый уровень иерархии вставляется одним многострочным INSERT ... RETURNING,
+    поэтому число запросов не зависит от размера дня. Дерево ответа собирается
+    из возвращенных id без повторной загрузки.
     """
-    existing_active_session = await get_active_session_by_user_id(db, user.id)
-    if existing_active_session:
+    if await get_active_session_version(db, user_id):
         raise ValueError("User already has an active workout session.")
 
     if not workout_plan.days or day_index >= len(workout_plan.days):
@@ -31,64 +51,95 @@ async def create_session_from_plan(
     plan_workout_day_data = workout_plan.days[day_index]
     plan_workout_day = WorkoutDay.model_validate(plan_workout_day_data)
 
-    new_session = WorkoutSession(
-        user_id=user.id,
-        workout_plan_id=workout_plan.id,
-        status=SessionStatus.IN_PROGRESS  # Set initial status to IN_PROGRESS
-    )
-    db.add(new_session)
-    await db.flush()
+    session_row = (await db.execute(
+        insert(WorkoutSession)
+        .values(user_id=user_id, workout_plan_id=workout_plan.id, status=SessionStatus.IN_PROGRESS)
+        .returning(WorkoutSession.id, WorkoutSession.started_at)
+    )).one()
 
     # Create SessionDay
-    new_session_day = SessionDay(
-        workout_session_id=new_session.id,
-        plan_day_name=plan_workout_day.day_name,
-        order=day_index,
-        status=SessionStatus.PENDING  # Day starts as PENDING
-    )
-    db.add(new_session_day)
-    await db.flush()
-
-    for exercise_order, plan_exercise in enumerate(plan_workout_day.exercises):
-        # Create SessionExercise
-        new_session_exercise = SessionExercise(
-            session_day_id=new_session_day.id,
-            plan_exercise_name=plan_exercise.name,
-            order=exercise_order,
-            status=SessionStatus.PENDING  # Exercise starts as PENDING
-        )
-        db.add(new_session_exercise)
-        await db.flush()
-
-        for set_num in range(1, plan_exercise.sets + 1):
-            new_session_set = SessionSet(
-                session_exercise_id=new_session_exercise.id,
-                order=set_num,
-                status=SessionStatus.PENDING,  # Set starts as PENDING
-                plan_reps_min=plan_exercise.reps[0],
-                plan_reps_max=plan_exercise.reps[1],
-                plan_weight=plan_exercise.weight
-            )
-            db.add(new_session_set)
+    day_id = (await db.execute(
+        insert(SessionDay)
+        .values(
+            workout_session_id=session_row.id,
+            plan_day_name=plan_workout_day.day_name,
+            order=day_index,
+            status=SessionStatus.PENDING  # Day starts as PENDING
+        )
+        .returning(SessionDay.id)
+    )).scalar_one()
+
+    exercise_rows = [
+        {
+            "session_day_id": day_id,
+            "plan_exercise_name": plan_exercise.name,
+            "order": exercise_order,
+            "status": SessionStatus.PENDING,  # Exercise starts as PENDING
+        }
+        for exercise_order, plan_exercise in enumerate(plan_workout_day.exercises)
+    ]
+    exercise_ids: List[int] = []
+    if exercise_rows:
+        exercise_ids = list((await db.scalars(
+            insert(SessionExercise).returning(SessionExercise.id, sort_by_parameter_order=True),
+            exercise_rows
+        )).all())
+
+    set_rows = [
+        {
+            "session_exercise_id": exercise_id,
+            "order": set_num,
+            "status": SessionStatus.PENDING,  # Set starts as PENDING
+            "plan_reps_min": plan_exercise.reps[0],
+            "plan_reps_max": plan_exercise.reps[1],
+            "plan_weight": plan_exercise.weight,
+        }
+        for exercise_id, plan_exercise in zip(exercise_ids, plan_workout_day.exercises)
+        for set_num in range(1, plan_exercise.sets + 1)
+    ]
+    set_ids: List[int] = []
+    if set_rows:
+        set_ids = list((await db.scalars(
+            insert(SessionSet).returning(SessionSet.id, sort_by_parameter_order=True),
+            set_rows
+        )).all())
 
     await db.commit()
-    await db.refresh(new_session)
 
-    statement = (
-        select(WorkoutSession)
-        .where(WorkoutSession.id == new_session.id)
-        .options(
-            selectinload(WorkoutSession.session_days).selectinload(SessionDay.session_exercises).selectinload(
-                SessionExercise.session_sets)
-        )
+    # Собираем ответ из вставленных строк и возвращенных id
+    sets_by_exercise: Dict[int, List[SessionSetSchema]] = {exercise_id: [] for exercise_id in exercise_ids}
+    for set_id, row in zip(set_ids, set_rows):
+        sets_by_exercise[row["session_exercise_id"]].append(SessionSetSchema(id=set_id, **row))
+
+    exercises = [
+        SessionExerciseSchema(id=exercise_id, session_sets=sets_by_exercise[exercise_id], **row)
+        for exercise_id, row in zip(exercise_ids, exercise_rows)
+    ]
+    session_day = SessionDaySchema(
+        id=day_id,
+        workout_session_id=session_row.id,
+        plan_day_name=plan_workout_day.day_name,
+        order=day_index,
+        status=SessionStatus.PENDING,
+        session_exercises=exercises,
+    )
+    return ActiveWorkoutSession(
+        id=session_row.id,
+        user_id=user_id,
+        workout_plan_id=workout_plan.id,
+        started_at=session_row.started_at,
+        status=SessionStatus.IN_PROGRESS,
+        session_days=[session_day],
     )
-    result = await db.execute(statement)
-    return result.scalar_one()
 
 
-async def get_active_session_by_user_id(db: AsyncSession, user_id: int) -> Optional[WorkoutSession]:
+async def get_active_session_by_user_id(
+        db: AsyncSession, user_id: int, profile: tuple = loaders.SESSION_TREE, for_update: bool = False
+) -> Optional[WorkoutSession]:
     """
     Возвращает активную (незавершенную) тренировочную сессию для пользователя.
+
+    :param for_update: Заблокировать строку сессии до конца транзакции (как complete_set/skip_set).
     """
     statement = (
         select(WorkoutSession)
@@ -98,143 +149,716 @@ async def get_active_session_by_user_id(db: AsyncSession, user_id: int) -> Optio
                 WorkoutSession.status == SessionStatus.IN_PROGRESS
             )
         )
-        .options(
-            selectinload(WorkoutSession.session_days).selectinload(SessionDay.session_exercises).selectinload(
-                SessionExercise.session_sets)
-        )
+        .options(*profile)
     )
+    if for_update:
+        statement = statement.with_for_update(of=WorkoutSession)
     result = await db.execute(statement)
     return result.scalar_one_or_none()
 
 
+async def get_active_session_version(db: AsyncSession, user_id: int) -> Optional[Tuple[int, int]]:
+    """
+    Возвращает (id, revision) активной сессии пользователя без загрузки дерева.
+    Используется для ETag в GET /sessions/active.
+    """
+    statement = select(WorkoutSession.id, WorkoutSession.revision).where(
+        WorkoutSession.user_id == user_id,
+        WorkoutSession.status == SessionStatus.IN_PROGRESS
+    )
+    result = await db.execute(statement)
+    row = result.first()
+    return (row.id, row.revision) if row else None
+
+
+def encode_history_cursor(started_at: datetime, session_id: int) -> str:
+    """
+    Курсор истории: позиция последней сессии страницы (started_at, id).
+    """
+    raw = f"{started_at.isoformat()}|{session_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    :raises ValueError: если курсор поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        started_at, session_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(started_at), int(session_id)
+    except Exception as e:
+        raise ValueError("Некорректный курсор.") from e
+
+
+def _history_tree(session: WorkoutSession, expand: str) -> List[SessionHistoryDay]:
+    """
+    Собирает дерево сессии до глубины expand (days, exercises или sets).
+    Более глубокие уровни не загружены профилем и не затрагиваются.
+    """
+    days = []
+    for day in sorted(session.session_days, key=lambda d: d.order):
+        exercises = None
+        if expand != "days":
+            exercises = []
+            for exercise in sorted(day.session_exercises, key=lambda e: e.order):
+                sets = None
+                if expand == "sets":
+                    sets = [SessionSetSchema.model_validate(s) for s in sorted(exercise.session_sets, key=lambda s: s.order)]
+                exercises.append(SessionHistoryExercise(
+                    id=exercise.id,
+                    plan_exercise_name=exercise.plan_exercise_name,
+                    order=exercise.order,
+                    status=exercise.status,
+                    session_sets=sets,
+                ))
+        days.append(SessionHistoryDay(
+            id=day.id,
+            plan_day_name=day.plan_day_name,
+            order=day.order,
+            status=day.status,
+            session_exercises=exercises,
+        ))
+    return days
+
+
+async def get_session_history(
+        db: AsyncSession,
+        user_id: int,
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        expand: Optional[str] = None,
+) -> SessionHistoryPage:
+    """
+    Возвращает страницу завершенных сессий пользователя, от новых к старым.
+
+    Пагинация по ключу (started_at, id) через индекс ix_workout_sessions_user_completed_history:
+    стоимость страницы не зависит от ее номера и общего числа сессий.
+    Сводка (объем и количество подходов) считается одним запросом только для сессий страницы.
+
+    :param cursor: Позиция последней сессии предыдущей страницы (decode_history_cursor).
+    :param expand: Глубина дерева в ответе: days, exercises или sets; None — только сводка.
+    """
+    filters = [WorkoutSession.user_id == user_id, WorkoutSession.status == SessionStatus.COMPLETED]
+    if cursor is not None:
+        filters.append(tuple_(WorkoutSession.started_at, WorkoutSession.id) < tuple_(*cursor))
+
+    # Лишняя строка показывает, есть ли следующая страница
+    page = (
+        select(
+            WorkoutSession.id,
+            WorkoutSession.workout_plan_id,
+            WorkoutSession.started_at,
+            WorkoutSession.completed_at,
+            WorkoutSession.status,
+            WorkoutSession.duration_minutes,
+        )
+        .where(*filters)
+        .order_by(WorkoutSession.started_at.desc(), WorkoutSession.id.desc())
+        .limit(limit + 1)
+        .subquery("page")
+    )
+    completed = SessionSet.status == SessionStatus.COMPLETED
+    statement = (
+        select(
+            page,
+            func.count(SessionSet.id).label("sets_total"),
+            func.count(SessionSet.id).filter(completed).label("sets_completed"),
+            func.count(SessionSet.id).filter(SessionSet.status == SessionStatus.SKIPPED).label("sets_skipped"),
+            func.coalesce(
+                func.sum(SessionSet.reps_done * SessionSet.weight_lifted).filter(completed), 0
+            ).label("volume_kg"),
+        )
+        .select_from(page)
+        .outerjoin(SessionDay, SessionDay.workout_session_id == page.c.id)
+        .outerjoin(SessionExercise, SessionExercise.session_day_id == SessionDay.id)
+        .outerjoin(SessionSet, SessionSet.session_exercise_id == SessionExercise.id)
+        .group_by(*page.c)
+        .order_by(page.c.started_at.desc(), page.c.id.desc())
+    )
+    rows = (await db.execute(statement)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].started_at, rows[-1].id)
+
+    trees: Dict[int, WorkoutSession] = {}
+    if expand and rows:
+        result = await db.execute(
+            select(WorkoutSession)
+            .where(WorkoutSession.id.in_([row.id for row in rows]))
+            .options(*loaders.SESSION_HISTORY_EXPAND[expand])
+        )
+        trees = {session.id: session for session in result.scalars()}
+
+    items = [
+        SessionHistoryItem(
+            **{name: getattr(row, name) for name in (
+                "id", "workout_plan_id", "started_at", "completed_at", "status", "duration_minutes",
+                "sets_total", "sets_completed", "sets_skipped",
+            )},
+            volume_kg=round(float(row.volume_kg), 2),
+            session_days=_history_tree(trees[row.id], expand) if expand else None,
+        )
+        for row in rows
+    ]
+    return SessionHistoryPage(items=items, next_cursor=next_cursor)
+
+
 async def get_session_set_by_id(db: AsyncSession, set_id: int) -> Optional[SessionSet]:
     """
-    Возвращает конкретный SessionSet по его ID, включая родительские объекты для проверки прав.
+    Возвращает конкретный SessionSet по его ID, включая родительские объекты для проверки прав
+    и соседние объекты для пересчета статусов (профиль SET_WITH_OWNER).
     """
     statement = (
         select(SessionSet)
         .where(SessionSet.id == set_id)
-        .options(
-            selectinload(SessionSet.session_exercise).selectinload(SessionExercise.session_day).selectinload(
-                SessionDay.session)
-        )
+        .options(*loaders.SET_WITH_OWNER)
     )
     result = await db.execute(statement)
     return result.scalar_one_or_none()
 
 
-async def get_session_by_id(db: AsyncSession, session_id: int) -> Optional[WorkoutSession]:
+async def get_session_by_id(
+        db: AsyncSession, session_id: int, profile: tuple = loaders.SESSION_TREE
+) -> Optional[WorkoutSession]:
     """
     Возвращает сессию по ID со всеми вложенными объектами.
+    Уже загруженные в сессию объекты перечитываются из БД.
     """
     statement = (
         select(WorkoutSession)
         .where(WorkoutSession.id == session_id)
-        .options(
-            selectinload(WorkoutSession.session_days)
-            .selectinload(SessionDay.session_exercises)
-            .selectinload(SessionExercise.session_sets)
-        )
+        .options(*profile)
+        .execution_options(populate_existing=True)
     )
     result = await db.execute(statement)
     return result.scalar_one_or_none()
 
 
-async def _check_and_update_parent_status(db: AsyncSession, obj: any):
+def _build_set_update_statement(set_id: int, user_id: int, values: dict):
     """
-    Вспомогательная функция для обновления статуса родительских объектов.
+    Строит UPDATE подхода, который блокирует подход в статусе PENDING и активную
+    сессию пользователя, которой он принадлежит, обновляет подход и возвращает его
+    вместе с id сессии, id дня и названием упражнения.
+
+    Статусы упражнения, дня и сессии пересчитываются следующим выражением
+    (_build_set_roll_up_statement): его снимок берется после получения блокировки сессии
+    и видит подходы, отмеченные параллельными запросами, которые ее держали.
+    CTE в этом же выражении читали бы снимок начала выражения и могли пропустить
+    завершение последнего подхода.
+    Если подход не найден, чужой, уже обработан или сессия не активна, выражение не вернет строк.
     """
-    if isinstance(obj, SessionSet):
-        parent = obj.session_exercise
-        children = parent.session_sets
-    elif isinstance(obj, SessionExercise):
-        parent = obj.session_day
-        children = parent.session_exercises
-    elif isinstance(obj, SessionDay):
-        parent = obj.session
-        children = parent.session_days
-    else:
-        return
-
-    # проверяем что все зависимые COMPLETED или SKIPPED
-    all_children_done = all(c.status in [SessionStatus.COMPLETED, SessionStatus.SKIPPED] for c in children)
+    sets = SessionSet.__table__
+    exercises = SessionExercise.__table__
+    days = SessionDay.__table__
+    sessions = WorkoutSession.__table__
+
+    target = (
+        select(
+            sets.c.id.label("set_id"),
+            sessions.c.id.label("session_id"),
+            days.c.id.label("day_id"),
+            exercises.c.plan_exercise_name,
+        )
+        .join(exercises, exercises.c.id == sets.c.session_exercise_id)
+        .join(days, days.c.id == exercises.c.session_day_id)
+        .join(sessions, sessions.c.id == days.c.workout_session_id)
+        .where(
+            sets.c.id == set_id,
+            sets.c.status == SessionStatus.PENDING,
+            sessions.c.user_id == user_id,
+            sessions.c.status == SessionStatus.IN_PROGRESS,
+        )
+        # Повторное нажатие на тот же подход ждет первое и после перепроверки статуса
+        # подхода не находит строку (ответ "уже завершен"), а не обновляет его дважды
+        .with_for_update(of=(sessions, sets))
+        .cte("target")
+    )
 
-    if all_children_done and parent.status != SessionStatus.COMPLETED:
-        parent.status = SessionStatus.COMPLETED
-        db.add(parent)
-        await db.flush()
-        # Recursively check parent's parent
-        await _check_and_update_parent_status(db, parent)
-    elif not all_children_done and parent.status == SessionStatus.COMPLETED:
-        # If a child was 'un-skipped' or similar, revert parent status
-        parent.status = SessionStatus.IN_PROGRESS
-        db.add(parent)
-        await db.flush()
-        await _check_and_update_parent_status(db, parent)
+    return (
+        update(sets)
+        .where(sets.c.id == target.c.set_id)
+        .values(**values)
+        .returning(*sets.c, target.c.session_id, target.c.day_id, target.c.plan_exercise_name)
+    )
 
 
-async def complete_set(db: AsyncSession, session_set: SessionSet, reps_done: int, weight_lifted: float) -> SessionSet:
+def _build_set_roll_up_statement(user_id: int, row: Row, check_record: bool):
     """
-    Обновляет SessionSet, помечая его как завершенный, и обновляет статусы родительских объектов.
+    Строит выражение, которое после обновления подхода row (_build_set_update_statement)
+    пересчитывает статусы его упражнения, дня и сессии, увеличивает ревизию сессии
+    и возвращает одной строкой статус сессии, признак нового рекорда и следующий
+    подход в статусе PENDING (колонки NULL, если его нет).
+
+    Все CTE выражения читают один снимок и не видят изменений друг друга, поэтому
+    готовность дня и сессии вычисляется по исходным строкам, а упражнение и день
+    подхода подставляются вычисленными признаками. Снимок берется после блокировки
+    сессии первым выражением и уже содержит обновленный подход.
     """
-    session_set.reps_done = reps_done
-    session_set.weight_lifted = weight_lifted
-    session_set.status = SessionStatus.COMPLETED
-    db.add(session_set)
-    await db.flush()
+    sets = SessionSet.__table__
+    exercises = SessionExercise.__table__
+    days = SessionDay.__table__
+    sessions = WorkoutSession.__table__
+    done = (SessionStatus.COMPLETED, SessionStatus.SKIPPED)
+    completed = literal(SessionStatus.COMPLETED, type_=sessions.c.status.type)
+
+    exercise_done = ~exists().where(
+        sets.c.session_exercise_id == row.session_exercise_id, sets.c.status.notin_(done),
+    )
+    day_done = and_(exercise_done, ~exists().where(
+        exercises.c.session_day_id == row.day_id,
+        exercises.c.id != row.session_exercise_id,
+        exercises.c.status.notin_(done),
+    ))
+    # Сессия завершается автоматически, когда выполнены все ее дни (completed_at не заполняется)
+    session_done = and_(day_done, ~exists().where(
+        days.c.workout_session_id == row.session_id,
+        days.c.id != row.day_id,
+        days.c.status.notin_(done),
+    ))
+
+    exercise_update = (
+        update(exercises)
+        .where(exercises.c.id == row.session_exercise_id, exercises.c.status != SessionStatus.COMPLETED, exercise_done)
+        .values(status=SessionStatus.COMPLETED)
+        .returning(exercises.c.id)
+        .cte("exercise_update")
+    )
+    day_update = (
+        update(days)
+        .where(days.c.id == row.day_id, days.c.status != SessionStatus.COMPLETED, day_done)
+        .values(status=SessionStatus.COMPLETED)
+        .returning(days.c.id)
+        .cte("day_update")
+    )
+    session_update = (
+        update(sessions)
+        .where(sessions.c.id == row.session_id)
+        .values(
+            revision=sessions.c.revision + 1,
+            status=case((session_done, completed), else_=sessions.c.status),
+        )
+        .returning(sessions.c.status)
+        .cte("session_update")
+    )
+    next_set = (
+        select(sets, exercises.c.plan_exercise_name)
+        .join(exercises, exercises.c.id == sets.c.session_exercise_id)
+        .join(days, days.c.id == exercises.c.session_day_id)
+        .where(days.c.workout_session_id == row.session_id, sets.c.status == SessionStatus.PENDING)
+        .order_by(days.c.order, exercises.c.order, sets.c.order, sets.c.id)
+        .limit(1)
+        .subquery("next_set")
+    )
+    # Подход уже COMPLETED в снимке, поэтому исключается из сравнения по id
+    new_personal_record = crud_statistics.new_personal_record_condition(
+        user_id, row.session_id, row.plan_exercise_name, row.weight_lifted, row.reps_done, [row.id],
+    ) if check_record else literal(False)
+
+    return (
+        select(
+            session_update.c.status.label("session_status"),
+            new_personal_record.label("new_personal_record"),
+            next_set,
+        )
+        .add_cte(exercise_update, day_update)
+        .select_from(session_update)
+        .outerjoin(next_set, literal(True))
+    )
 
-    await _check_and_update_parent_status(db, session_set)
+
+async def _apply_set_update(
+        db: AsyncSession, set_id: int, user_id: int, values: dict
+) -> Optional[SessionSetUpdateResult]:
+    result = await db.execute(_build_set_update_statement(set_id, user_id, values))
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        return None
+
+    # Два обращения к БД на отметку: обновление с блокировкой и пересчет статусов
+    # вместе с признаком рекорда и следующим подходом
+    roll_up = (await db.execute(
+        _build_set_roll_up_statement(user_id, row, values["status"] == SessionStatus.COMPLETED)
+    )).one()
+    if roll_up.session_status == SessionStatus.COMPLETED:
+        # Сессия завершилась этим подходом: учитываем ее в дневных агрегатах той же транзакцией
+        await crud_statistics.add_sessions_to_rollups(db, [row.session_id])
     await db.commit()
-    await db.refresh(session_set)
-    return session_set
+    return SessionSetUpdateResult(
+        **{name: row._mapping[name] for name in SessionSetSchema.model_fields},
+        session_status=roll_up.session_status,
+        new_personal_record=bool(roll_up.new_personal_record),
+        next_set=NextSessionSet(
+            **{name: roll_up._mapping[name] for name in NextSessionSet.model_fields}
+        ) if roll_up.id is not None else None,
+    )
 
 
-async def skip_set(db: AsyncSession, session_set: SessionSet) -> SessionSet:
+async def get_session_set_state(db: AsyncSession, set_id: int) -> Optional[Row]:
     """
-    Пропускает SessionSet и обновляет статусы родительских объектов.
+    Возвращает (user_id, session_status, set_status) для подхода без загрузки объектов.
+    Используется для выбора ошибки, когда complete_set/skip_set не обновили подход.
     """
-    session_set.status = SessionStatus.SKIPPED
-    db.add(session_set)
-    await db.flush()
+    statement = (
+        select(
+            WorkoutSession.user_id,
+            WorkoutSession.status.label("session_status"),
+            SessionSet.status.label("set_status"),
+        )
+        .select_from(SessionSet)
+        .join(SessionExercise, SessionExercise.id == SessionSet.session_exercise_id)
+        .join(SessionDay, SessionDay.id == SessionExercise.session_day_id)
+        .join(WorkoutSession, WorkoutSession.id == SessionDay.workout_session_id)
+        .where(SessionSet.id == set_id)
+    )
+    result = await db.execute(statement)
+    return result.first()
 
-    await _check_and_update_parent_status(db, session_set)
-    await db.commit()
-    await db.refresh(session_set)
-    return session_set
+
+async def complete_set(
+        db: AsyncSession, set_id: int, user_id: int, reps_done: int, weight_lifted: float
+) -> Optional[SessionSetUpdateResult]:
+    """
+    Помечает подход как завершенный и пересчитывает статусы родительских объектов
+    в одной транзакции (см. _build_set_update_statement).
+
+    :return: Результат со следующим подходом или None, если подход не может быть обновлен.
+    """
+    return await _apply_set_update(db, set_id, user_id, {
+        "status": SessionStatus.COMPLETED,
+        "reps_done": reps_done,
+        "weight_lifted": weight_lifted,
+    })
+
+
+async def skip_set(db: AsyncSession, set_id: int, user_id: int) -> Optional[SessionSetUpdateResult]:
+    """
+    Пропускает подход и пересчитывает статусы родительских объектов в одной транзакции.
+
+    :return: Результат со следующим подходом или None, если подход не может быть обновлен.
+    """
+    return await _apply_set_update(db, set_id, user_id, {"status": SessionStatus.SKIPPED})
+
+
+async def lock_sets_for_update(db: AsyncSession, set_ids: List[int]) -> List[Row]:
+    """
+    Блокирует подходы и их сессии до конца транзакции и возвращает
+    (set_id, set_status, session_id, user_id, session_status) для проверки пакета.
+    Одиночные complete_set/skip_set блокируют ту же строку сессии, поэтому
+    пакет и отдельные отметки одной сессии выполняются по очереди.
+    """
+    statement = (
+        select(
+            SessionSet.id.label("set_id"),
+            SessionSet.status.label("set_status"),
+            WorkoutSession.id.label("session_id"),
+            WorkoutSession.user_id,
+            WorkoutSession.status.label("session_status"),
+        )
+        .select_from(SessionSet)
+        .join(SessionExercise, SessionExercise.id == SessionSet.session_exercise_id)
+        .join(SessionDay, SessionDay.id == SessionExercise.session_day_id)
+        .join(WorkoutSession, WorkoutSession.id == SessionDay.workout_session_id)
+        .where(SessionSet.id.in_(set_ids))
+        .order_by(SessionSet.id)
+        .with_for_update(of=(WorkoutSession, SessionSet))
+    )
+    result = await db.execute(statement)
+    return list(result.all())
+
+
+async def _roll_up_session_statuses(db: AsyncSession, session_id: int) -> SessionStatus:
+    """
+    Пересчитывает статусы упражнений, дней и самой сессии тремя выражениями
+    (по одному на уровень) независимо от числа измененных подходов:
+    объект становится COMPLETED, когда все его дочерние объекты COMPLETED или SKIPPED.
+    Увеличивает ревизию сессии.
+
+    :return: Статус сессии после пересчета.
+    """
+    sets = SessionSet.__table__
+    exercises = SessionExercise.__table__
+    days = SessionDay.__table__
+    sessions = WorkoutSession.__table__
+    done = (SessionStatus.COMPLETED, SessionStatus.SKIPPED)
+    session_day_ids = select(days.c.id).where(days.c.workout_session_id == session_id)
+
+    await db.execute(
+        update(exercises)
+        .where(
+            exercises.c.session_day_id.in_(session_day_ids),
+            exercises.c.status != SessionStatus.COMPLETED,
+            ~exists().where(sets.c.session_exercise_id == exercises.c.id, sets.c.status.notin_(done)),
+        )
+        .values(status=SessionStatus.COMPLETED)
+    )
+    await db.execute(
+        update(days)
+        .where(
+            days.c.workout_session_id == session_id,
+            days.c.status != SessionStatus.COMPLETED,
+            ~exists().where(exercises.c.session_day_id == days.c.id, exercises.c.status.notin_(done)),
+        )
+        .values(status=SessionStatus.COMPLETED)
+    )
+    # Сессия завершается автоматически, когда выполнены все ее дни (completed_at не заполняется)
+    all_days_done = ~exists().where(days.c.workout_session_id == session_id, days.c.status.notin_(done))
+    result = await db.execute(
+        update(sessions)
+        .where(sessions.c.id == session_id)
+        .values(
+            revision=sessions.c.revision + 1,
+            status=case(
+                (all_days_done, literal(SessionStatus.COMPLETED, type_=sessions.c.status.type)),
+                else_=sessions.c.status,
+            ),
+        )
+        .returning(sessions.c.status)
+    )
+    return result.scalar_one()
+
+
+async def get_next_pending_set(db: AsyncSession, session_id: int) -> Optional[NextSessionSet]:
+    """
+    Возвращает первый подход сессии в статусе PENDING (в порядке дней, упражнений и подходов).
+    """
+    statement = (
+        select(SessionSet.__table__, SessionExercise.plan_exercise_name)
+        .join(SessionExercise, SessionExercise.id == SessionSet.session_exercise_id)
+        .join(SessionDay, SessionDay.id == SessionExercise.session_day_id)
+        .where(SessionDay.workout_session_id == session_id, SessionSet.status == SessionStatus.PENDING)
+        .order_by(SessionDay.order, SessionExercise.order, SessionSet.order, SessionSet.id)
+        .limit(1)
+    )
+    row = (await db.execute(statement)).first()
+    return NextSessionSet(**row._mapping) if row else None
+
+
+async def log_set_results(
+        db: AsyncSession, session_id: int, items: List[SetResultItem]
+) -> SetResultsBatchResponse:
+    """
+    Применяет пакет отметок подходов одной сессии: одно UPDATE ... FROM (VALUES ...)
+    для всех подходов, затем один проход пересчета статусов (_roll_up_session_statuses).
+
+    Подходы должны быть предварительно заблокированы и проверены (lock_sets_for_update).
+    Коммит выполняет вызывающий код, чтобы в ту же транзакцию попал сохраненный ответ
+    для ключа идемпотентности.
+    """
+    sets = SessionSet.__table__
+    results = values(
+        column("id", Integer),
+        column("status", sets.c.status.type),
+        column("reps_done", Integer),
+        column("weight_lifted", sets.c.weight_lifted.type),
+        name="results",
+    ).data([
+        (
+            item.set_id,
+            SessionStatus.COMPLETED if item.action == "complete" else SessionStatus.SKIPPED,
+            item.reps_done if item.action == "complete" else None,
+            item.weight_lifted if item.action == "complete" else None,
+        )
+        for item in items
+    ])
+    # Пропуск подхода не меняет reps_done/weight_lifted: NULL в VALUES оставляет текущие значения
+    updated = await db.execute(
+        update(sets)
+        .where(sets.c.id == results.c.id)
+        .values(
+            status=cast(results.c.status, sets.c.status.type),
+            # Без CAST столбец VALUES из одних NULL (пакет только из пропусков) получает тип text
+            reps_done=func.coalesce(cast(results.c.reps_done, Integer), sets.c.reps_done),
+            weight_lifted=func.coalesce(cast(results.c.weight_lifted, sets.c.weight_lifted.type), sets.c.weight_lifted),
+        )
+        .returning(*sets.c)
+    )
+    updated_by_id = {row.id: SessionSetSchema(**row._mapping) for row in updated}
+
+    # До пересчета статусов: при завершении сессии ее подходы попадут в рекорды
+    completed_ids = [item.set_id for item in items if item.action == "complete"]
+    new_personal_records = []
+    if completed_ids:
+        session_user_id = select(WorkoutSession.user_id).where(WorkoutSession.id == session_id).scalar_subquery()
+        new_personal_records = list((await db.scalars(
+            select(SessionExercise.plan_exercise_name)
+            .join(SessionSet, SessionSet.session_exercise_id == SessionExercise.id)
+            .where(
+                SessionSet.id.in_(completed_ids),
+                crud_statistics.new_personal_record_condition(
+                    session_user_id, session_id, SessionExercise.plan_exercise_name,
+                    SessionSet.weight_lifted, SessionSet.reps_done, completed_ids,
+                ),
+            )
+            .distinct()
+            .order_by(SessionExercise.plan_exercise_name)
+        )).all())
+
+    session_status = await _roll_up_session_statuses(db, session_id)
+    if session_status == SessionStatus.COMPLETED:
+        await crud_statistics.add_sessions_to_rollups(db, [session_id])
+    next_set = await get_next_pending_set(db, session_id)
+    return SetResultsBatchResponse(
+        session_id=session_id,
+        session_status=session_status,
+        sets=[updated_by_id[item.set_id] for item in items],
+        new_personal_records=new_personal_records,
+        next_set=next_set,
+    )
 
 
 async def finish_session(db: AsyncSession, session: WorkoutSession) -> WorkoutSession:
     """
     Завершает всю тренировочную сессию, устанавливая completed_at и статус COMPLETED.
-    Также помечает все незавершенные дочерние объекты как SKIPPED.
-    """
-    # Ensure all child SessionSets are marked as COMPLETED or SKIPPED
-    for s_day in session.session_days:
-        for s_exercise in s_day.session_exercises:
-            for s_set in s_exercise.session_sets:
-                if s_set.status == SessionStatus.PENDING:
-                    s_set.status = SessionStatus.SKIPPED
-                    db.add(s_set)
-    await db.flush()
+    Незавершенные подходы помечаются SKIPPED, после чего все упражнения и дни сессии
+    завершены и помечаются COMPLETED.
 
-    for s_day in session.session_days:
-        await _check_and_update_parent_status(db, s_day)
+    Выполняется фиксированным числом выражений независимо от размера сессии:
+    по одному UPDATE на уровень дерева и UPDATE самой сессии. Объекты, уже загруженные
+    в сессию (профиль SESSION_TREE), обновляются через synchronize_session="fetch",
+    поэтому дерево для ответа не нужно перечитывать.
+    """
+    day_ids = select(SessionDay.id).where(SessionDay.workout_session_id == session.id)
+    exercise_ids = select(SessionExercise.id).where(SessionExercise.session_day_id.in_(day_ids))
+    sync = {"synchronize_session": "fetch"}
+
+    await db.execute(
+        update(SessionSet)
+        .where(SessionSet.session_exercise_id.in_(exercise_ids), SessionSet.status == SessionStatus.PENDING)
+        .values(status=SessionStatus.SKIPPED)
+        .execution_options(**sync)
+    )
+    await db.execute(
+        update(SessionExercise)
+        .where(SessionExercise.session_day_id.in_(day_ids), SessionExercise.status != SessionStatus.COMPLETED)
+        .values(status=SessionStatus.COMPLETED)
+        .execution_options(**sync)
+    )
+    await db.execute(
+        update(SessionDay)
+        .where(SessionDay.workout_session_id == session.id, SessionDay.status != SessionStatus.COMPLETED)
+        .values(status=SessionStatus.COMPLETED)
+        .execution_options(**sync)
+    )
 
     now = datetime.utcnow()
     session.completed_at = now
     if session.started_at:
         delta = now - session.started_at.replace(tzinfo=None)
-        session.duration_minutes = int(delta.total_seconds() // 60)
+        # Сессия старше порога брошенных тренировок: длительность неизвестна (см. finish_stale_sessions)
+        if delta <= timedelta(hours=settings.STALE_SESSION_MAX_AGE_HOURS):
+            session.duration_minutes = int(delta.total_seconds() // 60)
     session.status = SessionStatus.COMPLETED
-    db.add(session)
+    # Инкремент в SQL: атрибут после коммита устаревает, в ответ ревизия не входит
+    session.revision = WorkoutSession.revision + 1
+    # Автосброс (autoflush) записывает сессию до чтения подходов для агрегатов
+    await crud_statistics.add_sessions_to_rollups(db, [session.id])
     await db.commit()
-    await db.refresh(session)
     return session
 
 
 async def cancel_session(db: AsyncSession, session: WorkoutSession) -> None:
     """
     Отменяет тренировочную сессию, удаляя ее и все дочерние объекты.
+    Выполняется одним DELETE: связи дерева объявлены с passive_deletes, дни, упражнения
+    и подходы удаляет ON DELETE CASCADE. Достаточно профиля SESSION_ONLY.
     """
     await db.delete(session)
     await db.commit()
+
+
+def _stale_sessions_cte(cutoff: datetime, batch_size: int):
+    """
+    Пакет брошенных сессий (IN_PROGRESS, начаты раньше cutoff) по индексу
+    ix_workout_sessions_in_progress_started. Строки, заблокированные другими
+    транзакциями (например, идущей отметкой подхода), пропускаются до следующего прохода.
+    """
+    return (
+        select(WorkoutSession.id)
+        .where(WorkoutSession.status == SessionStatus.IN_PROGRESS, WorkoutSession.started_at < cutoff)
+        .order_by(WorkoutSession.started_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .cte("stale")
+    )
+
+
+async def finish_stale_sessions(db: AsyncSession, cutoff: datetime, batch_size: int) -> Tuple[List[int], int]:
+    """
+    Завершает пакет брошенных сессий одним выражением: незавершенные подходы -> SKIPPED,
+    упражнения, дни и сессии -> COMPLETED (после пропуска все дочерние объекты завершены).
+
+    Длительность брошенной сессии неизвестна, поэтому duration_minutes и completed_at
+    остаются пустыми и не искажают статистику.
+
+    :return: (ID пользователей завершенных сессий, число пропущенных подходов).
+    """
+    sets = SessionSet.__table__
+    exercises = SessionExercise.__table__
+    days = SessionDay.__table__
+    sessions = WorkoutSession.__table__
+    stale = _stale_sessions_cte(cutoff, batch_size)
+    stale_day_ids = select(days.c.id).where(days.c.workout_session_id.in_(select(stale.c.id)))
+    stale_exercise_ids = select(exercises.c.id).where(exercises.c.session_day_id.in_(stale_day_ids))
+
+    skipped_sets = (
+        update(sets)
+        .where(sets.c.session_exercise_id.in_(stale_exercise_ids), sets.c.status == SessionStatus.PENDING)
+        .values(status=SessionStatus.SKIPPED)
+        .returning(sets.c.id)
+        .cte("skipped_sets")
+    )
+    updated_exercises = (
+        update(exercises)
+        .where(exercises.c.session_day_id.in_(stale_day_ids), exercises.c.status != SessionStatus.COMPLETED)
+        .values(status=SessionStatus.COMPLETED)
+        .returning(exercises.c.id)
+        .cte("updated_exercises")
+    )
+    updated_days = (
+        update(days)
+        .where(days.c.workout_session_id.in_(select(stale.c.id)), days.c.status != SessionStatus.COMPLETED)
+        .values(status=SessionStatus.COMPLETED)
+        .returning(days.c.id)
+        .cte("updated_days")
+    )
+    updated_sessions = (
+        update(sessions)
+        .where(sessions.c.id.in_(select(stale.c.id)))
+        .values(status=SessionStatus.COMPLETED, duration_minutes=None, revision=sessions.c.revision + 1)
+        .returning(sessions.c.id, sessions.c.user_id)
+        .cte("updated_sessions")
+    )
+    statement = (
+        select(
+            updated_sessions.c.id,
+            updated_sessions.c.user_id,
+            select(func.count()).select_from(skipped_sets).scalar_subquery().label("sets_skipped"),
+        )
+        .add_cte(updated_exercises, updated_days)
+    )
+    rows = (await db.execute(statement)).all()
+    await crud_statistics.add_sessions_to_rollups(db, [row.id for row in rows])
+    await db.commit()
+    return [row.user_id for row in rows], rows[0].sets_skipped if rows else 0
+
+
+async def cancel_stale_sessions(db: AsyncSession, cutoff: datetime, batch_size: int) -> List[int]:
+    """
+    Удаляет пакет брошенных сессий одним DELETE; дочерние объекты удаляет
+    ON DELETE CASCADE внешних ключей.
+
+    :return: ID пользователей удаленных сессий.
+    """
+    stale = _stale_sessions_cte(cutoff, batch_size)
+    result = await db.execute(
+        delete(WorkoutSession)
+        .where(WorkoutSession.id.in_(select(stale.c.id)))
+        .returning(WorkoutSession.user_id)
+    )
+    user_ids = list(result.scalars())
+    await db.commit()
+    return user_ids
@@ -1,194 +1,332 @@
+import hashlib
+from datetime import datetime, time, timedelta, timezone
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy import (
+    event, select, delete, exists, func, and_, desc, cast, null, literal, tuple_, union_all,
+    String, Date, DateTime, Numeric, BigInteger
+)
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert
 
+from app.cache import KeyedLock, TTLCache
+from app.config import settings
+from app.etag import make_etag
 from app.models import (
-    WorkoutSession, SessionDay, SessionExercise, SessionSet, SessionStatus, Exercise, MuscleGroup
+    WorkoutSession, SessionDay, SessionExercise, SessionSet, SessionStatus, Exercise, MuscleGroup,
+    UserDailyStats, UserDailyMuscleVolume, UserPersonalRecord,
 )
+from app.responses import dumps
 from app.schemas.statistics import (
     StatisticsResponse, StatisticsSummary, PersonalRecord, VolumeByMuscleGroup, ProgressDataPoint
 )
 
 
-def _get_date_filtered_query(base_query, period: str):
+def _get_period_start(period: str) -> Optional[datetime]:
     """
-    Вспомогательная функция для добавления фильтра по дате к запросу.
+    Начало периода статистики или None для all_time. Агрегаты хранятся по дням,
+    поэтому период начинается с полуночи UTC своего первого дня — так же для всех разделов.
     """
-    if period != "all_time":
-        end_date = datetime.utcnow()
-        if period == "last_month":
-            start_date = end_date - timedelta(days=30)
-        elif period == "last_week":
-            start_date = end_date - timedelta(days=7)
-        else:
-            return base_query
-        return base_query.where(WorkoutSession.started_at >= start_date)
-    return base_query
+    if period == "last_month":
+        days = 30
+    elif period == "last_week":
+        days = 7
+    else:
+        return None
+    first_day = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+    return datetime.combine(first_day, time.min, tzinfo=timezone.utc)
 
 
-async def _get_summary_from_db(db: AsyncSession, user_id: int, period: str) -> Dict[str, Any]:
+# --- Агрегаты по дням (user_daily_stats, user_daily_muscle_volume) ---
+
+def _completed_sets_query(*filters):
     """
-    Вычисляет общую сводку, выполняя агрегацию в базе данных.
+    Выполненные подходы завершенных сессий: источник и агрегатов, и персональных рекордов.
+
+    День сессии — дата started_at (как и фильтр периода в прежнем расчете), поэтому
+    сессия через полночь попадает в день начала, а завершенная сессия без completed_at
+    тоже учитывается. Сессия без выполненных подходов в агрегаты не попадает.
     """
-    query = (
+    return (
         select(
-            func.count(func.distinct(WorkoutSession.id)).label("total_workouts"),
-            func.sum(WorkoutSession.duration_minutes).label("total_duration_minutes"),
-            func.sum(SessionSet.reps_done * SessionSet.weight_lifted).label("total_volume_kg"),
-            func.count(SessionSet.id).label("total_sets"),
-            func.sum(SessionSet.reps_done).label("total_reps")
+            WorkoutSession.id.label("session_id"),
+            WorkoutSession.user_id,
+            func.date(WorkoutSession.started_at, type_=Date).label("day"),
+            WorkoutSession.started_at,
+            WorkoutSession.duration_minutes,
+            SessionExercise.plan_exercise_name.label("exercise_name"),
+            SessionSet.reps_done,
+            SessionSet.weight_lifted,
+            (SessionSet.reps_done * SessionSet.weight_lifted).label("volume"),
         )
         .select_from(WorkoutSession)
         .join(SessionDay, WorkoutSession.id == SessionDay.workout_session_id)
         .join(SessionExercise, SessionDay.id == SessionExercise.session_day_id)
         .join(SessionSet, SessionExercise.id == SessionSet.session_exercise_id)
         .where(
-            WorkoutSession.user_id == user_id,
             WorkoutSession.status == SessionStatus.COMPLETED,
             SessionSet.status == SessionStatus.COMPLETED,
             SessionSet.reps_done.isnot(None),
-            SessionSet.weight_lifted.isnot(None)
+            SessionSet.weight_lifted.isnot(None),
+            *filters
         )
     )
 
-    # Применяем фильтр по дате к основному запросу
-    query = _get_date_filtered_query(query, period)
-
-    result = await db.execute(query)
-    summary = result.first()
 
-    return {
-        "total_workouts": summary.total_workouts or 0,
-        "total_duration_minutes": round(float(summary.total_duration_minutes or 0), 2),
-        "total_volume_kg": round(float(summary.total_volume_kg or 0), 2),
-        "total_sets": summary.total_sets or 0,
-        "total_reps": summary.total_reps or 0,
-    }
+def _daily_stats_select(*filters):
+    """
+    Строки user_daily_stats для сессий, отобранных filters.
+    Длительность берется по одной на сессию, а не по строке на подход.
+    """
+    sets = _completed_sets_query(*filters).subquery("sets")
+    per_session = (
+        select(
+            sets.c.user_id,
+            sets.c.day,
+            sets.c.duration_minutes,
+            func.sum(sets.c.volume).label("volume_kg"),
+            func.count().label("sets"),
+            func.sum(sets.c.reps_done).label("reps"),
+        )
+        .group_by(sets.c.session_id, sets.c.user_id, sets.c.day, sets.c.duration_minutes)
+        .subquery("per_session")
+    )
+    return (
+        select(
+            per_session.c.user_id,
+            per_session.c.day,
+            func.count().label("workouts"),
+            func.coalesce(func.sum(per_session.c.duration_minutes), 0).label("duration_minutes"),
+            func.sum(per_session.c.volume_kg).label("volume_kg"),
+            func.sum(per_session.c.sets).label("sets"),
+            func.sum(per_session.c.reps).label("reps"),
+        )
+        .group_by(per_session.c.user_id, per_session.c.day)
+    )
 
 
-async def _get_personal_records_from_db(db: AsyncSession, user_id: int, period: str) -> List[PersonalRecord]:
+def _daily_muscle_volume_select(*filters):
     """
-    Вычисляет персональные рекорды, используя оконную функцию в БД.
+    Строки user_daily_muscle_volume для сессий, отобранных filters.
     """
-    base_join_query = (
+    sets = _completed_sets_query(*filters).subquery("sets")
+    return (
         select(
-            SessionExercise.plan_exercise_name.label("exercise_name"),
-            SessionSet.weight_lifted.label("max_weight_kg"),
-            SessionSet.reps_done.label("reps"),
-            WorkoutSession.started_at.label("date"),
-            func.row_number().over(
-                partition_by=SessionExercise.plan_exercise_name,
-                order_by=[
-                    desc(SessionSet.weight_lifted),
-                    desc(SessionSet.reps_done),
-                    desc(WorkoutSession.started_at)
-                ]
-            ).label("rn")
-        )
-        .select_from(WorkoutSession)
-        .join(SessionDay, WorkoutSession.id == SessionDay.workout_session_id)
-        .join(SessionExercise, SessionDay.id == SessionExercise.session_day_id)
-        .join(SessionSet, SessionExercise.id == SessionSet.session_exercise_id)
-        .where(
-            WorkoutSession.user_id == user_id,
-            WorkoutSession.status == SessionStatus.COMPLETED,
-            SessionSet.status == SessionStatus.COMPLETED,
-            SessionSet.weight_lifted.isnot(None),
-            SessionSet.reps_done.isnot(None)
+            sets.c.user_id,
+            sets.c.day,
+            Exercise.primary_muscle_group_id.label("muscle_group_id"),
+            func.sum(sets.c.volume).label("volume_kg"),
         )
+        .join(Exercise, sets.c.exercise_name == Exercise.name)
+        .where(Exercise.primary_muscle_group_id.isnot(None))
+        .group_by(sets.c.user_id, sets.c.day, Exercise.primary_muscle_group_id)
     )
 
-    filtered_join_query = _get_date_filtered_query(base_join_query, period)
-    subquery = filtered_join_query.subquery()
-    final_query = select(subquery).where(subquery.c.rn == 1)
 
-    result = await db.execute(final_query)
-    records = result.all()
+async def _upsert_rollups(db: AsyncSession, *filters) -> Set[int]:
+    """
+    :return: ID пользователей, чьи дневные итоги изменились.
+    """
+    user_ids: Set[int] = set()
+    for model, rows, keys in (
+        (UserDailyStats, _daily_stats_select(*filters), ("user_id", "day")),
+        (UserDailyMuscleVolume, _daily_muscle_volume_select(*filters), ("user_id", "day", "muscle_group_id")),
+    ):
+        columns = [column.name for column in rows.selected_columns]
+        statement = insert(model).from_select(columns, rows)
+        result = await db.execute(statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={
+                name: getattr(model, name) + statement.excluded[name]
+                for name in columns if name not in keys
+            },
+        ).returning(model.user_id))
+        user_ids.update(result.scalars())
+    return user_ids
 
-    return [PersonalRecord(
-        exercise_name=r.exercise_name,
-        max_weight_kg=float(r.max_weight_kg),
-        reps=r.reps,
-        date=r.date.isoformat()
-    ) for r in records]
 
+# --- Персональные рекорды (user_personal_records) ---
 
-async def _get_volume_by_muscle_group_from_db(db: AsyncSession, user_id: int, period: str) -> List[VolumeByMuscleGroup]:
+def _personal_records_select(*filters):
     """
-    Вычисляет объем по группам мышц, используя GROUP BY в БД.
+    Строки user_personal_records для сессий, отобранных filters: лучший подход
+    каждого упражнения (по весу, затем по повторениям, при равенстве — более поздний).
     """
-    query = (
-        select(
-            MuscleGroup.name.label("muscle_group"),
-            func.sum(SessionSet.reps_done * SessionSet.weight_lifted).label("volume_kg")
-        )
-        .select_from(WorkoutSession)
-        .join(SessionDay, WorkoutSession.id == SessionDay.workout_session_id)
-        .join(SessionExercise, SessionDay.id == SessionExercise.session_day_id)
-        .join(SessionSet, SessionExercise.id == SessionSet.session_exercise_id)
-        .join(Exercise, SessionExercise.plan_exercise_name == Exercise.name)
-        .join(MuscleGroup, Exercise.primary_muscle_group_id == MuscleGroup.id)
-        .where(
-            WorkoutSession.user_id == user_id,
-            WorkoutSession.status == SessionStatus.COMPLETED,
-            SessionSet.status == SessionStatus.COMPLETED,
-            SessionSet.reps_done.isnot(None),
-            SessionSet.weight_lifted.isnot(None)
-        )
-        .group_by(MuscleGroup.name)
-        .order_by(desc("volume_kg"))
+    sets = _completed_sets_query(*filters).subquery("sets")
+    ranked = select(
+        sets.c.user_id,
+        sets.c.exercise_name,
+        sets.c.weight_lifted,
+        sets.c.reps_done,
+        sets.c.started_at.label("achieved_at"),
+        func.row_number().over(
+            partition_by=[sets.c.user_id, sets.c.exercise_name],
+            order_by=[desc(sets.c.weight_lifted), desc(sets.c.reps_done), desc(sets.c.started_at)],
+        ).label("rn"),
+    ).subquery("ranked")
+    return select(
+        ranked.c.user_id,
+        ranked.c.exercise_name,
+        ranked.c.weight_lifted,
+        ranked.c.reps_done,
+        ranked.c.achieved_at,
+    ).where(ranked.c.rn == 1)
+
+
+async def _upsert_personal_records(db: AsyncSession, *filters) -> None:
+    rows = _personal_records_select(*filters)
+    statement = insert(UserPersonalRecord).from_select([column.name for column in rows.selected_columns], rows)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "exercise_name"],
+        set_={name: statement.excluded[name] for name in ("weight_lifted", "reps_done", "achieved_at")},
+        # Рекорд заменяет более сильный подход, а равный — только более поздний
+        where=tuple_(statement.excluded.weight_lifted, statement.excluded.reps_done, statement.excluded.achieved_at)
+        > tuple_(UserPersonalRecord.weight_lifted, UserPersonalRecord.reps_done, UserPersonalRecord.achieved_at),
+    ))
+
+
+def new_personal_record_condition(user_id, session_id, exercise_name, weight_lifted, reps_done, exclude_set_ids):
+    """
+    SQL-условие "подход (weight_lifted, reps_done) — новый персональный рекорд": он сильнее
+    сохраненного рекорда и уже выполненных подходов того же упражнения в текущей сессии
+    (они попадут в user_personal_records только при ее завершении).
+
+    Аргументы — значения или выражения внешнего запроса; exclude_set_ids (список или
+    подзапрос) исключает из сравнения сами проверяемые подходы.
+    """
+    attempt = tuple_(weight_lifted, reps_done)
+    sets = aliased(SessionSet)
+    exercises = aliased(SessionExercise)
+    days = aliased(SessionDay)
+    return and_(
+        ~exists().where(
+            UserPersonalRecord.user_id == user_id,
+            UserPersonalRecord.exercise_name == exercise_name,
+            tuple_(UserPersonalRecord.weight_lifted, UserPersonalRecord.reps_done) >= attempt,
+        ),
+        ~exists(
+            select(sets.id)
+            .join(exercises, exercises.id == sets.session_exercise_id)
+            .join(days, days.id == exercises.session_day_id)
+            .where(
+                days.workout_session_id == session_id,
+                exercises.plan_exercise_name == exercise_name,
+                sets.status == SessionStatus.COMPLETED,
+                tuple_(sets.weight_lifted, sets.reps_done) >= attempt,
+                sets.id.notin_(exclude_set_ids),
+            )
+        ),
     )
 
-    query = _get_date_filtered_query(query, period)
 
-    result = await db.execute(query)
-    volumes = result.all()
+async def get_personal_records(db: AsyncSession, user_id: int) -> Dict[str, Tuple[float, int]]:
+    """
+    Персональные рекорды пользователя: {упражнение: (вес, повторения)}.
+    """
+    result = await db.execute(
+        select(UserPersonalRecord.exercise_name, UserPersonalRecord.weight_lifted, UserPersonalRecord.reps_done)
+        .where(UserPersonalRecord.user_id == user_id)
+    )
+    return {row.exercise_name: (float(row.weight_lifted), row.reps_done) for row in result}
 
-    return [VolumeByMuscleGroup(
-        muscle_group=v.muscle_group,
-        volume_kg=round(float(v.volume_kg), 2)
-    ) for v in volumes]
+
+async def add_sessions_to_rollups(db: AsyncSession, session_ids: Iterable[int]) -> None:
+    """
+    Добавляет только что завершенные сессии в дневные агрегаты и персональные рекорды
+    (по одному INSERT ... ON CONFLICT на таблицу), а после коммита сбрасывает
+    кэш статистики их пользователей.
+    Вызывается в транзакции, переводящей сессии в COMPLETED, ровно один раз на сессию;
+    коммит выполняет вызывающий код.
+    """
+    session_ids = list(session_ids)
+    if session_ids:
+        user_ids = await _upsert_rollups(db, WorkoutSession.id.in_(session_ids))
+        await _upsert_personal_records(db, WorkoutSession.id.in_(session_ids))
+        _invalidate_statistics_after_commit(db, user_ids)
 
 
-async def _get_progress_chart_data_from_db(db: AsyncSession, user_id: int, period: str) -> Dict[str, List[ProgressDataPoint]]:
+async def rebuild_rollups(db: AsyncSession, user_ids: List[int]) -> None:
     """
-    Вычисляет данные для графика прогресса общего объема, используя GROUP BY в БД.
+    Пересобирает дневные агрегаты и персональные рекорды пользователей по всей истории и коммитит.
     """
-    date_trunc = func.date(WorkoutSession.completed_at)
+    await db.execute(delete(UserDailyMuscleVolume).where(UserDailyMuscleVolume.user_id.in_(user_ids)))
+    await db.execute(delete(UserDailyStats).where(UserDailyStats.user_id.in_(user_ids)))
+    await db.execute(delete(UserPersonalRecord).where(UserPersonalRecord.user_id.in_(user_ids)))
+    await _upsert_rollups(db, WorkoutSession.user_id.in_(user_ids))
+    await _upsert_personal_records(db, WorkoutSession.user_id.in_(user_ids))
+    _invalidate_statistics_after_commit(db, user_ids)
+    await db.commit()
 
-    query = (
-        select(
-            date_trunc.label("date"),
-            func.sum(SessionSet.reps_done * SessionSet.weight_lifted).label("value_kg")
-        )
-        .select_from(WorkoutSession)
-        .join(SessionDay, WorkoutSession.id == SessionDay.workout_session_id)
-        .join(SessionExercise, SessionDay.id == SessionExercise.session_day_id)
-        .join(SessionSet, SessionExercise.id == SessionSet.session_exercise_id)
-        .where(
-            WorkoutSession.user_id == user_id,
-            WorkoutSession.status == SessionStatus.COMPLETED,
-            WorkoutSession.completed_at.isnot(None),
-            SessionSet.status == SessionStatus.COMPLETED,
-            SessionSet.reps_done.isnot(None),
-            SessionSet.weight_lifted.isnot(None)
+
+def _build_statistics_statement(user_id: int, period: str):
+    """
+    Строит одно выражение, которое возвращает все разделы статистики.
+
+    Сводка, объем по группам мышц и график прогресса читаются из дневных агрегатов
+    (user_daily_stats, user_daily_muscle_volume) диапазоном по (user_id, day), поэтому
+    их стоимость зависит от числа дней в периоде, а не от длины истории.
+    Персональные рекорды за все время читаются из user_personal_records (строка на упражнение),
+    за период — ранжированием подходов периода.
+    Ветви UNION ALL различаются колонкой kind, неиспользуемые колонки ветви равны NULL.
+    """
+    period_start = _get_period_start(period)
+    stats_filters = [UserDailyStats.user_id == user_id]
+    muscle_filters = [UserDailyMuscleVolume.user_id == user_id]
+    if period_start is not None:
+        stats_filters.append(UserDailyStats.day >= period_start.date())
+        muscle_filters.append(UserDailyMuscleVolume.day >= period_start.date())
+
+    def branch(kind: str, **values):
+        columns = {
+            "name": String, "day": Date, "date": DateTime(timezone=True), "value": Numeric,
+            "duration": BigInteger, "workouts": BigInteger, "sets": BigInteger, "reps": BigInteger,
+        }
+        return (literal(kind).label("kind"),) + tuple(
+            values.get(name, cast(null(), type_)).label(name) for name, type_ in columns.items()
         )
-        .group_by("date")
-        .order_by("date")
-    )
 
-    query = _get_date_filtered_query(query, period)
+    summary = select(*branch(
+        "summary",
+        value=func.sum(UserDailyStats.volume_kg),
+        duration=func.sum(UserDailyStats.duration_minutes),
+        workouts=func.sum(UserDailyStats.workouts),
+        sets=func.sum(UserDailyStats.sets),
+        reps=func.sum(UserDailyStats.reps),
+    )).where(*stats_filters)
 
-    result = await db.execute(query)
-    points = result.all()
+    if period_start is None:
+        records = select(*branch(
+            "record",
+            name=UserPersonalRecord.exercise_name,
+            date=UserPersonalRecord.achieved_at,
+            value=UserPersonalRecord.weight_lifted,
+            reps=UserPersonalRecord.reps_done,
+        )).where(UserPersonalRecord.user_id == user_id)
+    else:
+        ranked = _personal_records_select(
+            WorkoutSession.user_id == user_id, WorkoutSession.started_at >= period_start
+        ).subquery("ranked")
+        records = select(*branch(
+            "record",
+            name=ranked.c.exercise_name,
+            date=ranked.c.achieved_at,
+            value=ranked.c.weight_lifted,
+            reps=ranked.c.reps_done,
+        ))
 
-    return {
-        "overall_volume": [
-            {"date": p.date.isoformat(), "value_kg": round(float(p.value_kg), 2)}
-            for p in points
-        ]
-    }
+    by_muscle_group = (
+        select(*branch("muscle_group", name=MuscleGroup.name, value=func.sum(UserDailyMuscleVolume.volume_kg)))
+        .join(MuscleGroup, UserDailyMuscleVolume.muscle_group_id == MuscleGroup.id)
+        .where(*muscle_filters)
+        .group_by(MuscleGroup.name)
+    )
+
+    progress = select(*branch(
+        "progress", day=UserDailyStats.day, value=UserDailyStats.volume_kg
+    )).where(*stats_filters)
+
+    return union_all(summary, records, by_muscle_group, progress)
 
 
 async def get_user_statistics(
@@ -196,12 +334,38 @@ async def get_user_statistics(
 ) -> StatisticsResponse:
     """
     Собирает и возвращает полную статистику для пользователя,
-    выполняя все расчеты на стороне базы данных.
+    выполняя все расчеты на стороне базы данных одним выражением.
     """
-    summary_data_raw = await _get_summary_from_db(db, user_id, period)
-    personal_records_data = await _get_personal_records_from_db(db, user_id, period)
-    volume_by_muscle_group_data = await _get_volume_by_muscle_group_from_db(db, user_id, period)
-    overall_volume_chart_data = await _get_progress_chart_data_from_db(db, user_id, period)
+    result = await db.execute(_build_statistics_statement(user_id, period))
+    rows = result.all()
+
+    summary_row = next(row for row in rows if row.kind == "summary")
+    summary_data_raw = {
+        "total_workouts": summary_row.workouts or 0,
+        "total_duration_minutes": round(float(summary_row.duration or 0), 2),
+        "total_volume_kg": round(float(summary_row.value or 0), 2),
+        "total_sets": summary_row.sets or 0,
+        "total_reps": summary_row.reps or 0,
+    }
+    personal_records_data = [
+        PersonalRecord(
+            exercise_name=row.name,
+            max_weight_kg=float(row.value),
+            reps=row.reps,
+            date=row.date.isoformat()
+        )
+        for row in rows if row.kind == "record"
+    ]
+    volume_by_muscle_group_data = [
+        VolumeByMuscleGroup(muscle_group=row.name, volume_kg=round(float(row.value), 2))
+        for row in sorted((r for r in rows if r.kind == "muscle_group"), key=lambda r: r.value, reverse=True)
+    ]
+    overall_volume_chart_data = {
+        "overall_volume": [
+            {"date": row.day.isoformat(), "value_kg": round(float(row.value), 2)}
+            for row in sorted((r for r in rows if r.kind == "progress"), key=lambda r: r.day)
+        ]
+    }
 
     summary = StatisticsSummary(
         personal_records=personal_records_data,
@@ -213,3 +377,75 @@ async def get_user_statistics(
         volume_by_muscle_group=volume_by_muscle_group_data,
         progress_charts=overall_volume_chart_data
     )
+
+
+# --- Кэш ответов GET /statistics/me ---
+
+STATISTICS_PERIODS = ("all_time", "last_month", "last_week")
+
+# (user_id, period) -> (окно, ETag, JSON StatisticsResponse).
+# Кэш свой у каждого воркера: завершение сессии сбрасывает записи пользователя только
+# в процессе, который его выполнил, на остальных воркерах запись живет не дольше
+# STATISTICS_CACHE_TTL. Попадание не обращается к БД.
+statistics_cache = TTLCache(maxsize=settings.STATISTICS_CACHE_SIZE, ttl=settings.STATISTICS_CACHE_TTL)
+statistics_cache_locks = KeyedLock()
+# Счетчик сбросов: загрузка, начатая до сброса, не сохраняет результат в кэш
+_statistics_invalidations = 0
+
+
+def invalidate_statistics(user_ids: Iterable[int]) -> None:
+    """
+    Сбрасывает кэшированную статистику пользователей за все периоды.
+    """
+    global _statistics_invalidations
+    _statistics_invalidations += 1
+    for user_id in user_ids:
+        for period in STATISTICS_PERIODS:
+            statistics_cache.invalidate((user_id, period))
+
+
+def _invalidate_statistics_after_commit(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """
+    Сброс после коммита, а не сразу: иначе параллельный промах успел бы
+    закэшировать статистику без еще не зафиксированных изменений.
+    """
+    user_ids = list(user_ids)
+    if user_ids:
+        event.listen(db.sync_session, "after_commit", lambda session: invalidate_statistics(user_ids), once=True)
+
+
+async def get_cached_statistics(db: AsyncSession, user_id: int, period: str) -> Tuple[str, bytes]:
+    """
+    Возвращает ETag и сериализованный StatisticsResponse. Попадание в кэш
+    не обращается к БД; при промахе ответ строится get_user_statistics,
+    одновременные промахи по одному ключу ждут первую загрузку.
+
+    :return: (ETag, JSON-тело ответа).
+    """
+    key = (user_id, period)
+    # Скользящие периоды сдвигаются со временем: запись действительна в пределах
+    # дня UTC — того же, от которого _get_period_start отсчитывает начало периода
+    window = datetime.now(timezone.utc).date() if period != "all_time" else None
+    entry = statistics_cache.get(key)
+    if entry is not None and entry[0] == window:
+        return entry[1], entry[2]
+
+    async with statistics_cache_locks.acquire(key):
+        entry = statistics_cache.peek(key)
+        if entry is not None and entry[0] == window:
+            return entry[1], entry[2]
+
+        invalidations = _statistics_invalidations
+        statistics = await get_user_statistics(db, user_id, period)
+        body = dumps(statistics.model_dump(mode="json"))
+        etag = make_etag("statistics", period, hashlib.sha1(body).hexdigest())
+        if invalidations == _statistics_invalidations:
+            statistics_cache.set(key, (window, etag, body))
+        return etag, body
+
+
+def statistics_cache_stats() -> Dict[str, Any]:
+    """
+    Счетчики кэша статистики для /metrics.
+    """
+    return {**statistics_cache.stats(), "coalesced_misses": statistics_cache_locks.waits}
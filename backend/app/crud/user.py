@@ -1,9 +1,32 @@
+from typing import Sequence
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import update
+from sqlalchemy.orm import raiseload, selectinload
 
+from app.cache import TTLCache
+from app.config import settings
+from app.crud import loaders
 from app.models import User
-from app.schemas.user import UserCreate, UserProfileUpdate
-from app.security import get_password_hash
+from app.schemas.user import UserCreate, UserProfileUpdate, Principal
+from app.security import get_password_hash_async
+
+# Колонки, достаточные для идентификации пользователя в зависимостях аутентификации
+PRINCIPAL_COLUMNS = (User.id, User.username, User.email, User.telegram_id, User.token_version)
+
+# Кэш telegram_id -> Principal для горячего пути бота.
+# Инвалидируется во всех функциях, меняющих пользователя или его telegram_id.
+telegram_principal_cache = TTLCache(
+    maxsize=settings.TELEGRAM_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.TELEGRAM_PRINCIPAL_CACHE_TTL,
+)
+
+# Кэш user_id -> token_version для проверки отзыва JWT без загрузки пользователя
+token_version_cache = TTLCache(
+    maxsize=settings.TOKEN_VERSION_CACHE_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL,
+)
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
@@ -54,6 +77,100 @@ async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> User |
     return result.scalars().first()
 
 
+async def get_principal_by_username(db: AsyncSession, username: str) -> Principal | None:
+    """
+    Получение идентификационных данных пользователя по имени без загрузки связей.
+
+    :param db: Сессия базы данных.
+    :param username: Имя пользователя.
+    :return: Principal или None.
+    """
+    result = await db.execute(select(*PRINCIPAL_COLUMNS).filter(User.username == username))
+    row = result.first()
+    return Principal(**row._mapping) if row else None
+
+
+async def get_principal_by_telegram_id(db: AsyncSession, telegram_id: int) -> Principal | None:
+    """
+    Получение идентификационных данных пользователя по Telegram ID без загрузки связей.
+    Результат кэшируется в telegram_principal_cache.
+
+    :param db: Сессия базы данных.
+    :param telegram_id: Telegram ID пользователя.
+    :return: Principal или None.
+    """
+    principal = telegram_principal_cache.get(telegram_id)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(select(*PRINCIPAL_COLUMNS).filter(User.telegram_id == telegram_id))
+    row = result.first()
+    if row is None:
+        return None
+    principal = Principal(**row._mapping)
+    telegram_principal_cache.set(telegram_id, principal)
+    return principal
+
+
+async def get_token_version(db: AsyncSession, user_id: int) -> int | None:
+    """
+    Получение текущей версии токенов пользователя (с кэшированием).
+
+    :param db: Сессия базы данных.
+    :param user_id: ID пользователя.
+    :return: Версия токенов или None, если пользователь не существует.
+    """
+    token_version = token_version_cache.get(user_id)
+    if token_version is not None:
+        return token_version
+
+    result = await db.execute(select(User.token_version).filter(User.id == user_id))
+    token_version = result.scalar_one_or_none()
+    if token_version is not None:
+        token_version_cache.set(user_id, token_version)
+    return token_version
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int) -> None:
+    """
+    Отзывает все выданные пользователю JWT, увеличивая версию токенов.
+
+    :param db: Сессия базы данных.
+    :param user_id: ID пользователя.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.telegram_id)
+    )
+    telegram_id = result.scalar_one_or_none()
+    await db.commit()
+    token_version_cache.invalidate(user_id)
+    if telegram_id is not None:
+        telegram_principal_cache.invalidate(telegram_id)
+
+
+async def get_user_with_relationships(
+    db: AsyncSession, user_id: int, relationships: Sequence[str] = ()
+) -> User | None:
+    """
+    Получение модели пользователя по ID с загрузкой только указанных связей.
+    Обращение к остальным связям вызовет ошибку вместо неявного запроса.
+
+    :param db: Сессия базы данных.
+    :param user_id: ID пользователя.
+    :param relationships: Имена связей User, которые нужно загрузить (например, "preferences").
+        Для связей из loaders.USER_RELATIONSHIP_PROFILES загружается весь подграф профиля.
+    :return: Модель пользователя или None.
+    """
+    options = [raiseload("*")]
+    for name in relationships:
+        options.extend(loaders.USER_RELATIONSHIP_PROFILES.get(name, (selectinload(getattr(User, name)),)))
+    result = await db.execute(select(User).filter(User.id == user_id).options(*options))
+    return result.scalars().first()
+
+
 async def create_user(db: AsyncSession, user: UserCreate) -> User:
     """
     Создание нового пользователя в базе данных.
@@ -62,7 +179,7 @@ async def create_user(db: AsyncSession, user: UserCreate) -> User:
     :param user: Pydantic схема с данными нового пользователя.
     :return: Созданная модель пользователя.
     """
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -89,6 +206,8 @@ async def update_user(db: AsyncSession, user_to_update: User, data: UserProfileU
     db.add(user_to_update)
     await db.commit()
     await db.refresh(user_to_update)
+    if user_to_update.telegram_id is not None:
+        telegram_principal_cache.invalidate(user_to_update.telegram_id)
     return user_to_update
 
 
@@ -101,8 +220,13 @@ async def update_user_telegram_id(db: AsyncSession, user_to_update: User, telegr
     :param telegram_id: Telegram ID для привязки.
     :return: Обновленная модель пользователя.
     """
+    previous_telegram_id = user_to_update.telegram_id
     user_to_update.telegram_id = telegram_id
     db.add(user_to_update)
     await db.commit()
     await db.refresh(user_to_update)
+    # Используется в bot_login и link_telegram_account: сбрасываем и старую, и новую привязку
+    if previous_telegram_id is not None:
+        telegram_principal_cache.invalidate(previous_telegram_id)
+    telegram_principal_cache.invalidate(telegram_id)
     return user_to_update
@@ -1,8 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
-from typing import Optional
+from typing import Optional, Tuple
 
+from app.crud import loaders
 from app.models import WorkoutPlan
 from app.schemas.workout import WorkoutPlanData
 import datetime
@@ -13,11 +14,23 @@ async def get_user_plan(db: AsyncSession, user_id: int) -> Optional[WorkoutPlan]
     Получает единственный тренировочный план пользователя.
     """
     result = await db.execute(
-        select(WorkoutPlan).filter(WorkoutPlan.user_id == user_id)
+        select(WorkoutPlan).filter(WorkoutPlan.user_id == user_id).options(*loaders.PLAN_ONLY)
     )
     return result.scalars().first()
 
 
+async def get_user_plan_version(db: AsyncSession, user_id: int) -> Optional[Tuple[int, datetime.datetime]]:
+    """
+    Возвращает (id, generated_at) плана пользователя без загрузки JSONB с днями.
+    Используется для ETag в GET /workouts/.
+    """
+    result = await db.execute(
+        select(WorkoutPlan.id, WorkoutPlan.generated_at).filter(WorkoutPlan.user_id == user_id)
+    )
+    row = result.first()
+    return (row.id, row.generated_at) if row else None
+
+
 async def delete_user_plan(db: AsyncSession, user_id: int):
     """
     Удаляет существующий план тренировок для пользователя.
@@ -1,22 +1,221 @@
-from typing import AsyncGenerator
+import re
+import time
+from typing import Any, AsyncGenerator, Dict, Hashable, Optional
 
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.cache import TTLCache
 from app.config import settings
+from app.logger import logger
+from app.query_stats import instrument_engine
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, дополнительно измеряющий время ожидания свободного соединения.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - started
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+
+def create_engine_from_settings(url: str) -> AsyncEngine:
+    """
+    Создает async engine с параметрами пула и кэшей asyncpg из Settings
+    и подключает к нему учет SQL-выражений (app/query_stats.py).
+    """
+    db_url = make_url(url)
+    connect_args = {}
+    if db_url.drivername.endswith("asyncpg"):
+        db_url = db_url.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)}
+        )
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+
+    async_engine = create_async_engine(
+        db_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+        future=True,
+    )
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+def pool_stats(async_engine: AsyncEngine) -> Dict[str, Any]:
+    """
+    Текущее состояние пула соединений для /metrics.
+    """
+    pool = async_engine.sync_engine.pool
+    stats: Dict[str, Any] = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout_seconds": settings.DB_POOL_TIMEOUT,
+    }
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "avg_wait_ms": round(pool.total_wait_seconds / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+            "max_wait_ms": round(pool.max_wait_seconds * 1000, 3),
+        })
+    return stats
+
 
 # Async engine & sessionmaker
-engine: AsyncEngine = create_async_engine(settings.DB_URL, pool_pre_ping=True, future=True)
+engine: AsyncEngine = create_engine_from_settings(settings.DB_URL)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Engine для чтения: реплика, если настроена, иначе тот же primary
+read_engine: AsyncEngine = (
+    create_engine_from_settings(settings.DB_REPLICA_URL) if settings.DB_REPLICA_URL else engine
+)
+AsyncReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Пользователи, недавно выполнявшие запись: их чтения идут на primary, пока реплика догоняет.
+# Ключ — ID пользователя (request.state.user_id, заполняется зависимостями аутентификации),
+# поэтому запись через бота защищает чтения из веб-клиента и наоборот. Кэш локален для
+# процесса; между воркерами read-your-writes обеспечивает заголовок READ_AFTER_HEADER.
+recent_writers = TTLCache(maxsize=10000, ttl=settings.DB_REPLICA_STICKY_SECONDS)
+
+# LSN primary после записи: читается после коммита на соединении запроса (_track_commit_lsn)
+# и возвращается в ответах на запись (ReadYourWritesMiddleware); клиент повторяет его
+# в следующих запросах, и чтение идет с реплики, только если она уже воспроизвела WAL
+# до этой позиции (проверка на любом воркере).
+READ_AFTER_HEADER = "X-Read-After-LSN"
+_LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
 Base = declarative_base()
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
+def sticky_key(request: Request) -> Optional[Hashable]:
+    """
+    Ключ read-your-writes: ID пользователя, если аутентификация уже выполнена,
+    иначе идентификатор клиента (заголовок бота или токен).
+    """
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is not None:
+        return ("user", user_id)
+    return request.headers.get("X-Telegram-User-ID") or request.headers.get("Authorization")
+
+
+def _track_commit_lsn(session: AsyncSession, request: Request) -> None:
     """
-    Зависимость на получение сессии. Использовать в роутерах
+    После каждого коммита сессии читает позицию WAL primary на том же соединении
+    (сессия возвращает его в пул только после события after_commit) и сохраняет ее
+    в request.state.write_lsn. Позиция после коммита не меньше LSN его записи, поэтому
+    реплика, догнавшая ее, видит изменения запроса. Отдельное соединение не занимается.
+    """
+    holder: Dict[str, Any] = {}
+
+    def after_begin(sync_session, transaction, connection):
+        holder["connection"] = connection
+
+    def after_commit(sync_session):
+        connection = holder.pop("connection", None)
+        if connection is None:
+            return
+        # Изменения уже зафиксированы: ошибка чтения позиции не должна превращать запрос в 500
+        try:
+            request.state.write_lsn = connection.exec_driver_sql("SELECT pg_current_wal_lsn()::text").scalar()
+        except Exception as e:
+            logger.warning("Не удалось получить LSN primary: %s", e)
+
+    event.listen(session.sync_session, "after_begin", after_begin)
+    event.listen(session.sync_session, "after_commit", after_commit)
+
+
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Зависимость на получение сессии (primary). Использовать в роутерах.
+    Записи отмечаются для read-your-writes в ReadYourWritesMiddleware; при настроенной
+    реплике LSN коммитов запросов на запись сохраняется в request.state (_track_commit_lsn).
     """
     async with AsyncSessionLocal() as session:
+        if read_engine is not engine and request.method not in SAFE_METHODS:
+            _track_commit_lsn(session, request)
+        yield session
+
+
+async def _replica_caught_up(session: AsyncSession, lsn: str) -> bool:
+    """
+    Проверяет, что реплика воспроизвела WAL до позиции lsn.
+    """
+    try:
+        result = await session.execute(
+            text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"), {"lsn": lsn}
+        )
+        return bool(result.scalar())
+    except Exception:
+        await session.rollback()
+        return False
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Зависимость на получение сессии для read-only маршрутов.
+    Использует реплику, если она настроена и пользователь не выполнял запись в последние
+    DB_REPLICA_STICKY_SECONDS секунд на этом воркере, а LSN из заголовка READ_AFTER_HEADER
+    (если передан) уже воспроизведен репликой; иначе — primary.
+
+    Зависимость аутентификации должна быть объявлена в маршруте раньше этой:
+    тогда request.state.user_id уже заполнен.
+    """
+    if read_engine is engine:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    key = sticky_key(request)
+    if key and recent_writers.get(key):
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    lsn = request.headers.get(READ_AFTER_HEADER)
+    if lsn and _LSN_PATTERN.match(lsn):
+        async with AsyncReadSessionLocal() as replica_session:
+            if await _replica_caught_up(replica_session, lsn):
+                yield replica_session
+                return
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    async with AsyncReadSessionLocal() as session:
         yield session
 
 
@@ -25,4 +224,4 @@ async def init_db() -> None:
     Инициализация БД
     """
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
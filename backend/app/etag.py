@@ -0,0 +1,41 @@
+import hashlib
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """
+    Строит сильный ETag из дешевых маркеров версии (id, время генерации, ревизия и т.п.).
+    """
+    raw = "|".join(str(part) for part in parts)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Проверяет заголовок If-None-Match (слабое сравнение, как того требует RFC 9110).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in header.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """
+    Добавляет ETag к ответу и просит клиента перепроверять его при каждом запросе.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def not_modified_response(etag: str) -> Response:
+    """
+    Ответ 304 без тела: ORM-дерево не строится и не сериализуется.
+    """
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -1,15 +1,15 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 
 from app.logger import logger
+from app.responses import FastJSONResponse
 
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     logger.warning("HTTPException: %s %s", request.url.path, exc.detail)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "status_code": exc.status_code,
@@ -23,7 +23,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.warning("Validation error on %s: %s", request.url.path, exc.errors())
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=422,
         content={
             "status_code": 422,
@@ -37,7 +37,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 async def generic_exception_handler(request: Request, exc: Exception):
     logger.exception("Unhandled exception on %s: %s", request.url.path, exc)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "status_code": HTTP_500_INTERNAL_SERVER_ERROR,
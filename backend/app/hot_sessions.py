@@ -0,0 +1,392 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.config import settings
+from app.crud import session as crud_session, statistics as crud_statistics
+from app.db import AsyncSessionLocal
+from app.logger import logger
+from app.models import SessionDay, SessionExercise, SessionSet, SessionStatus, WorkoutSession
+from app.schemas.session import (
+    ActiveWorkoutSession,
+    NextSessionSet,
+    SessionSet as SessionSetSchema,
+    SessionSetUpdateResult,
+)
+
+_DONE = (SessionStatus.COMPLETED, SessionStatus.SKIPPED)
+
+
+class HotSet:
+    __slots__ = (
+        "id", "session_exercise_id", "order", "status", "plan_reps_min", "plan_reps_max",
+        "plan_weight", "reps_done", "weight_lifted", "exercise",
+    )
+
+    def __init__(self, data, exercise: "HotExercise"):
+        self.id = data.id
+        self.session_exercise_id = data.session_exercise_id
+        self.order = data.order
+        self.status = data.status
+        self.plan_reps_min = data.plan_reps_min
+        self.plan_reps_max = data.plan_reps_max
+        self.plan_weight = data.plan_weight
+        self.reps_done = data.reps_done
+        self.weight_lifted = data.weight_lifted
+        self.exercise = exercise
+
+
+class HotExercise:
+    __slots__ = ("id", "session_day_id", "plan_exercise_name", "order", "status", "session_sets", "day")
+
+    def __init__(self, data, day: "HotDay"):
+        self.id = data.id
+        self.session_day_id = data.session_day_id
+        self.plan_exercise_name = data.plan_exercise_name
+        self.order = data.order
+        self.status = data.status
+        self.day = day
+        self.session_sets = [HotSet(s, self) for s in sorted(data.session_sets, key=lambda s: (s.order, s.id))]
+
+
+class HotDay:
+    __slots__ = ("id", "workout_session_id", "plan_day_name", "order", "status", "session_exercises")
+
+    def __init__(self, data):
+        self.id = data.id
+        self.workout_session_id = data.workout_session_id
+        self.plan_day_name = data.plan_day_name
+        self.order = data.order
+        self.status = data.status
+        self.session_exercises = [
+            HotExercise(e, self) for e in sorted(data.session_exercises, key=lambda e: (e.order, e.id))
+        ]
+
+
+class HotSession:
+    """
+    Дерево активной сессии в памяти. Имена атрибутов совпадают с моделями, поэтому
+    ActiveWorkoutSession.model_validate строит ответ прямо из этого объекта.
+
+    dirty — измененные подходы/упражнения/дни, которые еще не записаны в БД.
+    records — лучшие (вес, повторения) по упражнениям: сохраненные рекорды пользователя
+    с учетом выполненных подходов этой сессии; загружаются при первом обращении.
+    """
+    __slots__ = (
+        "id", "user_id", "workout_plan_id", "started_at", "completed_at", "status", "duration_minutes",
+        "rating", "notes", "revision", "session_days", "sets_by_id", "dirty", "touched_at", "flush_lock",
+        "records",
+    )
+
+    def __init__(self, data, revision: int):
+        self.id = data.id
+        self.user_id = data.user_id
+        self.workout_plan_id = data.workout_plan_id
+        self.started_at = data.started_at
+        self.completed_at = data.completed_at
+        self.status = data.status
+        self.duration_minutes = data.duration_minutes
+        self.rating = data.rating
+        self.notes = data.notes
+        self.revision = revision
+        self.session_days = [HotDay(d) for d in sorted(data.session_days, key=lambda d: (d.order, d.id))]
+        self.sets_by_id: Dict[int, HotSet] = {
+            s.id: s for d in self.session_days for e in d.session_exercises for s in e.session_sets
+        }
+        self.dirty: set = set()
+        self.touched_at = time.monotonic()
+        self.flush_lock = asyncio.Lock()
+        self.records: Optional[Dict[str, Tuple[float, int]]] = None
+
+    def set_records(self, records: Dict[str, Tuple[float, int]]) -> None:
+        """
+        Запоминает рекорды пользователя, дополняя их уже выполненными подходами сессии
+        (в user_personal_records они попадут только при ее завершении).
+        """
+        for s in self.sets_by_id.values():
+            if s.status == SessionStatus.COMPLETED and s.weight_lifted is not None and s.reps_done is not None:
+                attempt = (float(s.weight_lifted), s.reps_done)
+                best = records.get(s.exercise.plan_exercise_name)
+                if best is None or attempt > best:
+                    records[s.exercise.plan_exercise_name] = attempt
+        self.records = records
+
+    def next_pending_set(self) -> Optional[NextSessionSet]:
+        for day in self.session_days:
+            for exercise in day.session_exercises:
+                for s in exercise.session_sets:
+                    if s.status == SessionStatus.PENDING:
+                        return NextSessionSet(
+                            **{name: getattr(s, name) for name in SessionSetSchema.model_fields},
+                            plan_exercise_name=exercise.plan_exercise_name,
+                        )
+        return None
+
+
+class HotSessionStore:
+    """
+    In-process хранилище активных сессий с отложенной записью (write-behind).
+
+    Чтение /sessions/active и отметки подходов обслуживаются из памяти; изменения
+    пишутся в БД фоновой задачей раз в HOT_SESSION_FLUSH_INTERVAL_SECONDS
+    (пакетный UPDATE по первичному ключу на каждый уровень дерева) и немедленно —
+    при завершении сессии или перед операциями, которые работают с БД напрямую.
+
+    Источник истины при восстановлении — Postgres: при промахе (в т.ч. после
+    перезапуска процесса) дерево загружается с primary. При аварийном завершении
+    теряются отметки не старше интервала записи.
+
+    Хранилище локально для процесса: при нескольких воркерах запросы одного
+    пользователя должны попадать на один воркер (sticky-маршрутизация по
+    X-Telegram-User-ID или Authorization), иначе включать его нельзя.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, flush_interval: float = 2.0, idle_seconds: float = 600):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self._sessions: Dict[int, HotSession] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+
+    # --- Чтение ---
+
+    async def get(self, user_id: int) -> Optional[HotSession]:
+        """
+        Возвращает активную сессию пользователя из памяти, при промахе загружает ее с primary.
+        Сессия, завершенная в памяти, но еще не записанная (см. finishing), не возвращается.
+        """
+        hot = self._sessions.get(user_id)
+        if hot is not None:
+            if hot.status != SessionStatus.IN_PROGRESS:
+                return None
+            self.hits += 1
+            hot.touched_at = time.monotonic()
+            if hot.records is None:
+                # Сессия помещена через put: рекорды еще не загружены
+                async with self._session_factory() as db:
+                    records = await crud_statistics.get_personal_records(db, user_id)
+                if hot.records is None:
+                    hot.set_records(records)
+            return hot
+
+        self.misses += 1
+        async with self._session_factory() as db:
+            session = await crud_session.get_active_session_by_user_id(db, user_id)
+            if session is None:
+                return None
+            records = await crud_statistics.get_personal_records(db, user_id)
+        # Пока шла загрузка, сессию мог загрузить параллельный запрос: оставляем первую
+        hot = self._sessions.setdefault(user_id, HotSession(session, session.revision))
+        if hot.records is None:
+            hot.set_records(records)
+        return hot
+
+    def finishing(self, user_id: int) -> bool:
+        """
+        True, если сессия пользователя завершена в памяти, но запись в БД еще не удалась:
+        в БД она пока IN_PROGRESS, поэтому отмечать ее подходы через БД нельзя.
+        """
+        hot = self._sessions.get(user_id)
+        return hot is not None and hot.status != SessionStatus.IN_PROGRESS
+
+    def put(self, session: ActiveWorkoutSession, revision: int = 0) -> None:
+        """
+        Помещает только что созданную сессию в хранилище (без повторной загрузки).
+        """
+        self._sessions[session.user_id] = HotSession(session, revision)
+
+    # --- Изменения ---
+
+    def apply_set(
+            self, hot: HotSession, set_id: int, status: SessionStatus,
+            reps_done: Optional[int] = None, weight_lifted: Optional[float] = None
+    ) -> Optional[SessionSetUpdateResult]:
+        """
+        Отмечает подход в памяти и пересчитывает статусы упражнения, дня и сессии так же,
+        как complete_set/skip_set; новый рекорд определяется по hot.records.
+        Выполняется без await, поэтому атомарно в пределах воркера.
+
+        :return: Результат или None, если подход не в статусе PENDING.
+        """
+        s = hot.sets_by_id[set_id]
+        if s.status != SessionStatus.PENDING or hot.status != SessionStatus.IN_PROGRESS:
+            return None
+
+        s.status = status
+        new_personal_record = False
+        if status == SessionStatus.COMPLETED:
+            s.reps_done = reps_done
+            s.weight_lifted = weight_lifted
+            if hot.records is not None:
+                # Как в БД: weight_lifted хранится в NUMERIC(6, 2)
+                attempt = (round(float(weight_lifted), 2), reps_done)
+                best = hot.records.get(s.exercise.plan_exercise_name)
+                if best is None or attempt > best:
+                    hot.records[s.exercise.plan_exercise_name] = attempt
+                    new_personal_record = True
+        hot.dirty.add(s)
+
+        exercise = s.exercise
+        if exercise.status != SessionStatus.COMPLETED and all(x.status in _DONE for x in exercise.session_sets):
+            exercise.status = SessionStatus.COMPLETED
+            hot.dirty.add(exercise)
+            day = exercise.day
+            if day.status != SessionStatus.COMPLETED and all(x.status in _DONE for x in day.session_exercises):
+                day.status = SessionStatus.COMPLETED
+                hot.dirty.add(day)
+                # Сессия завершается автоматически, когда выполнены все ее дни (completed_at не заполняется)
+                if all(x.status in _DONE for x in hot.session_days):
+                    hot.status = SessionStatus.COMPLETED
+        hot.revision += 1
+        hot.touched_at = time.monotonic()
+
+        return SessionSetUpdateResult(
+            **{name: getattr(s, name) for name in SessionSetSchema.model_fields},
+            session_status=hot.status,
+            new_personal_record=new_personal_record,
+            next_set=hot.next_pending_set(),
+        )
+
+    # --- Запись в БД ---
+
+    async def flush(self, hot: HotSession) -> None:
+        """
+        Записывает накопленные изменения сессии в БД одной транзакцией.
+        При ошибке изменения остаются в очереди на следующую попытку.
+        """
+        async with hot.flush_lock:
+            if not hot.dirty:
+                return
+            dirty, hot.dirty = hot.dirty, set()
+            set_rows: List[Dict[str, Any]] = []
+            exercise_rows: List[Dict[str, Any]] = []
+            day_rows: List[Dict[str, Any]] = []
+            for obj in dirty:
+                if isinstance(obj, HotSet):
+                    set_rows.append({
+                        "id": obj.id, "status": obj.status,
+                        "reps_done": obj.reps_done, "weight_lifted": obj.weight_lifted,
+                    })
+                elif isinstance(obj, HotExercise):
+                    exercise_rows.append({"id": obj.id, "status": obj.status})
+                else:
+                    day_rows.append({"id": obj.id, "status": obj.status})
+
+            try:
+                async with self._session_factory() as db:
+                    # Сессия первой: ее строка блокируется до коммита. Сессию мог завершить
+                    # или удалить сборщик брошенных тренировок (app/session_reaper.py) —
+                    # тогда изменения отбрасываются, а не возвращают ее в IN_PROGRESS.
+                    result = await db.execute(
+                        update(WorkoutSession)
+                        .where(WorkoutSession.id == hot.id, WorkoutSession.status == SessionStatus.IN_PROGRESS)
+                        .values(status=hot.status, revision=hot.revision)
+                    )
+                    if result.rowcount == 0:
+                        await db.rollback()
+                        if self._sessions.get(hot.user_id) is hot:
+                            del self._sessions[hot.user_id]
+                        return
+                    # UPDATE по первичному ключу пакетом (executemany) на каждый уровень
+                    if set_rows:
+                        await db.execute(update(SessionSet), set_rows)
+                    if exercise_rows:
+                        await db.execute(update(SessionExercise), exercise_rows)
+                    if day_rows:
+                        await db.execute(update(SessionDay), day_rows)
+                    if hot.status == SessionStatus.COMPLETED:
+                        # Сессия завершилась в памяти: учитываем ее в дневных агрегатах
+                        await crud_statistics.add_sessions_to_rollups(db, [hot.id])
+                    await db.commit()
+            except Exception:
+                hot.dirty |= dirty
+                self.flush_errors += 1
+                raise
+            self.flushes += 1
+            self.flushed_rows += len(dirty)
+
+    async def flush_and_evict(self, user_id: int) -> None:
+        """
+        Записывает изменения сессии пользователя и убирает ее из памяти.
+        Вызывается перед операциями, которые читают или меняют сессию в БД напрямую
+        (завершение, пакетная отметка), и после автоматического завершения сессии.
+        """
+        hot = self._sessions.get(user_id)
+        if hot is None:
+            return
+        await self.flush(hot)
+        if self._sessions.get(user_id) is hot:
+            del self._sessions[user_id]
+
+    def evict(self, user_id: int) -> None:
+        """
+        Убирает сессию из памяти без записи (сессия удаляется при отмене).
+        """
+        self._sessions.pop(user_id, None)
+
+    async def flush_all(self) -> None:
+        """
+        Записывает изменения всех сессий и вытесняет завершенные и давно не использовавшиеся.
+        """
+        now = time.monotonic()
+        for user_id, hot in list(self._sessions.items()):
+            try:
+                await self.flush(hot)
+            except Exception as e:
+                logger.exception("Hot session flush failed for session %s: %s", hot.id, e)
+                continue
+            if hot.dirty or self._sessions.get(user_id) is not hot:
+                continue
+            if hot.status != SessionStatus.IN_PROGRESS or now - hot.touched_at > self.idle_seconds:
+                del self._sessions[user_id]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_all()
+
+    def start(self) -> None:
+        """
+        Запускает фоновую запись изменений.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновую запись и сохраняет оставшиеся изменения.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_all()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "dirty_rows": sum(len(hot.dirty) for hot in self._sessions.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+        }
+
+
+hot_sessions = HotSessionStore(
+    flush_interval=settings.HOT_SESSION_FLUSH_INTERVAL_SECONDS,
+    idle_seconds=settings.HOT_SESSION_IDLE_SECONDS,
+)
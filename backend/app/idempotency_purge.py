@@ -0,0 +1,66 @@
+"""
+Удаление истекших ключей идемпотентности (IDEMPOTENCY_KEY_TTL_SECONDS) пакетами
+по IDEMPOTENCY_PURGE_BATCH_SIZE.
+
+Запуск в процессе API: включен по умолчанию (IDEMPOTENCY_PURGE_ENABLED=true),
+проход раз в IDEMPOTENCY_PURGE_INTERVAL_SECONDS. При нескольких воркерах проходы
+пересекаются безопасно: каждый удаляет только то, что еще не удалили другие.
+Запуск отдельно (cron, k8s CronJob) — тогда в API задачу можно выключить:
+
+    python -m app.idempotency_purge [--batch-size 1000] [--loop] [--interval 3600]
+"""
+import argparse
+import asyncio
+from typing import Any, Dict
+
+from app.config import settings
+from app.crud import idempotency as crud_idempotency
+from app.db import AsyncSessionLocal
+from app.periodic import PeriodicTask, add_cli_arguments, run_cli
+
+
+class IdempotencyKeyPurger(PeriodicTask):
+    name = "Idempotency key purge"
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size: int = 1000, interval: float = 3600):
+        super().__init__(interval)
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.keys_purged = 0
+
+    async def run_pass(self) -> Dict[str, Any]:
+        """
+        Удаляет все истекшие ключи, каждый пакет — одно выражение и один коммит.
+        """
+        result = {"batches": 0, "keys_purged": 0}
+        while True:
+            async with self._session_factory() as db:
+                deleted = await crud_idempotency.purge_expired_keys(db, self.batch_size)
+            result["batches"] += 1
+            result["keys_purged"] += deleted
+            if deleted < self.batch_size:
+                break
+
+        self.keys_purged += result["keys_purged"]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "keys_purged": self.keys_purged}
+
+
+idempotency_purger = IdempotencyKeyPurger(
+    batch_size=settings.IDEMPOTENCY_PURGE_BATCH_SIZE,
+    interval=settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Удаляет истекшие ключи идемпотентности.")
+    add_cli_arguments(parser, settings.IDEMPOTENCY_PURGE_BATCH_SIZE, settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
+    args = parser.parse_args()
+    purger = IdempotencyKeyPurger(batch_size=args.batch_size, interval=args.interval)
+    asyncio.run(run_cli(purger, args.loop))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,21 @@ from app import schemas
 from app.auth import authenticate_user
 from app.exceptions import http_exception_handler, validation_exception_handler, generic_exception_handler
 from app.middleware.response_formatter import ResponseFormatterMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.query_stats import QueryStatsMiddleware
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
+from app.responses import FastJSONResponse
 from app.logger import logger
+from app.config import settings
 from fastapi import APIRouter, HTTPException, status, FastAPI, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import init_db, engine, get_session
+from app.db import init_db, engine, read_engine, get_session, READ_AFTER_HEADER
+from app.hot_sessions import hot_sessions
+from app.idempotency_purge import idempotency_purger
+from app.session_reaper import session_reaper
 from app.routers import root as root_router
 from app.routers import auth as auth_router
 from app.routers import users as users_router
@@ -19,7 +27,7 @@ from app.routers import workouts as workouts_router
 from app.routers import options as options_router
 from app.routers import sessions as sessions_router
 from app.routers import statistics as statistics_router
-from app.security import create_access_token
+from app.security import create_access_token, password_hasher
 
 
 from fastapi_cache import FastAPICache
@@ -28,7 +36,7 @@ from fastapi_cache.backends.inmemory import InMemoryBackend
 
 def create_token_app() -> FastAPI:
     """Приложение только для /token — без middleware и форматирования."""
-    token_app = FastAPI()
+    token_app = FastAPI(default_response_class=FastJSONResponse)
 
     @token_app.post("/token", response_model=schemas.jwt.Token, include_in_schema=False)
     async def get_token_for_swagger(
@@ -42,14 +50,16 @@ def create_token_app() -> FastAPI:
                 detail="Неверное имя пользователя или пароль.",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        access_token = create_access_token(subject=user.username)
+        access_token = create_access_token(
+            subject=user.username, user_id=user.id, token_version=user.token_version
+        )
         return {"access_token": access_token, "token_type": "bearer"}
 
     return token_app
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Simple FastAPI + Postgres (async)")
+    app = FastAPI(title="Simple FastAPI + Postgres (async)", default_response_class=FastJSONResponse)
 
     app.add_middleware(
         CORSMiddleware,
@@ -57,9 +67,25 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[READ_AFTER_HEADER],
     )
 
     app.add_middleware(ResponseFormatterMiddleware)
+    if read_engine is not engine:
+        # Отметка записей для чтения с реплики (read-your-writes)
+        app.add_middleware(ReadYourWritesMiddleware)
+    # Внешний по отношению к форматтеру: статистика SQL доступна при сборке meta
+    app.add_middleware(QueryStatsMiddleware)
+
+    # Добавляется последним, т.е. является внешним: сжимает уже обернутый ответ
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MIN_SIZE,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+            precompressed_paths=settings.COMPRESSION_PRECOMPRESSED_PATHS,
+        )
 
     app.include_router(root_router.router)
     app.include_router(auth_router.router)
@@ -93,13 +119,33 @@ def create_app() -> FastAPI:
         FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
         logger.info("Cache initialized.")
 
+        if settings.HOT_SESSION_STORE_ENABLED:
+            hot_sessions.start()
+            logger.info("Hot session store started.")
+
+        if settings.STALE_SESSION_REAPER_ENABLED:
+            session_reaper.start()
+            logger.info("Stale session reaper started.")
+
+        if settings.IDEMPOTENCY_PURGE_ENABLED:
+            idempotency_purger.start()
+            logger.info("Idempotency key purge started.")
+
     @app.on_event("shutdown")
     async def on_shutdown():
+        await session_reaper.stop()
+        await idempotency_purger.stop()
+        if settings.HOT_SESSION_STORE_ENABLED:
+            logger.info("Shutdown: сохраняем активные сессии из памяти...")
+            await hot_sessions.stop()
         logger.info("Shutdown: закрываем engine...")
         try:
             await engine.dispose()
+            if read_engine is not engine:
+                await read_engine.dispose()
         except Exception:
             pass
+        password_hasher.shutdown()
 
     return app
 
@@ -0,0 +1,242 @@
+import gzip
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Выбирает кодировку по Accept-Encoding: допустимую (br — если доступен brotli, gzip)
+    с наибольшим q; при равных q предпочитается br. Кодировки с q=0 считаются запрещенными.
+    """
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    weights = {name: accepted.get(name, accepted.get("*", 0.0)) for name in candidates}
+    # max возвращает первый из равных: порядок candidates задает предпочтение br
+    best = max(candidates, key=lambda name: weights[name])
+    return best if weights[best] > 0 else None
+
+
+def _weak_etag(etag: str) -> str:
+    """
+    Сжатое представление отличается побайтно от исходного и от другой кодировки,
+    поэтому сильный ETag ответа становится слабым (как в nginx). etag_matches
+    сравнивает слабо, поэтому условные запросы продолжают получать 304.
+    """
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+class CompressionStats:
+    """
+    Отчет по маршрутам: размеры ответов до и после сжатия, сэкономленные байты,
+    выбранные кодировки и затраты CPU на сжатие.
+    """
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "responses": 0,
+            "compressed": 0,
+            "precompressed_hits": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "max_bytes_in": 0,
+            "compress_ms": 0.0,
+            "encodings": defaultdict(int),
+        })
+
+    def record(
+        self, route: str, encoding: str, bytes_in: int, bytes_out: int, compress_seconds: float, reused: bool
+    ) -> None:
+        """
+        :param encoding: Content-Encoding ответа или "identity", если он отправлен без сжатия.
+        """
+        stats = self.routes[route]
+        stats["responses"] += 1
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["max_bytes_in"] = max(stats["max_bytes_in"], bytes_in)
+        stats["encodings"][encoding] += 1
+        if encoding != "identity":
+            stats["compressed"] += 1
+        if reused:
+            stats["precompressed_hits"] += 1
+        stats["compress_ms"] += compress_seconds * 1000
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for route, stats in self.routes.items():
+            responses = stats["responses"]
+            result[route] = {
+                **stats,
+                "encodings": dict(stats["encodings"]),
+                "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+                "avg_bytes_in": round(stats["bytes_in"] / responses) if responses else 0,
+                "avg_bytes_out": round(stats["bytes_out"] / responses) if responses else 0,
+                "compression_ratio": round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else 1.0,
+                "compress_ms": round(stats["compress_ms"], 3),
+            }
+        return result
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы gzip/brotli в зависимости от Accept-Encoding, если тело больше порога.
+
+    Должен быть внешним по отношению к ResponseFormatterMiddleware, чтобы сжимался уже
+    обернутый ответ. Для путей из precompressed_paths сжатые байты переиспользуются
+    по ключу (путь, ETag, кодировка), пока ETag ответа не изменится; ETag сжатого
+    ответа отдается слабым (_weak_etag). Размеры учитываются в compression_stats
+    и для ответов без сжатия.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        precompressed_paths: Tuple[str, ...] = (),
+        precompressed_cache: Optional[TTLCache] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.precompressed_paths = precompressed_paths
+        self.precompressed_cache = precompressed_cache or TTLCache(maxsize=256, ttl=3600)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = _CompressionResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send, encoding: Optional[str]):
+        self._middleware = middleware
+        self._scope = scope
+        self._send = send
+        self._encoding = encoding
+        self._start_message: Optional[Message] = None
+        self._chunks: List[bytes] = []
+        self._active = False
+        # Размер ответа, который отправляется без буферизации (только для отчета)
+        self._passthrough_bytes: Optional[int] = None
+
+    def _route_name(self) -> str:
+        route = self._scope.get("route")
+        return getattr(route, "path", None) or "<unmatched>"
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            ctype = headers.get("content-type", "").lower()
+            compressible = (
+                message["status"] not in (204, 304)
+                and "content-encoding" not in headers
+                and any(ctype.startswith(t) for t in COMPRESSIBLE_TYPES)
+            )
+            self._active = compressible and self._encoding is not None
+            if not self._active:
+                if compressible:
+                    self._passthrough_bytes = 0
+                elif message["status"] == 304 and self._encoding is not None and "etag" in headers:
+                    # 304 подтверждает сжатое представление: ETag тот же, что у ответа 200
+                    mutable = MutableHeaders(scope=message)
+                    mutable["etag"] = _weak_etag(mutable["etag"])
+                    mutable.add_vary_header("Accept-Encoding")
+                await self._send(message)
+                return
+            self._start_message = message
+            return
+
+        if message["type"] != "http.response.body" or not self._active:
+            if message["type"] == "http.response.body" and self._passthrough_bytes is not None:
+                self._passthrough_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    size = self._passthrough_bytes
+                    compression_stats.record(self._route_name(), "identity", size, size, 0.0, reused=False)
+            await self._send(message)
+            return
+
+        self._chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+
+        body = b"".join(self._chunks)
+        self._chunks = []
+        start_message = self._start_message
+        headers = MutableHeaders(scope=start_message)
+        headers.add_vary_header("Accept-Encoding")
+
+        middleware = self._middleware
+        route = self._route_name()
+        if len(body) < middleware.minimum_size:
+            compression_stats.record(route, "identity", len(body), len(body), 0.0, reused=False)
+            await self._send(start_message)
+            await self._send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        cache_key = None
+        etag = headers.get("etag")
+        path = self._scope["path"]
+        if etag and any(path.startswith(p) for p in middleware.precompressed_paths):
+            query = self._scope.get("query_string", b"").decode("latin-1")
+            cache_key = (path, query, etag, self._encoding)
+
+        compressed = middleware.precompressed_cache.get(cache_key) if cache_key else None
+        reused = compressed is not None
+        started = time.perf_counter()
+        if compressed is None:
+            compressed = middleware.compress(body, self._encoding)
+            if cache_key:
+                middleware.precompressed_cache.set(cache_key, compressed)
+        elapsed = 0.0 if reused else time.perf_counter() - started
+
+        compression_stats.record(route, self._encoding, len(body), len(compressed), elapsed, reused=reused)
+        headers["content-encoding"] = self._encoding
+        headers["content-length"] = str(len(compressed))
+        if etag:
+            headers["etag"] = _weak_etag(etag)
+        await self._send(start_message)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
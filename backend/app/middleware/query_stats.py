@@ -0,0 +1,48 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.logger import logger
+from app.query_stats import track_queries
+
+
+class QueryStatsMiddleware:
+    """
+    Считает SQL-выражения, строки и время в БД для каждого запроса и пишет их в access-лог.
+
+    Должен быть внешним по отношению к ResponseFormatterMiddleware: тогда статистика
+    доступна при формировании конверта (поле meta.db в режиме DEBUG).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                logger.info(
+                    "%s %s %s %.1fms sql: %d statements, %d rows, %.1fms",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    elapsed_ms,
+                    stats.statements,
+                    stats.rows,
+                    stats.db_time_seconds * 1000,
+                )
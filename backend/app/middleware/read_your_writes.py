@@ -0,0 +1,41 @@
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db import READ_AFTER_HEADER, SAFE_METHODS, recent_writers, sticky_key
+
+
+class ReadYourWritesMiddleware:
+    """
+    Отмечает успешные запросы на запись для read-your-writes при чтении с реплики:
+      - ID пользователя попадает в recent_writers (чтения на этом воркере идут на primary);
+      - в ответ добавляется заголовок READ_AFTER_HEADER с позицией WAL primary после
+        коммита запроса. Клиент повторяет его в следующих запросах, и любой воркер
+        читает с реплики, только если она уже догнала эту позицию (см. get_read_session).
+
+    Позицию читает сессия запроса на своем соединении сразу после коммита
+    (request.state.write_lsn, см. app.db._track_commit_lsn): middleware к БД не обращается.
+    Отметка выполняется до отправки заголовков ответа: маршруты коммитят изменения
+    до возврата ответа. Подключается, только если настроена реплика.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                request = Request(scope)
+                key = sticky_key(request)
+                if key:
+                    recent_writers.set(key, True)
+                lsn = getattr(request.state, "write_lsn", None)
+                if lsn:
+                    MutableHeaders(scope=message)[READ_AFTER_HEADER] = lsn
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,13 +1,13 @@
-import json
 import time
-from typing import List
+from typing import List, Optional
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
-from starlette.types import ASGIApp
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.config import settings
 from app.logger import logger
+from app.query_stats import current_query_stats
+from app.responses import dumps, loads
 
 
 def _is_excluded_path(path: str, excluded: List[str]) -> bool:
@@ -17,7 +17,68 @@ def _is_excluded_path(path: str, excluded: List[str]) -> bool:
     return False
 
 
-class ResponseFormatterMiddleware(BaseHTTPMiddleware):
+def _is_already_formatted(body: bytes) -> bool:
+    """
+    Проверяет, что тело уже имеет стандартизированный вид (например, ответ exception handler'а).
+    Разбор JSON выполняется только если в теле встречаются оба ключа, т.е. практически
+    только для небольших ответов с ошибками.
+    """
+    if b'"status_code"' not in body or b'"data"' not in body:
+        return False
+    try:
+        payload = loads(body)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and "status_code" in payload and "data" in payload
+
+
+# Первый байт JSON-значения: объект, массив, строка, число, true/false/null
+_JSON_VALUE_START = b'{["-0123456789tfn'
+
+
+def build_envelope(body: bytes, status_code: int, path: str, meta: Optional[dict] = None) -> bytes:
+    """
+    Оборачивает уже сериализованное JSON-тело в стандартный формат ответа
+    без повторного разбора и сериализации: готовые байты вставляются между
+    заранее сформированными префиксом и суффиксом.
+    """
+    # Пустое тело раньше превращалось в пустую строку в поле data
+    payload = body if body.strip() else b'""'
+    # Тело, которое не начинается с JSON-значения (например, текст с неверным content-type),
+    # вставляется строкой, иначе сам конверт перестал бы быть корректным JSON
+    if payload.lstrip()[:1] not in _JSON_VALUE_START:
+        payload = dumps(body.decode("utf-8", errors="replace"))
+    if status_code >= 400:
+        error_field, data_field = payload, b"null"
+    else:
+        error_field, data_field = b"null", payload
+
+    if meta is None:
+        meta = {"ts": int(time.time())}
+
+    return b"".join((
+        b'{"status_code":', str(status_code).encode(),
+        b',"error":', error_field,
+        b',"data":', data_field,
+        b',"path":', dumps(path),
+        b',"meta":', dumps(meta),
+        b"}",
+    ))
+
+
+def _build_meta() -> Optional[dict]:
+    """
+    В режиме DEBUG добавляет в meta статистику SQL текущего запроса (см. QueryStatsMiddleware).
+    """
+    if not settings.DEBUG:
+        return None
+    stats = current_query_stats()
+    if stats is None:
+        return None
+    return {"ts": int(time.time()), "db": stats.as_dict()}
+
+
+class ResponseFormatterMiddleware:
     """
     Middleware, который стандартизирует JSON-ответы сервера в формате:
     {
@@ -28,10 +89,13 @@ class ResponseFormatterMiddleware(BaseHTTPMiddleware):
       "meta": {...} (опционально)
     }
     Не оборачивает non-JSON ответы, статические ресурсы, openapi/docs и streaming/file responses.
+
+    Реализован как чистый ASGI middleware: тело ответа собирается из чанков один раз
+    и вставляется в конверт как есть, без json.loads/json.dumps.
     """
 
     def __init__(self, app: ASGIApp, exclude_paths: List[str] = None):
-        super().__init__(app)
+        self.app = app
         self.exclude_paths = exclude_paths or [
             "/openapi.json",
             "/docs",
@@ -41,78 +105,64 @@ class ResponseFormatterMiddleware(BaseHTTPMiddleware):
             "/token/token",
         ]
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Пропускаем служебные пути (docs / openapi / static)
-        if _is_excluded_path(path, self.exclude_paths):
-            return await call_next(request)
+        if scope["type"] != "http" or _is_excluded_path(scope["path"], self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
 
+        responder = _EnvelopeResponder(send, scope["path"])
         try:
-            response: Response = await call_next(request)
+            await self.app(scope, receive, responder.send)
         except Exception as exc:
             # если upstream упало — пустим дальше (будет обработано глобальным handler'ом)
             logger.exception("Exception raised in call_next: %s", exc)
             raise
 
-        # Если ответ не имеет заголовка Content-Type с application/json -> не оборачиваем
-        ctype = response.headers.get("content-type", "")
-        if "application/json" not in ctype.lower():
-            return response
-
-        # Не оборачиваем 204 No Content
-        if response.status_code == 204:
-            return response
 
-        # Извлекаем тело ответа (response.body_iterator используется у StreamingResponse)
-        body_bytes = b""
-        try:
-            async for chunk in response.body_iterator:
-                body_bytes += chunk
-        except Exception:
-            # Если не можем прочитать - возвращаем оригинал
-            logger.warning("Не удалось прочитать body_iterator, возвращаем оригинальный Response")
-            return response
-
-        # Восстановим оригинальные заголовки после прочтения body_iterator
-        orig_headers = dict(response.headers)
+class _EnvelopeResponder:
+    """
+    Перехватывает ASGI-сообщения одного ответа и при необходимости оборачивает тело.
+    """
 
-        # Попробуем распарсить JSON
-        try:
-            payload = json.loads(body_bytes.decode("utf-8"))
-        except Exception:
-            # Если тело не JSON (или не валидный JSON) — вернём как text в поле data
-            try:
-                payload = body_bytes.decode("utf-8")
-            except Exception:
-                payload = None
-
-        # Если payload уже в стандартизированном виде - не оборачиваем повторно
-        if isinstance(payload, dict) and "status_code" in payload and "data" in payload:
-            new_content = payload
-        else:
-            status = response.status_code
-            if status >= 400:
-                error_field = payload
-                data_field = None
-            else:
-                error_field = None
-                data_field = payload
-
-            new_content = {
-                "status_code": status,
-                "error": error_field,
-                "data": data_field,
-                "path": str(request.url.path),
-                "meta": {"ts": int(time.time())},
-            }
-
-        # Создаём новый JSONResponse и восстанавливаем заголовки
-        new_resp = JSONResponse(content=new_content, status_code=response.status_code)
-        for k, v in orig_headers.items():
-            # Не перезаписываем content-type и content-length автоматически (JSONResponse сам установит)
-            if k.lower() in ("content-length", "content-type"):
-                continue
-            new_resp.headers[k] = v
-
-        return new_resp
+    def __init__(self, send: Send, path: str):
+        self._send = send
+        self._path = path
+        self._start_message: Optional[Message] = None
+        self._wrap = False
+        self._chunks: List[bytes] = []
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            ctype = headers.get("content-type", "")
+            # Оборачиваем только JSON; 204 No Content и уже сжатые ответы пропускаем как есть
+            self._wrap = (
+                "application/json" in ctype.lower()
+                and message["status"] != 204
+                and "content-encoding" not in headers
+            )
+            if not self._wrap:
+                await self._send(message)
+                return
+            self._start_message = message
+            return
+
+        if message["type"] != "http.response.body" or not self._wrap:
+            await self._send(message)
+            return
+
+        self._chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+
+        body = b"".join(self._chunks)
+        self._chunks = []
+        start_message = self._start_message
+        if not _is_already_formatted(body):
+            body = build_envelope(body, start_message["status"], self._path, meta=_build_meta())
+
+        headers = MutableHeaders(scope=start_message)
+        headers["content-length"] = str(len(body))
+        await self._send(start_message)
+        await self._send({"type": "http.response.body", "body": body, "more_body": False})
@@ -9,15 +9,25 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     DateTime,
+    Date,
     func,
     text,
     Table,
+    Index,
+    UniqueConstraint,
     Enum as PgEnum,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
+from app.config import settings
 from app.db import Base
 
+# Связи никогда не загружаются неявно: каждый запрос указывает нужный подграф
+# через профили из app/crud/loaders.py. "raise_on_sql" разрешает только обращения,
+# не требующие запроса (many-to-one из identity map); в строгом режиме ошибкой
+# считается любое обращение к незагруженной связи.
+RELATIONSHIP_LAZY = "raise" if settings.ORM_STRICT_LOADING else "raise_on_sql"
+
 
 # --- Enums ---
 class SessionStatus(enum.Enum):
@@ -36,6 +46,8 @@ class User(Base):
     email = Column(String(255), unique=True, nullable=False, index=True)
     username = Column(String(100), nullable=False, unique=True)
     hashed_password = Column(String, nullable=False)
+    # Увеличивается при отзыве токенов; сверяется с claim "ver" в JWT
+    token_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     weight = Column(Numeric(5, 2), nullable=True)
     height = Column(Integer, nullable=True)
@@ -49,13 +61,16 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=text("now()"), onupdate=func.now(), nullable=False)
 
     # relationships
-    workout_plans = relationship("WorkoutPlan", back_populates="user", cascade="all, delete-orphan", lazy="selectin")
+    # Дочерние строки удаляет ON DELETE CASCADE в БД (passive_deletes): удаление
+    # пользователя или сессии — один DELETE без загрузки и удаления потомков по одному
+    workout_plans = relationship("WorkoutPlan", back_populates="user", cascade="all, delete-orphan",
+                                 passive_deletes=True, lazy=RELATIONSHIP_LAZY)
     workout_sessions = relationship("WorkoutSession", back_populates="user", cascade="all, delete-orphan",
-                                    lazy="selectin")
+                                    passive_deletes=True, lazy=RELATIONSHIP_LAZY)
     progress_entries = relationship("UserProgress", back_populates="user", cascade="all, delete-orphan",
-                                    lazy="selectin")
+                                    passive_deletes=True, lazy=RELATIONSHIP_LAZY)
     preferences = relationship("UserPreferences", back_populates="user", uselist=False, cascade="all, delete-orphan",
-                               lazy="selectin")
+                               passive_deletes=True, lazy=RELATIONSHIP_LAZY)
 
     def __repr__(self):
         return f"<User id={self.id} username={self.username!r} telegram_id={self.telegram_id}>"
@@ -70,7 +85,7 @@ class MuscleGroup(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
 
-    exercises = relationship("Exercise", back_populates="primary_muscle_group", lazy="selectin")
+    exercises = relationship("Exercise", back_populates="primary_muscle_group", lazy=RELATIONSHIP_LAZY)
 
     def __repr__(self):
         return f"<MuscleGroup id={self.id} name={self.name!r}>"
@@ -92,12 +107,12 @@ class Exercise(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
 
-    primary_muscle_group = relationship("MuscleGroup", back_populates="exercises", lazy="joined")
+    primary_muscle_group = relationship("MuscleGroup", back_populates="exercises", lazy=RELATIONSHIP_LAZY)
     restricted_in_rules = relationship(
         "RestrictionRule",
         secondary="restriction_rule_exercises_association",
         back_populates="restricted_exercises",
-        lazy="selectin"
+        lazy=RELATIONSHIP_LAZY
     )
 
     def __repr__(self):
@@ -119,7 +134,7 @@ class WorkoutPlan(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
 
-    user = relationship("User", back_populates="workout_plans", lazy="joined")
+    user = relationship("User", back_populates="workout_plans", lazy=RELATIONSHIP_LAZY)
 
     def __repr__(self):
         return f"<WorkoutPlan id={self.id} name={self.name!r} user_id={self.user_id}>"
@@ -138,14 +153,36 @@ class WorkoutSession(Base):
     rating = Column(Integer, nullable=True)  # 1-5
     notes = Column(Text, nullable=True)
     status = Column(PgEnum(SessionStatus), nullable=False, default=SessionStatus.IN_PROGRESS)
+    # Увеличивается при каждом изменении подходов/статуса (для ETag)
+    revision = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
 
-    user = relationship("User", back_populates="workout_sessions", lazy="joined")
-    workout_plan = relationship("WorkoutPlan", lazy="joined")
+    user = relationship("User", back_populates="workout_sessions", lazy=RELATIONSHIP_LAZY)
+    workout_plan = relationship("WorkoutPlan", lazy=RELATIONSHIP_LAZY)
 
     # one-to-many relationship to SessionDay
-    session_days = relationship("SessionDay", back_populates="session", cascade="all, delete-orphan", lazy="selectin")
+    session_days = relationship("SessionDay", back_populates="session", cascade="all, delete-orphan",
+                                passive_deletes=True, lazy=RELATIONSHIP_LAZY)
+
+    # Индексы создаются миграцией 009_add_session_indexes
+    __table_args__ = (
+        Index("ix_workout_sessions_user_status", "user_id", "status"),
+        Index(
+            "ix_workout_sessions_user_in_progress", "user_id",
+            postgresql_where=text("status = 'IN_PROGRESS'"),
+        ),
+        # Брошенные тренировки по возрасту (app/session_reaper.py)
+        Index(
+            "ix_workout_sessions_in_progress_started", "started_at",
+            postgresql_where=text("status = 'IN_PROGRESS'"),
+        ),
+        # История (keyset по started_at, id) и статистика по периоду
+        Index(
+            "ix_workout_sessions_user_completed_history", "user_id", "started_at", "id",
+            postgresql_where=text("status = 'COMPLETED'"),
+        ),
+    )
 
     def __repr__(self):
         return f"<WorkoutSession id={self.id} user_id={self.user_id}>"
@@ -159,9 +196,13 @@ class SessionDay(Base):
     order = Column(Integer, nullable=False)
     status = Column(PgEnum(SessionStatus), nullable=False, default=SessionStatus.PENDING)
 
-    session = relationship("WorkoutSession", back_populates="session_days", lazy="joined")
+    session = relationship("WorkoutSession", back_populates="session_days", lazy=RELATIONSHIP_LAZY)
     session_exercises = relationship("SessionExercise", back_populates="session_day", cascade="all, delete-orphan",
-                                     lazy="selectin")
+                                     passive_deletes=True, lazy=RELATIONSHIP_LAZY)
+
+    __table_args__ = (
+        Index("ix_session_days_session_order", "workout_session_id", "order"),
+    )
 
     def __repr__(self):
         return f"<SessionDay id={self.id} name={self.plan_day_name!r}>"
@@ -175,13 +216,17 @@ class SessionExercise(Base):
     order = Column(Integer, nullable=False)
     status = Column(PgEnum(SessionStatus), nullable=False, default=SessionStatus.PENDING)
 
-    session_day = relationship("SessionDay", back_populates="session_exercises", lazy="joined")
+    session_day = relationship("SessionDay", back_populates="session_exercises", lazy=RELATIONSHIP_LAZY)
     session_sets = relationship("SessionSet", back_populates="session_exercise", cascade="all, delete-orphan",
-                                lazy="selectin")
+                                passive_deletes=True, lazy=RELATIONSHIP_LAZY)
 
     # Relationship to the Exercise model based on plan_exercise_name
     exercise = relationship("Exercise", primaryjoin="SessionExercise.plan_exercise_name == Exercise.name",
-                            foreign_keys=[plan_exercise_name], viewonly=True, lazy="joined")
+                            foreign_keys=[plan_exercise_name], viewonly=True, lazy=RELATIONSHIP_LAZY)
+
+    __table_args__ = (
+        Index("ix_session_exercises_day_order", "session_day_id", "order"),
+    )
 
     def __repr__(self):
         return f"<SessionExercise id={self.id} name={self.plan_exercise_name!r}>"
@@ -203,7 +248,11 @@ class SessionSet(Base):
     reps_done = Column(Integer, nullable=True)
     weight_lifted = Column(Numeric(6, 2), nullable=True)
 
-    session_exercise = relationship("SessionExercise", back_populates="session_sets", lazy="joined")
+    session_exercise = relationship("SessionExercise", back_populates="session_sets", lazy=RELATIONSHIP_LAZY)
+
+    __table_args__ = (
+        Index("ix_session_sets_exercise_order", "session_exercise_id", "order"),
+    )
 
     def __repr__(self):
         return f"<SessionSet id={self.id} order={self.order}>"
@@ -220,7 +269,7 @@ class UserProgress(Base):
     recorded_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
 
-    user = relationship("User", back_populates="progress_entries", lazy="joined")
+    user = relationship("User", back_populates="progress_entries", lazy=RELATIONSHIP_LAZY)
 
     def __repr__(self):
         return f"<UserProgress id={self.id} user_id={self.user_id} recorded_at={self.recorded_at}>"
@@ -246,7 +295,7 @@ class RestrictionRule(Base):
         "Exercise",
         secondary=restriction_rule_exercises_association,
         back_populates="restricted_in_rules",
-        lazy="selectin"
+        lazy=RELATIONSHIP_LAZY
     )
 
     def __repr__(self):
@@ -261,7 +310,7 @@ class MuscleFocus(Base):
     muscle_group_id = Column(Integer, ForeignKey("muscle_groups.id", ondelete="CASCADE"), nullable=False)
     priority_modifier = Column(Integer, nullable=False, default=0)  # e.g., +1, -1
 
-    muscle_group = relationship("MuscleGroup", lazy="joined")
+    muscle_group = relationship("MuscleGroup", lazy=RELATIONSHIP_LAZY)
 
     def __repr__(self):
         return f"<MuscleFocus id={self.id} name={self.name!r}>"
@@ -287,18 +336,93 @@ class UserPreferences(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
 
-    user = relationship("User", back_populates="preferences", lazy="joined")
+    user = relationship("User", back_populates="preferences", lazy=RELATIONSHIP_LAZY)
 
     restriction_rules = relationship(
         "RestrictionRule",
         secondary=user_preferences_restriction_rules_association,
-        lazy="selectin"
+        lazy=RELATIONSHIP_LAZY
     )
     muscle_focuses = relationship(
         "MuscleFocus",
         secondary=user_preferences_muscle_focuses_association,
-        lazy="selectin"
+        lazy=RELATIONSHIP_LAZY
     )
 
     def __repr__(self):
         return f"<UserPreferences id={self.id} user_id={self.user_id}>"
+
+
+# --- Идемпотентность клиентских запросов ---
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # sha256 тела запроса: повтор с тем же ключом, но другим телом отклоняется
+    request_hash = Column(String(64), nullable=False)
+    # Заполняются после успешного выполнения запроса
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+    def __repr__(self):
+        return f"<IdempotencyKey id={self.id} user_id={self.user_id} key={self.key!r}>"
+
+
+# --- Агрегаты статистики (app/crud/statistics.py) ---
+
+class UserDailyStats(Base):
+    """
+    Итоги завершенных сессий пользователя за день (по дате начала сессии).
+    Обновляются в транзакции завершения сессии; пересобираются CLI app.statistics_rollup.
+    """
+    __tablename__ = "user_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    workouts = Column(Integer, nullable=False, default=0)
+    duration_minutes = Column(Integer, nullable=False, default=0)
+    volume_kg = Column(Numeric(14, 2), nullable=False, default=0)
+    sets = Column(Integer, nullable=False, default=0)
+    reps = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UserDailyStats user_id={self.user_id} day={self.day}>"
+
+
+class UserDailyMuscleVolume(Base):
+    __tablename__ = "user_daily_muscle_volume"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    muscle_group_id = Column(Integer, ForeignKey("muscle_groups.id", ondelete="CASCADE"), primary_key=True)
+    volume_kg = Column(Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UserDailyMuscleVolume user_id={self.user_id} day={self.day} muscle_group_id={self.muscle_group_id}>"
+
+
+class UserPersonalRecord(Base):
+    """
+    Лучший подход пользователя в упражнении (по весу, затем по повторениям) среди завершенных сессий.
+    Обновляется в транзакции завершения сессии; пересобирается CLI app.statistics_rollup.
+    При равенстве сохраняется более ранний подход.
+    """
+    __tablename__ = "user_personal_records"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_name = Column(String(200), primary_key=True)
+    weight_lifted = Column(Numeric(6, 2), nullable=False)
+    reps_done = Column(Integer, nullable=False)
+    achieved_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<UserPersonalRecord user_id={self.user_id} exercise={self.exercise_name!r} weight={self.weight_lifted}>"
@@ -0,0 +1,106 @@
+"""
+Периодические фоновые задачи: общий цикл, счетчики для /metrics и запуск из командной строки.
+
+Подкласс PeriodicTask задает name и реализует run_pass — один проход, возвращающий
+словарь счетчиков. Задача запускается в процессе API (start/stop в событиях
+startup/shutdown) или отдельно через run_cli (cron, k8s CronJob).
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.logger import logger
+
+
+class PeriodicTask:
+    name = "Periodic task"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_ms = 0.0
+
+    async def run_pass(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Выполняет один проход, обновляет счетчики и пишет результат в лог.
+
+        :return: Счетчики этого прохода.
+        """
+        started = time.perf_counter()
+        result = await self.run_pass()
+        self.runs += 1
+        self.last_run_at = datetime.now(timezone.utc)
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "%s: %s, %.1fms", self.name, ", ".join(f"{key}={value}" for key, value in result.items()), self.last_run_ms,
+        )
+        return result
+
+    async def run_forever(self) -> None:
+        """
+        Повторяет проходы каждые interval секунд; ошибка прохода не останавливает цикл.
+        """
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.exception("%s failed: %s", self.name, e)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """
+        Запускает периодический проход в текущем event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_ms": round(self.last_run_ms, 3),
+        }
+
+
+def add_cli_arguments(parser: argparse.ArgumentParser, batch_size: int, interval: float) -> None:
+    """
+    Общие аргументы командной строки: --batch-size, --loop и --interval.
+    """
+    parser.add_argument("--batch-size", type=int, default=batch_size)
+    parser.add_argument("--loop", action="store_true", help="Повторять каждые --interval секунд")
+    parser.add_argument("--interval", type=float, default=interval)
+
+
+async def run_cli(task: PeriodicTask, loop: bool) -> None:
+    """
+    Выполняет задачу вне процесса API: один проход или бесконечный цикл (--loop).
+    Результат прохода пишется в лог (run_once).
+    """
+    from app.db import engine
+
+    try:
+        if loop:
+            await task.run_forever()
+        else:
+            await task.run_once()
+    finally:
+        await engine.dispose()
@@ -0,0 +1,120 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """
+    Счетчики SQL-выражений: количество, число строк (по данным драйвера) и время в БД.
+    """
+
+    def __init__(self, record_sql: bool = False):
+        self.statements = 0
+        self.rows = 0
+        self.db_time_seconds = 0.0
+        self.record_sql = record_sql
+        self.sql: List[str] = []
+
+    def add(self, statement: str, rowcount: int, elapsed: float) -> None:
+        self.statements += 1
+        if rowcount > 0:
+            self.rows += rowcount
+        self.db_time_seconds += elapsed
+        if self.record_sql:
+            self.sql.append(statement)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "statements": self.statements,
+            "rows": self.rows,
+            "db_time_ms": round(self.db_time_seconds * 1000, 3),
+        }
+
+
+# Статистика текущего запроса (устанавливается QueryStatsMiddleware)
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Активные query_budget: учитывают все выражения, в т.ч. выполненные в потоке TestClient
+_budgets: List[QueryStats] = []
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """
+    Возвращает статистику текущего запроса или None вне запроса.
+    """
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_stats_started"].pop()
+    elapsed = time.perf_counter() - started
+    rowcount = getattr(cursor, "rowcount", -1)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(statement, rowcount, elapsed)
+    for budget in _budgets:
+        budget.add(statement, rowcount, elapsed)
+
+
+def _handle_error(exception_context):
+    # Выражение завершилось ошибкой: after_cursor_execute не будет вызван
+    started = exception_context.connection.info.get("query_stats_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    """
+    Подключает учет выражений к engine (для AsyncEngine передается .sync_engine).
+    """
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Собирает статистику выражений, выполненных в текущем контексте (запросе).
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def query_budget(max_statements: int) -> Iterator[QueryStats]:
+    """
+    Проверяет, что блок выполняет не больше max_statements SQL-выражений.
+    Учитываются все выражения на инструментированных engine, поэтому помощник
+    работает и с вызовами CRUD напрямую, и с запросами через TestClient:
+
+        with query_budget(6):
+            client.get("/sessions/active", headers=headers)
+
+    :raises AssertionError: если бюджет превышен (в сообщении — выполненные выражения).
+    """
+    stats = QueryStats(record_sql=True)
+    _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        _budgets.remove(stats)
+
+    if stats.statements > max_statements:
+        executed = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(stats.sql, 1))
+        raise AssertionError(
+            f"Query budget exceeded: {stats.statements} statements, expected at most {max_statements}:\n{executed}"
+        )
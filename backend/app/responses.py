@@ -0,0 +1,76 @@
+import datetime
+import decimal
+import enum
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.logger import logger
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """
+    Преобразует типы, которые встречаются в ответах API, но не поддерживаются энкодером напрямую:
+    Decimal из колонок Numeric, enum-статусы (SessionStatus) и даты.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _resolve_encoder() -> str:
+    requested = settings.JSON_ENCODER
+    if requested in ("auto", "orjson") and orjson is not None:
+        return "orjson"
+    if requested == "orjson":
+        logger.warning("JSON_ENCODER=orjson, но orjson не установлен. Используется стандартный json.")
+    return "stdlib"
+
+
+JSON_ENCODER = _resolve_encoder()
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Сериализует content в компактный UTF-8 JSON выбранным энкодером.
+    """
+    if JSON_ENCODER == "orjson":
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Разбирает JSON выбранным энкодером.
+    """
+    if JSON_ENCODER == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse, использующий dumps() этого модуля (orjson при наличии).
+    Используется как default_response_class приложения и в обработчиках исключений.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -4,10 +4,11 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
-from app.auth import authenticate_user, get_user_by_token_or_telegram_id
+from app.auth import authenticate_user, get_current_principal, get_current_token_claims
 from app.crud import user as crud_user
 from app.db import get_session
-from app.models import User
+from app.schemas.jwt import TokenClaims
+from app.schemas.user import Principal
 from app.security import create_access_token, decode_access_token
 from app.config import settings
 
@@ -48,21 +49,37 @@ async def login(
             detail="Неверное имя пользователя или пароль.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(subject=user.username)
+    access_token = create_access_token(
+        subject=user.username, user_id=user.id, token_version=user.token_version
+    )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/logout")
 async def logout():
     """
-    Выход из системы (условно).
-    Клиент должен удалить токен.
+    Выход из системы на текущем устройстве.
+    JWT не хранятся на сервере, поэтому отдельный токен не отзывается: клиент должен удалить его.
+    Выход на всех устройствах — POST /auth/logout-all.
     """
     return {"message": "Вы успешно вышли из системы."}
 
 
+@router.post("/logout-all")
+async def logout_all(
+    claims: TokenClaims = Depends(get_current_token_claims),
+    db: AsyncSession = Depends(get_session),
+):
+    """
+    Выход на всех устройствах: отзывает все выданные пользователю JWT (увеличивает token_version).
+    Требует действующий JWT нового формата; отозванный токен отклоняется с 401 и ничего не отзывает.
+    """
+    await crud_user.revoke_user_tokens(db, claims.user_id)
+    return {"message": "Вы вышли из системы на всех устройствах."}
+
+
 @router.get("/telegram-link", response_model=schemas.telegram.TelegramLinkResponse)
-async def get_telegram_link(current_user: User = Depends(get_user_by_token_or_telegram_id)):
+async def get_telegram_link(current_user: Principal = Depends(get_current_principal)):
     """
     Генерирует ссылку на Telegram бота для подключения аккаунта.
     """
@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.preferences import UserPreferencesUpdate, UserPreferencesResponse
-from app.models import User
-from app.auth import get_user_by_token_or_telegram_id
+from app.schemas.user import Principal
+from app.auth import get_current_principal
 from app.db import get_session
 from app.crud import preferences as crud_preferences
 
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/preferences", tags=["User Preferences"])
 @router.put("/me", response_model=UserPreferencesResponse, summary="Обновить предпочтения текущего пользователя")
 async def update_current_user_preferences(
     preferences_data: UserPreferencesUpdate,
-    current_user: User = Depends(get_user_by_token_or_telegram_id),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_session)
 ):
     """
@@ -21,14 +21,14 @@ async def update_current_user_preferences(
     для текущего аутентифицированного пользователя.
     """
     updated_preferences = await crud_preferences.update_user_preferences(
-        db, user=current_user, data=preferences_data
+        db, user_id=current_user.id, data=preferences_data
     )
     return updated_preferences
 
 
 @router.get("/me", response_model=UserPreferencesResponse, summary="Получить предпочтения текущего пользователя")
 async def get_current_user_preferences(
-    current_user: User = Depends(get_user_by_token_or_telegram_id),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_session)
 ):
     """
@@ -1,7 +1,13 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.db import get_session
+from app.db import get_session, engine, read_engine, pool_stats, recent_writers
+from app.crud import statistics as crud_statistics, user as crud_user
+from app.hot_sessions import hot_sessions
+from app.idempotency_purge import idempotency_purger
+from app.session_reaper import session_reaper
+from app.security import password_hasher
+from app.middleware.compression import compression_stats
 
 router = APIRouter()
 
@@ -20,3 +26,26 @@ async def health(db: AsyncSession = Depends(get_session)):
     res = await db.execute(text("SELECT 1"))
     val = res.scalar()
     return {"db": "reachable", "res": val}
+
+
+@router.get("/metrics", tags=["root"], include_in_schema=False)
+async def metrics():
+    """
+    Внутренние счетчики процесса (пул соединений, кэши и т.п.).
+    Не оборачивается в стандартный формат ответа.
+    """
+    replica = None
+    if read_engine is not engine:
+        replica = {"pool": pool_stats(read_engine), "sticky_clients": recent_writers.stats()}
+
+    return {
+        "db_pool": pool_stats(engine),
+        "db_replica": replica,
+        "telegram_principal_cache": crud_user.telegram_principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "compression": compression_stats.snapshot(),
+        "hot_sessions": hot_sessions.stats(),
+        "stale_session_reaper": session_reaper.stats(),
+        "idempotency_purge": idempotency_purger.stats(),
+        "statistics_cache": crud_statistics.statistics_cache_stats(),
+    }
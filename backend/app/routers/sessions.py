@@ -1,19 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from app.db import get_session
-from app.auth import get_user_by_token_or_telegram_id
-from app.models import User, WorkoutPlan, SessionStatus, WorkoutSession, SessionSet
+from app.config import settings
+from app.db import get_session, get_read_session
+from app.hot_sessions import hot_sessions
+from app.etag import make_etag, etag_matches, set_etag, not_modified_response
+from app.logger import logger
+from app.responses import FastJSONResponse
+from app.auth import get_current_principal, get_current_claims
+from app.models import WorkoutPlan, SessionStatus, WorkoutSession, SessionSet
+from app.schemas.jwt import TokenClaims
+from app.schemas.user import Principal
 from app.schemas.session import (
     StartSessionRequest,
     ActiveWorkoutSession,
     CompleteSetRequest,
     SessionDay,
     SessionExercise,
-    SessionSet as SessionSetSchema
+    SessionSet as SessionSetSchema,
+    SessionSetUpdateResult,
+    SessionHistoryPage,
+    SetResultsBatchRequest,
+    SetResultsBatchResponse,
 )
-from app.crud import session as crud_session, workout_plan as crud_workout_plan
+from app.crud import session as crud_session, workout_plan as crud_workout_plan, idempotency as crud_idempotency, loaders
 
 router = APIRouter(prefix="/sessions", tags=["Workout Sessions"])
 
@@ -21,12 +32,12 @@ router = APIRouter(prefix="/sessions", tags=["Workout Sessions"])
 @router.post("/start", response_model=ActiveWorkoutSession)
 async def start_workout_session(
         request: StartSessionRequest,
-        current_user: User = Depends(get_user_by_token_or_telegram_id),
+        current_user: Principal = Depends(get_current_principal),
         db: AsyncSession = Depends(get_session)
 ):
-    # Проверить наличие активной сессии
+    # Проверить наличие активной сессии (без загрузки дерева)
     try:
-        existing_session = await crud_session.get_active_session_by_user_id(db, current_user.id)
+        existing_session = await crud_session.get_active_session_version(db, current_user.id)
     except Exception as e:
         # Handle potential exceptions during active session check if crud raises them
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -52,87 +63,248 @@ async def start_workout_session(
         )
 
     try:
-        session = await crud_session.create_session_from_plan(db, current_user, workout_plan, request.day_index)
-        return ActiveWorkoutSession.model_validate(session)
+        new_session = await crud_session.create_session_from_plan(db, current_user.id, workout_plan, request.day_index)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при создании сессии: {e}")
 
+    if settings.HOT_SESSION_STORE_ENABLED:
+        hot_sessions.put(new_session)
+    return new_session
+
 
 @router.get("/active", response_model=Optional[ActiveWorkoutSession])
 async def get_active_workout_session(
-        current_user: User = Depends(get_user_by_token_or_telegram_id),
-        db: AsyncSession = Depends(get_session)
+        request: Request,
+        response: Response,
+        claims: TokenClaims = Depends(get_current_claims),
+        db: AsyncSession = Depends(get_read_session)
 ):
-    session = await crud_session.get_active_session_by_user_id(db, current_user.id)
+    if settings.HOT_SESSION_STORE_ENABLED:
+        # Активная сессия обслуживается из памяти (при промахе загружается с primary)
+        hot = await hot_sessions.get(claims.user_id)
+        etag = make_etag("session", hot.id, hot.revision) if hot else make_etag("session", "none")
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        set_etag(response, etag)
+        return ActiveWorkoutSession.model_validate(hot) if hot else None
+
+    # Сначала сверяем дешевый маркер версии (id, revision), дерево сессии строим только при изменении
+    version = await crud_session.get_active_session_version(db, claims.user_id)
+    etag = make_etag("session", *version) if version else make_etag("session", "none")
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    session = await crud_session.get_active_session_by_user_id(db, claims.user_id)
     if session:
+        set_etag(response, make_etag("session", session.id, session.revision))
         return ActiveWorkoutSession.model_validate(session)
+    set_etag(response, make_etag("session", "none"))
     return None
 
 
-@router.post("/sets/{set_id}/complete", response_model=SessionSetSchema)
-async def complete_session_set(
-        set_id: int,
-        request: CompleteSetRequest,
-        current_user: User = Depends(get_user_by_token_or_telegram_id),
-        db: AsyncSession = Depends(get_session)
+@router.get("/history", response_model=SessionHistoryPage)
+async def get_session_history(
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+        expand: Optional[Literal["days", "exercises", "sets"]] = Query(
+            None, description="Включить в ответ дерево сессии до указанного уровня"
+        ),
+        claims: TokenClaims = Depends(get_current_claims),
+        db: AsyncSession = Depends(get_read_session)
 ):
-    session_set = await crud_session.get_session_set_by_id(db, set_id)
+    """
+    История завершенных тренировок, от новых к старым, со сводкой по каждой сессии.
+    """
+    try:
+        position = crud_session.decode_history_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    if not session_set:
+    return await crud_session.get_session_history(db, claims.user_id, limit, position, expand)
+
+
+def _raise_set_not_updated(state, user_id: int):
+    """
+    Выбирает ошибку для подхода, который не удалось обновить.
+    """
+    if not state:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Подход не найден.")
-    if session_set.session_exercise.session_day.session.user_id != current_user.id:
+    if state.user_id != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет доступа к этому подходу.")
-    if session_set.session_exercise.session_day.session.status != SessionStatus.IN_PROGRESS:
+    if state.session_status != SessionStatus.IN_PROGRESS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Сессия не активна.")
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Подход уже завершен или пропущен.")
+
+
+async def _apply_hot_set(
+        user_id: int, set_id: int, set_status: SessionStatus,
+        reps_done: Optional[int] = None, weight_lifted: Optional[float] = None
+) -> Optional[SessionSetUpdateResult]:
+    """
+    Отмечает подход активной сессии в памяти (HOT_SESSION_STORE_ENABLED).
+    Возвращает None, если подход не относится к активной сессии пользователя:
+    такой запрос обрабатывается через БД, которая и выбирает ошибку.
+    """
+    if hot_sessions.finishing(user_id):
+        # Сессия уже завершена в памяти и ждет записи: в БД ее подходы еще PENDING
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Сессия не активна.")
-    if session_set.status != SessionStatus.PENDING:
+    hot = await hot_sessions.get(user_id)
+    if hot is None or set_id not in hot.sets_by_id:
+        return None
+    result = hot_sessions.apply_set(hot, set_id, set_status, reps_done, weight_lifted)
+    if result is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Подход уже завершен или пропущен.")
+    if result.session_status != SessionStatus.IN_PROGRESS:
+        # Сессия завершилась автоматически: сохраняем сразу, в памяти она больше не нужна.
+        # Подход уже принят: при ошибке записи сессия остается в памяти с несохраненными
+        # изменениями (get ее уже не возвращает), их запишет и вытеснит периодический flush_all
+        try:
+            await hot_sessions.flush_and_evict(user_id)
+        except Exception as e:
+            logger.exception("Hot session flush failed for user %s: %s", user_id, e)
+    return result
+
+
+@router.post("/sets/{set_id}/complete", response_model=SessionSetUpdateResult)
+async def complete_session_set(
+        set_id: int,
+        request: CompleteSetRequest,
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_session)
+):
+    if settings.HOT_SESSION_STORE_ENABLED:
+        result = await _apply_hot_set(
+            current_user.id, set_id, SessionStatus.COMPLETED, request.reps_done, request.weight_lifted
+        )
+        if result is not None:
+            return result
 
     try:
-        updated_set = await crud_session.complete_set(
-            db, session_set, request.reps_done, request.weight_lifted
+        result = await crud_session.complete_set(
+            db, set_id, current_user.id, request.reps_done, request.weight_lifted
         )
-        return SessionSetSchema.model_validate(updated_set)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при завершении подхода: {e}")
 
+    if result is None:
+        # Подход не обновлен: отдельным запросом выясняем причину
+        _raise_set_not_updated(await crud_session.get_session_set_state(db, set_id), current_user.id)
+    return result
+
 
-@router.post("/sets/{set_id}/skip", response_model=SessionSetSchema)
+@router.post("/sets/{set_id}/skip", response_model=SessionSetUpdateResult)
 async def skip_session_set(
         set_id: int,
-        current_user: User = Depends(get_user_by_token_or_telegram_id),
+        current_user: Principal = Depends(get_current_principal),
         db: AsyncSession = Depends(get_session)
 ):
-    session_set = await crud_session.get_session_set_by_id(db, set_id)
+    if settings.HOT_SESSION_STORE_ENABLED:
+        result = await _apply_hot_set(current_user.id, set_id, SessionStatus.SKIPPED)
+        if result is not None:
+            return result
 
-    if not session_set:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Подход не найден.")
-    if session_set.session_exercise.session_day.session.user_id != current_user.id:
+    try:
+        result = await crud_session.skip_set(db, set_id, current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Ошибка при пропуске подхода: {e}")
+
+    if result is None:
+        _raise_set_not_updated(await crud_session.get_session_set_state(db, set_id), current_user.id)
+    return result
+
+
+def _check_batch_sets(rows, set_ids: List[int], user_id: int) -> int:
+    """
+    Проверяет заблокированные подходы пакета и возвращает ID их общей сессии.
+    """
+    found = {row.set_id: row for row in rows}
+    for set_id in set_ids:
+        if set_id not in found:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Подход {set_id} не найден.")
+    if any(row.user_id != user_id for row in rows):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет доступа к этому подходу.")
-    if session_set.session_exercise.session_day.session.status != SessionStatus.IN_PROGRESS:
+    session_ids = {row.session_id for row in rows}
+    if len(session_ids) > 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Подходы пакета должны принадлежать одной сессии.")
+    if rows[0].session_status != SessionStatus.IN_PROGRESS:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Сессия не активна.")
-    if session_set.status != SessionStatus.PENDING:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Подход уже завершен или пропущен.")
+    for row in rows:
+        if row.set_status != SessionStatus.PENDING:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Подход {row.set_id} уже завершен или пропущен.")
+    return session_ids.pop()
+
+
+@router.post("/sets/batch", response_model=SetResultsBatchResponse)
+async def log_session_sets(
+        request: SetResultsBatchRequest,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+        current_user: Principal = Depends(get_current_principal),
+        db: AsyncSession = Depends(get_session)
+):
+    """
+    Отмечает несколько подходов одной сессии (complete/skip) в одной транзакции
+    с одним пересчетом статусов.
+
+    С заголовком Idempotency-Key повтор запроса (например, после таймаута) возвращает
+    сохраненный ответ первого выполнения и не изменяет подходы; ответ помечается
+    заголовком Idempotent-Replayed. Ключи хранятся IDEMPOTENCY_KEY_TTL_SECONDS секунд.
+    """
+    if idempotency_key:
+        request_hash = crud_idempotency.hash_request(request.model_dump_json().encode())
+        stored = await crud_idempotency.claim_key(db, current_user.id, idempotency_key, request_hash)
+        if stored is not None:
+            if stored.request_hash != request_hash:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                    detail="Ключ идемпотентности уже использован для другого запроса.")
+            return FastJSONResponse(
+                content=stored.response,
+                status_code=stored.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+    if settings.HOT_SESSION_STORE_ENABLED:
+        # Пакет применяется в БД: сначала сохраняем отметки, накопленные в памяти
+        await hot_sessions.flush_and_evict(current_user.id)
+
+    # Ошибки проверки откатывают транзакцию вместе с резервированием ключа
+    set_ids = [item.set_id for item in request.items]
+    rows = await crud_session.lock_sets_for_update(db, set_ids)
+    session_id = _check_batch_sets(rows, set_ids, current_user.id)
 
     try:
-        updated_set = await crud_session.skip_set(db, session_set)
-        return SessionSetSchema.model_validate(updated_set)
+        result = await crud_session.log_set_results(db, session_id, request.items)
+        if idempotency_key:
+            await crud_idempotency.store_response(
+                db, current_user.id, idempotency_key, status.HTTP_200_OK, result.model_dump(mode="json")
+            )
+        await db.commit()
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail=f"Ошибка при пропуске подхода: {e}")
+                            detail=f"Ошибка при сохранении подходов: {e}")
+    return result
 
 
 @router.post("/{session_id}/finish", response_model=ActiveWorkoutSession)
 async def finish_workout_session(
         session_id: int,
-        current_user: User = Depends(get_user_by_token_or_telegram_id),
+        current_user: Principal = Depends(get_current_principal),
         db: AsyncSession = Depends(get_session)
 ):
-    # 1. Fetch active session to check status and ownership
-    active_session = await crud_session.get_active_session_by_user_id(db, current_user.id)
+    if settings.HOT_SESSION_STORE_ENABLED:
+        # Завершение работает с БД: сначала сохраняем отметки, накопленные в памяти
+        await hot_sessions.flush_and_evict(current_user.id)
+
+    # 1. Fetch active session to check status and ownership (locked until commit)
+    active_session = await crud_session.get_active_session_by_user_id(
+        db, current_user.id, for_update=True
+    )
     if not active_session or active_session.id != session_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -140,16 +312,9 @@ async def finish_workout_session(
         )
 
     try:
-        # 2. Finish the session in DB
-        await crud_session.finish_session(db, active_session)
-
-        # 3. Reload the (now finished) session with all data and return it
-        finished_session_details = await crud_session.get_session_by_id(db, session_id)
-        if not finished_session_details:
-            # This should not happen if the session was just finished
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Завершенная сессия не найдена.")
-
-        return ActiveWorkoutSession.model_validate(finished_session_details)
+        # 2. Finish the session in DB; the loaded tree is updated in place
+        finished_session = await crud_session.finish_session(db, active_session)
+        return ActiveWorkoutSession.model_validate(finished_session)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Ошибка при завершении сессии: {e}")
@@ -158,10 +323,10 @@ async def finish_workout_session(
 @router.post("/{session_id}/cancel", response_model=dict)
 async def cancel_workout_session(
         session_id: int,
-        current_user: User = Depends(get_user_by_token_or_telegram_id),
+        current_user: Principal = Depends(get_current_principal),
         db: AsyncSession = Depends(get_session)
 ):
-    session = await db.get(WorkoutSession, session_id)  # Загрузить сессию
+    session = await crud_session.get_session_by_id(db, session_id, profile=loaders.SESSION_ONLY)
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Сессия не найдена.")
     if session.user_id != current_user.id:
@@ -169,6 +334,10 @@ async def cancel_workout_session(
     if session.status != SessionStatus.IN_PROGRESS:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Сессия уже завершена или отменена.")
 
+    if settings.HOT_SESSION_STORE_ENABLED:
+        # Сессия удаляется целиком: несохраненные отметки не нужны
+        hot_sessions.evict(current_user.id)
+
     try:
         await crud_session.cancel_session(db, session)
         return {"message": "Сессия успешно отменена."}
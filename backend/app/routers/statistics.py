@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.db import get_session
-from app.auth import get_user_by_token_or_telegram_id
-from app.models import User
+from app.db import get_read_session
+from app.etag import etag_matches, set_etag, not_modified_response
+from app.auth import get_current_claims
+from app.schemas.jwt import TokenClaims
 from app.crud import statistics as crud_statistics
 from app.schemas.statistics import StatisticsResponse
 
@@ -14,18 +15,26 @@ router = APIRouter(prefix="/statistics", tags=["User Statistics"])
 
 @router.get("/me", response_model=StatisticsResponse)
 async def get_user_statistics(
+    request: Request,
     period: Optional[str] = Query("all_time", description="Период для статистики (all_time, last_month, last_week)"),
-    current_user: User = Depends(get_user_by_token_or_telegram_id),
-    db: AsyncSession = Depends(get_session)
+    claims: TokenClaims = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
-    if period not in ["all_time", "last_month", "last_week"]:
+    if period not in crud_statistics.STATISTICS_PERIODS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Некорректный период. Допустимые значения: all_time, last_month, last_week."
         )
     
+    # Ответ берется из кэша готовых байтов (см. crud_statistics.get_cached_statistics):
+    # при попадании маршрут не обращается к БД, конверт собирается без разбора JSON
     try:
-        statistics_data = await crud_statistics.get_user_statistics(db, current_user.id, period)
-        return StatisticsResponse.model_validate(statistics_data)
+        etag, body = await crud_statistics.get_cached_statistics(db, claims.user_id, period)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ошибка при получении статистики: {e}")
+
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    response = Response(content=body, media_type="application/json")
+    set_etag(response, etag)
+    return response
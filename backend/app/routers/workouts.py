@@ -1,10 +1,13 @@
 import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth import get_user_by_token_or_telegram_id
-from app.db import get_session
+from app.auth import get_current_principal, get_current_claims, get_current_user_with
+from app.db import get_session, get_read_session
+from app.etag import make_etag, etag_matches, set_etag, not_modified_response
 from app.models import User
+from app.schemas.jwt import TokenClaims
+from app.schemas.user import Principal
 from app.schemas.workout import WorkoutPlan
 from app.services.workout_generator import WorkoutGenerator
 from app.crud import workout_plan as crud_workout_plan
@@ -14,7 +17,7 @@ router = APIRouter(prefix="/workouts", tags=["Workouts"])
 
 @router.post("/generate", response_model=WorkoutPlan)
 async def generate_and_save_workout_plan(
-    current_user: User = Depends(get_user_by_token_or_telegram_id),
+    current_user: User = Depends(get_current_user_with("preferences")),
     db: AsyncSession = Depends(get_session)
 ):
     """
@@ -49,24 +52,34 @@ async def generate_and_save_workout_plan(
 
 @router.get("/", response_model=WorkoutPlan)
 async def get_current_plan(
-    current_user: User = Depends(get_user_by_token_or_telegram_id),
-    db: AsyncSession = Depends(get_session)
+    request: Request,
+    response: Response,
+    claims: TokenClaims = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Возвращает текущий план тренировок пользователя.
+    Поддерживает условный GET: при совпадении If-None-Match возвращается 304.
     """
-    plan = await crud_workout_plan.get_user_plan(db, user_id=current_user.id)
+    version = await crud_workout_plan.get_user_plan_version(db, user_id=claims.user_id)
+    if version:
+        etag = make_etag("plan", *version)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+    plan = await crud_workout_plan.get_user_plan(db, user_id=claims.user_id)
     if not plan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="План тренировок не найден. Сгенерируйте новый."
         )
+    set_etag(response, make_etag("plan", plan.id, plan.generated_at))
     return plan
 
 
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_current_plan(
-    current_user: User = Depends(get_user_by_token_or_telegram_id),
+    current_user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_session)
 ):
     """
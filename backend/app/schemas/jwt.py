@@ -9,3 +9,12 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+
+class TokenClaims(BaseModel):
+    """
+    Проверенные данные аутентификации, полученные без загрузки пользователя из БД.
+    """
+    user_id: int
+    username: str
+    token_version: int = 0
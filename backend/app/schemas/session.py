@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional, Tuple
 from datetime import datetime
 from enum import Enum as PyEnum  # Import Python's Enum for Pydantic
 
@@ -25,6 +25,22 @@ class SessionSet(SessionSetBase):
         from_attributes = True
 
 
+class NextSessionSet(SessionSet):
+    """Следующий невыполненный подход сессии вместе с названием упражнения."""
+    plan_exercise_name: str
+
+
+class SessionSetUpdateResult(SessionSet):
+    """
+    Ответ на завершение или пропуск подхода: обновленный подход, статус сессии
+    после пересчета, признак нового персонального рекорда в упражнении
+    и следующий подход (None, если подходов больше нет).
+    """
+    session_status: SessionStatus
+    new_personal_record: bool = False
+    next_set: Optional[NextSessionSet] = None
+
+
 class SessionExerciseBase(BaseModel):
     plan_exercise_name: str
     order: int
@@ -80,3 +96,73 @@ class StartSessionRequest(BaseModel):
 class CompleteSetRequest(BaseModel):
     reps_done: int
     weight_lifted: float
+
+
+class SetResultItem(BaseModel):
+    set_id: int
+    action: Literal["complete", "skip"]
+    reps_done: Optional[int] = None
+    weight_lifted: Optional[float] = None
+
+    @model_validator(mode="after")
+    def check_complete_fields(self):
+        if self.action == "complete" and (self.reps_done is None or self.weight_lifted is None):
+            raise ValueError("Для action=complete нужны reps_done и weight_lifted.")
+        return self
+
+
+class SetResultsBatchRequest(BaseModel):
+    items: List[SetResultItem] = Field(..., min_length=1, max_length=200)
+
+    @model_validator(mode="after")
+    def check_unique_sets(self):
+        set_ids = [item.set_id for item in self.items]
+        if len(set_ids) != len(set(set_ids)):
+            raise ValueError("Каждый подход может встречаться в пакете только один раз.")
+        return self
+
+
+# --- Response Schemas ---
+class SetResultsBatchResponse(BaseModel):
+    """
+    Результат пакетной отметки подходов: обновленные подходы, статус сессии
+    после пересчета, упражнения с новыми персональными рекордами и следующий подход.
+    """
+    session_id: int
+    session_status: SessionStatus
+    sets: List[SessionSet]
+    new_personal_records: List[str] = []
+    next_set: Optional[NextSessionSet] = None
+
+
+class SessionHistoryExercise(SessionExerciseBase):
+    id: int
+    session_sets: Optional[List[SessionSet]] = None
+
+
+class SessionHistoryDay(SessionDayBase):
+    id: int
+    session_exercises: Optional[List[SessionHistoryExercise]] = None
+
+
+class SessionHistoryItem(BaseModel):
+    """
+    Сводка завершенной сессии. Дерево (session_days) заполняется только при expand.
+    """
+    id: int
+    workout_plan_id: Optional[int] = None
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    status: SessionStatus
+    duration_minutes: Optional[int] = None
+    volume_kg: float
+    sets_total: int
+    sets_completed: int
+    sets_skipped: int
+    session_days: Optional[List[SessionHistoryDay]] = None
+
+
+class SessionHistoryPage(BaseModel):
+    items: List[SessionHistoryItem]
+    # Курсор следующей страницы (None — страниц больше нет)
+    next_cursor: Optional[str] = None
@@ -27,6 +27,21 @@ class User(UserBase):
         from_attributes = True
 
 
+class Principal(BaseModel):
+    """
+    Облегченное представление аутентифицированного пользователя:
+    только идентификационные поля, без профиля и связей.
+    """
+    id: int
+    username: str
+    email: str
+    telegram_id: Optional[int] = None
+    token_version: int = 0
+
+    class Config:
+        from_attributes = True
+
+
 class UserProfileUpdate(BaseModel):
     weight: Optional[Decimal] = None
     height: Optional[int] = None
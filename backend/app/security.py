@@ -1,5 +1,8 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -7,7 +10,7 @@ from passlib.context import CryptContext
 from app.config import settings
 
 # Контекст для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -40,12 +43,116 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password_bytes)
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+class PasswordHasherPool:
+    """
+    Выполняет bcrypt в отдельном пуле потоков или процессов, чтобы не блокировать event loop.
+    Число одновременных операций ограничено семафором; ожидающие вызовы учитываются
+    в метриках глубины очереди.
+    """
+
+    def __init__(self, executor_kind: str, max_workers: int, max_concurrency: int):
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.queued = 0
+        self.max_queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет func(*args) в пуле, дожидаясь свободного слота.
+        """
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        wait = started_at - enqueued_at
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "avg_run_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasherPool(
+    executor_kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Асинхронный вариант verify_password: проверка выполняется в password_hasher.
+    """
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Асинхронный вариант get_password_hash: хеширование выполняется в password_hasher.
+    """
+    return await password_hasher.run(get_password_hash, password)
+
+
+def create_access_token(
+    subject: str,
+    expires_delta: Optional[timedelta] = None,
+    user_id: Optional[int] = None,
+    token_version: Optional[int] = None,
+) -> str:
     """
     Создает JWT токен доступа.
 
     :param subject: Идентификатор субъекта (например, имя пользователя или email).
     :param expires_delta: Время жизни токена. Если не указано, используется значение по умолчанию.
+    :param user_id: ID пользователя (claim "uid"); позволяет аутентифицировать запрос без обращения к БД.
+    :param token_version: Версия токенов пользователя (claim "ver") для проверки отзыва.
     :return: Сгенерированный JWT токен.
     """
     if expires_delta:
@@ -54,6 +161,9 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
         expire = datetime.now(timezone.utc) + timedelta(days=settings.ACCESS_TOKEN_EXPIRE_DAYS)
 
     to_encode = {"exp": expire, "sub": str(subject)}
+    if user_id is not None:
+        to_encode["uid"] = user_id
+        to_encode["ver"] = token_version or 0
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
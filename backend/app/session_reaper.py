@@ -0,0 +1,119 @@
+"""
+Сборщик брошенных тренировок: сессии IN_PROGRESS старше STALE_SESSION_MAX_AGE_HOURS
+завершаются (finish) или удаляются (cancel) пакетами по STALE_SESSION_REAPER_BATCH_SIZE.
+
+Запуск в процессе API: STALE_SESSION_REAPER_ENABLED=true.
+Запуск отдельно (cron, k8s CronJob):
+
+    python -m app.session_reaper [--max-age-hours 12] [--batch-size 500] [--action finish|cancel] [--loop]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from app.config import settings
+from app.crud import session as crud_session
+from app.db import AsyncSessionLocal
+from app.hot_sessions import hot_sessions
+from app.periodic import PeriodicTask, add_cli_arguments, run_cli
+
+REAPER_ACTIONS = ("finish", "cancel")
+
+
+class SessionReaper(PeriodicTask):
+    name = "Stale session reaper"
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            max_age_hours: float = 12,
+            batch_size: int = 500,
+            action: str = "finish",
+            interval: float = 600,
+    ):
+        if action not in REAPER_ACTIONS:
+            raise ValueError(f"Unknown stale session action: {action}")
+        super().__init__(interval)
+        self._session_factory = session_factory
+        self.max_age_hours = max_age_hours
+        self.batch_size = batch_size
+        self.action = action
+        self.batches = 0
+        self.sessions_finished = 0
+        self.sessions_cancelled = 0
+        self.sets_skipped = 0
+
+    async def run_pass(self) -> Dict[str, Any]:
+        """
+        Обрабатывает все брошенные сессии пакетами, каждый пакет — одно выражение и один коммит.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.max_age_hours)
+        result = {"batches": 0, "sessions": 0, "sets_skipped": 0}
+
+        while True:
+            async with self._session_factory() as db:
+                if self.action == "finish":
+                    user_ids, sets_skipped = await crud_session.finish_stale_sessions(db, cutoff, self.batch_size)
+                else:
+                    user_ids = await crud_session.cancel_stale_sessions(db, cutoff, self.batch_size)
+                    sets_skipped = 0
+            if not user_ids:
+                break
+
+            # Копии этих сессий в памяти процесса больше не актуальны
+            for user_id in user_ids:
+                hot_sessions.evict(user_id)
+            result["batches"] += 1
+            result["sessions"] += len(user_ids)
+            result["sets_skipped"] += sets_skipped
+            if len(user_ids) < self.batch_size:
+                break
+
+        self.batches += result["batches"]
+        if self.action == "finish":
+            self.sessions_finished += result["sessions"]
+        else:
+            self.sessions_cancelled += result["sessions"]
+        self.sets_skipped += result["sets_skipped"]
+        return {"action": self.action, **result}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "action": self.action,
+            "max_age_hours": self.max_age_hours,
+            **super().stats(),
+            "batches": self.batches,
+            "sessions_finished": self.sessions_finished,
+            "sessions_cancelled": self.sessions_cancelled,
+            "sets_skipped": self.sets_skipped,
+        }
+
+
+session_reaper = SessionReaper(
+    max_age_hours=settings.STALE_SESSION_MAX_AGE_HOURS,
+    batch_size=settings.STALE_SESSION_REAPER_BATCH_SIZE,
+    action=settings.STALE_SESSION_ACTION,
+    interval=settings.STALE_SESSION_REAPER_INTERVAL_SECONDS,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Завершает или удаляет брошенные тренировки.")
+    parser.add_argument("--max-age-hours", type=float, default=settings.STALE_SESSION_MAX_AGE_HOURS)
+    parser.add_argument("--action", choices=REAPER_ACTIONS, default=settings.STALE_SESSION_ACTION)
+    add_cli_arguments(
+        parser, settings.STALE_SESSION_REAPER_BATCH_SIZE, settings.STALE_SESSION_REAPER_INTERVAL_SECONDS,
+    )
+    args = parser.parse_args()
+    reaper = SessionReaper(
+        max_age_hours=args.max_age_hours,
+        batch_size=args.batch_size,
+        action=args.action,
+        interval=args.interval,
+    )
+    asyncio.run(run_cli(reaper, args.loop))
+
+
+if __name__ == "__main__":
+    main()
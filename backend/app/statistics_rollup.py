@@ -0,0 +1,68 @@
+"""
+Заполнение и пересборка дневных агрегатов статистики (user_daily_stats,
+user_daily_muscle_volume) и персональных рекордов (user_personal_records)
+по истории тренировок.
+
+Агрегаты и рекорды поддерживаются при завершении каждой сессии; пересборка нужна после
+ручных правок истории или изменения правил подсчета:
+
+    python -m app.statistics_rollup [--user-id 1 --user-id 2] [--batch-size 100]
+
+Без --user-id пересобираются все пользователи, пакетами по --batch-size,
+каждый пакет — отдельная транзакция.
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from app.crud import statistics as crud_statistics
+from app.db import AsyncSessionLocal, engine
+from app.models import User
+
+
+async def rebuild(user_ids: Optional[List[int]] = None, batch_size: int = 100) -> int:
+    """
+    :return: Число обработанных пользователей.
+    """
+    if user_ids:
+        async with AsyncSessionLocal() as db:
+            await crud_statistics.rebuild_rollups(db, user_ids)
+        return len(user_ids)
+
+    processed = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            batch = list((await db.scalars(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            )).all())
+            if not batch:
+                break
+            await crud_statistics.rebuild_rollups(db, batch)
+        processed += len(batch)
+        last_id = batch[-1]
+        print(f"rebuilt {processed} users (last id {last_id})")
+    return processed
+
+
+async def _main(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    try:
+        processed = await rebuild(args.user_id, args.batch_size)
+    finally:
+        await engine.dispose()
+    print(f"done: {processed} users in {time.perf_counter() - started:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Пересобирает дневные агрегаты статистики и персональные рекорды.")
+    parser.add_argument("--user-id", type=int, action="append", help="Только указанные пользователи")
+    parser.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Отмена длинной сессии и удаление аккаунта с многолетней историей: ORM-каскад по
+загруженному дереву (как до passive_deletes) против одного DELETE и ON DELETE CASCADE.
+
+Удаление необратимо, поэтому перед каждым замером история наполняется заново.
+
+    TEST_DATABASE_URL=... python -m benchmarks.cascade_delete --sessions 450
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import benchmark_database, percentile, print_table, seed_history
+from benchmarks.principal import FULL_USER_GRAPH
+from app.crud import loaders, session as crud_session, user as crud_user
+from app.db import Base
+from app.models import User, WorkoutSession
+from app.query_stats import track_queries
+
+USER_ID = 1
+SESSION_ID = 1
+
+
+async def cancel_before(db: AsyncSession) -> None:
+    session = await db.get(WorkoutSession, SESSION_ID, options=loaders.SESSION_TREE)
+    await db.delete(session)
+    await db.commit()
+
+
+async def cancel_after(db: AsyncSession) -> None:
+    session = await db.get(WorkoutSession, SESSION_ID, options=loaders.SESSION_ONLY)
+    await crud_session.cancel_session(db, session)
+
+
+async def delete_account_before(db: AsyncSession) -> None:
+    user = (await db.scalars(select(User).where(User.id == USER_ID).options(*FULL_USER_GRAPH))).one()
+    await db.delete(user)
+    await db.commit()
+
+
+async def delete_account_after(db: AsyncSession) -> None:
+    user = await crud_user.get_user_with_relationships(db, USER_ID)
+    await db.delete(user)
+    await db.commit()
+
+
+async def main(sessions: int, exercises: int, sets: int, repeat: int) -> None:
+    rows = []
+    async with benchmark_database() as (engine, session_factory):
+        tables = ", ".join(f'"{table.name}"' for table in Base.metadata.sorted_tables)
+
+        async def run(seed: Callable[[], Awaitable[None]], delete: Callable[[AsyncSession], Awaitable[None]]):
+            timings = []
+            for _ in range(repeat):
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+                await seed()
+                async with session_factory() as db:
+                    with track_queries() as stats:
+                        started = time.perf_counter()
+                        await delete(db)
+                        timings.append((time.perf_counter() - started) * 1000)
+                async with engine.connect() as conn:
+                    assert await conn.scalar(text("SELECT count(*) FROM session_sets")) == 0
+            return stats, percentile(timings, 50)
+
+        async def long_session():
+            await seed_history(engine, users=1, sessions=1, exercises=exercises * 5, sets=sets * 2, active=True)
+
+        async def history():
+            await seed_history(engine, users=1, sessions=sessions, exercises=exercises, sets=sets)
+
+        for title, seed, variants in (
+            (f"отмена сессии {exercises * 5} x {sets * 2}", long_session, (
+                ("ORM-каскад (до)", cancel_before), ("ON DELETE CASCADE", cancel_after),
+            )),
+            (f"удаление аккаунта, {sessions} сессий {exercises} x {sets}", history, (
+                ("ORM-каскад (до)", delete_account_before), ("ON DELETE CASCADE", delete_account_after),
+            )),
+        ):
+            for label, delete in variants:
+                stats, ms = await run(seed, delete)
+                rows.append((f"{title}: {label}", stats.statements, stats.rows, ms))
+
+    print_table(
+        f"Удаление через каскад ({repeat} повторов)",
+        ("вариант", "выражений", "строк", "мс (медиана)"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=450, help="Около трех лет по три тренировки в неделю")
+    parser.add_argument("--exercises", type=int, default=6)
+    parser.add_argument("--sets", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.exercises, args.sets, args.repeat))
@@ -0,0 +1,228 @@
+"""
+Общие помощники бенчмарков: подключение к БД, наполнение историей, типовые ответы API,
+замеры и вывод таблиц.
+"""
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    # Engine приложения создается при импорте app.db: подменяем БД до импорта app
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["IDEMPOTENCY_PURGE_ENABLED"] = "false"
+os.environ["STALE_SESSION_REAPER_ENABLED"] = "false"
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker  # noqa: E402
+
+from app.db import Base, create_engine_from_settings  # noqa: E402
+from app.logger import logger  # noqa: E402
+from app.models import SessionStatus  # noqa: E402
+from app.query_stats import track_queries  # noqa: E402
+from app.schemas.session import ActiveWorkoutSession  # noqa: E402
+
+# Отладочный вывод приложения и пула соединений заглушил бы таблицы результатов
+logger.setLevel(logging.WARNING)
+
+# Синтетическая история: у пользователя u сессии с id (u - 1) * sessions + s, последняя
+# (если active) — IN_PROGRESS. Упражнения берутся из справочника по кругу, чтобы
+# объем по группам мышц считался по реальным связям.
+HISTORY_SEED_STATEMENTS = (
+    """
+    INSERT INTO users (id, email, username, hashed_password, telegram_id)
+    SELECT u, 'user' || u || '@example.com', 'user' || u, 'x', 100000 + u
+    FROM generate_series(1, CAST(:users AS integer)) AS u
+    """,
+    """
+    INSERT INTO workout_sessions (id, user_id, status, started_at, completed_at, duration_minutes, revision)
+    SELECT (u - 1) * n + s, u,
+           CASE WHEN CAST(:active AS boolean) AND s = n THEN 'IN_PROGRESS' ELSE 'COMPLETED' END::sessionstatus,
+           now() - make_interval(days => n - s, hours => 2),
+           CASE WHEN CAST(:active AS boolean) AND s = n THEN NULL ELSE now() - make_interval(days => n - s, hours => 1) END,
+           60, 0
+    FROM CAST(:sessions AS integer) AS n,
+         generate_series(1, CAST(:users AS integer)) AS u,
+         generate_series(1, n) AS s
+    """,
+    """
+    INSERT INTO session_days (id, workout_session_id, plan_day_name, "order", status)
+    SELECT id, id, 'День', 0,
+           CASE WHEN status = 'IN_PROGRESS' THEN 'PENDING' ELSE 'COMPLETED' END::sessionstatus
+    FROM workout_sessions
+    """,
+    """
+    INSERT INTO session_exercises (id, session_day_id, plan_exercise_name, "order", status)
+    SELECT (d.id - 1) * n + e, d.id,
+           coalesce(catalog.names[1 + (d.id + e) % greatest(cardinality(catalog.names), 1)], 'Упражнение ' || e),
+           e - 1, d.status
+    FROM CAST(:exercises AS integer) AS n,
+         (SELECT coalesce(array_agg(name ORDER BY id), ARRAY[]::varchar[]) AS names FROM exercises) AS catalog,
+         session_days AS d,
+         generate_series(1, n) AS e
+    """,
+    """
+    INSERT INTO session_sets (id, session_exercise_id, "order", status, plan_reps_min, plan_reps_max,
+                              reps_done, weight_lifted)
+    SELECT (x.id - 1) * n + k, x.id, k - 1, x.status, 8, 12,
+           CASE WHEN x.status = 'COMPLETED' THEN 8 + k END,
+           CASE WHEN x.status = 'COMPLETED' THEN 20 + (x.id % 60) END
+    FROM CAST(:sets AS integer) AS n, session_exercises AS x, generate_series(1, n) AS k
+    """,
+)
+
+SEQUENCE_TABLES = ("users", "workout_sessions", "session_days", "session_exercises", "session_sets")
+
+
+def require_database() -> str:
+    """
+    :return: TEST_DATABASE_URL; без него бенчмарк завершается с подсказкой.
+    """
+    if not TEST_DATABASE_URL:
+        sys.exit("TEST_DATABASE_URL не задан: бенчмарк пересоздает все таблицы этой БД (см. benchmarks/__init__.py)")
+    return TEST_DATABASE_URL
+
+
+@asynccontextmanager
+async def benchmark_database() -> AsyncIterator[Tuple[AsyncEngine, async_sessionmaker]]:
+    """
+    Пустая схема в TEST_DATABASE_URL: отдельный engine с учетом SQL-выражений
+    (track_queries) и фабрика сессий к нему.
+    """
+    engine = create_engine_from_settings(require_database())
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        yield engine, async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+async def seed_history(
+        engine: AsyncEngine, users: int, sessions: int, exercises: int = 6, sets: int = 4, active: bool = False,
+) -> None:
+    """
+    Наполняет БД историей: users пользователей по sessions сессий, exercises x sets в каждой.
+    Последовательности id сдвигаются за вставленные строки, после чего выполняется ANALYZE.
+    """
+    params = {"users": users, "sessions": sessions, "exercises": exercises, "sets": sets, "active": active}
+    async with engine.begin() as conn:
+        for statement in HISTORY_SEED_STATEMENTS:
+            await conn.execute(text(statement), params)
+        for table in SEQUENCE_TABLES:
+            await conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM {table}), false)"
+            ))
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+
+
+async def seed_exercise_catalog(engine: AsyncEngine) -> None:
+    """
+    Справочник мышечных групп и упражнений из миграции 002.
+    """
+    from tests.factories import seed_exercise_catalog as seed
+
+    async with AsyncSession(engine) as db:
+        await seed(db)
+
+
+async def measure(
+        fn: Callable[[], Awaitable[Any]], repeat: int, warmup: int = 1,
+) -> Dict[str, float]:
+    """
+    Выполняет fn warmup + repeat раз и возвращает средние по замерам:
+    statements и rows (app/query_stats.py), ms — медиана времени, p99_ms.
+    """
+    for _ in range(warmup):
+        await fn()
+    timings: List[float] = []
+    statements = rows = 0
+    for _ in range(repeat):
+        with track_queries() as stats:
+            started = time.perf_counter()
+            await fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        statements += stats.statements
+        rows += stats.rows
+    return {
+        "statements": statements / repeat,
+        "rows": rows / repeat,
+        "ms": percentile(timings, 50),
+        "p99_ms": percentile(timings, 99),
+    }
+
+
+def build_active_session(days: int, exercises: int, sets: int) -> ActiveWorkoutSession:
+    """
+    Ответ GET /sessions/active для дерева days x exercises x sets: половина подходов выполнена.
+    """
+    set_id = 0
+    session_days = []
+    for d in range(days):
+        session_exercises = []
+        for e in range(exercises):
+            exercise_id = d * exercises + e + 1
+            session_sets = []
+            for k in range(sets):
+                set_id += 1
+                session_sets.append({
+                    "id": set_id, "session_exercise_id": exercise_id, "order": k,
+                    "status": SessionStatus.COMPLETED if k < sets // 2 else SessionStatus.PENDING,
+                    "plan_reps_min": 8, "plan_reps_max": 12, "plan_weight": 42.5,
+                    "reps_done": 10 if k < sets // 2 else None, "weight_lifted": 42.5 if k < sets // 2 else None,
+                })
+            session_exercises.append({
+                "id": exercise_id, "session_day_id": d + 1, "plan_exercise_name": f"Упражнение {e + 1}",
+                "order": e, "status": SessionStatus.IN_PROGRESS, "session_sets": session_sets,
+            })
+        session_days.append({
+            "id": d + 1, "workout_session_id": 1, "plan_day_name": f"День {d + 1}", "order": d,
+            "status": SessionStatus.IN_PROGRESS, "session_exercises": session_exercises,
+        })
+    return ActiveWorkoutSession(
+        id=1, user_id=1, workout_plan_id=1, started_at=datetime.now(timezone.utc),
+        status=SessionStatus.IN_PROGRESS, session_days=session_days,
+    )
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """
+    Перцентиль p (0..100) методом ближайшего ранга.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def print_table(title: str, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+    """
+    Печатает таблицу результатов: числа округляются до 0.1.
+    """
+    def cell(value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:,.1f}"
+        if isinstance(value, int):
+            return f"{value:,}"
+        return str(value)
+
+    cells = [[cell(value) for value in row] for row in rows]
+    widths = [max(len(column), *(len(row[i]) for row in cells)) for i, column in enumerate(columns)]
+    print(f"\n{title}")
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row, raw in zip(cells, rows):
+        # Числа выравниваются по правому краю, текст — по левому
+        print("  ".join(
+            value.rjust(width) if isinstance(source, (int, float)) else value.ljust(width)
+            for value, width, source in zip(row, widths, raw)
+        ))
@@ -0,0 +1,112 @@
+"""
+Сериализация ответов плана, активной сессии и статистики: JSONResponse со стандартным
+json (как до FastJSONResponse) против dumps из app/responses.py с orjson и без него.
+Строка "нативные типы" кодирует model_dump() с datetime и SessionStatus без
+предварительного приведения к JSON-типам. БД не нужна.
+
+    python -m benchmarks.json_encoder --repeat 500
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict
+from unittest import mock
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from benchmarks.common import build_active_session, percentile, print_table
+from app import responses
+from app.schemas.statistics import StatisticsResponse
+from app.schemas.workout import WorkoutPlan
+
+
+def build_plan(days: int, exercises: int) -> WorkoutPlan:
+    return WorkoutPlan(
+        id=1, user_id=1, name="План", split_type="split", generated_at=datetime.now(timezone.utc),
+        days=[
+            {
+                "day_name": f"День {d + 1}",
+                "exercises": [
+                    {
+                        "name": f"Упражнение {e + 1}", "muscle_group": "Грудь", "sets": 4, "reps": (8, 12),
+                        "weight": 42.5, "equipment": "Штанга", "rest_seconds": 90,
+                    }
+                    for e in range(exercises)
+                ],
+            }
+            for d in range(days)
+        ],
+    )
+
+
+def build_statistics(exercises: int, days: int) -> StatisticsResponse:
+    today = date.today()
+    return StatisticsResponse(
+        summary={
+            "total_workouts": days, "total_duration_minutes": days * 60.0, "total_volume_kg": 1234567.5,
+            "total_sets": days * 24, "total_reps": days * 240,
+            "personal_records": [
+                {"exercise_name": f"Упражнение {e + 1}", "max_weight_kg": 100.5, "reps": 5, "date": today.isoformat()}
+                for e in range(exercises)
+            ],
+        },
+        volume_by_muscle_group=[{"muscle_group": f"Группа {g + 1}", "volume_kg": 10000.25} for g in range(12)],
+        progress_charts={"overall_volume": [
+            {"date": (today - timedelta(days=d)).isoformat(), "value_kg": 4321.5} for d in range(days)
+        ]},
+    )
+
+
+def _time_per_call(fn: Callable[[], bytes], repeat: int) -> float:
+    """
+    Медиана времени одного вызова, мкс.
+    """
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return percentile(timings, 50)
+
+
+def main(repeat: int) -> None:
+    payloads: Dict[str, BaseModel] = {
+        "план 6 x 8": build_plan(6, 8),
+        "сессия 3 x 20 x 8": build_active_session(3, 20, 8),
+        "статистика 60 рекордов, 365 дней": build_statistics(60, 365),
+    }
+    rows = []
+    for name, model in payloads.items():
+        content = model.model_dump(mode="json")
+        native = model.model_dump()
+        with mock.patch.object(responses, "JSON_ENCODER", "stdlib"):
+            stdlib_body = responses.dumps(content)
+            stdlib_us = _time_per_call(lambda: responses.dumps(content), repeat)
+            stdlib_native_body = responses.dumps(native)
+            stdlib_native_us = _time_per_call(lambda: responses.dumps(native), repeat)
+        assert responses.loads(responses.dumps(content)) == responses.loads(stdlib_body)
+        rows.extend((
+            (name, "JSONResponse, json (до)", len(JSONResponse(content).body),
+             _time_per_call(lambda: JSONResponse(content).body, repeat)),
+            (name, "dumps, json", len(stdlib_body), stdlib_us),
+            (name, f"dumps, {responses.JSON_ENCODER}", len(responses.dumps(content)),
+             _time_per_call(lambda: responses.dumps(content), repeat)),
+            (name, "dumps, json, нативные типы", len(stdlib_native_body), stdlib_native_us),
+            (name, f"dumps, {responses.JSON_ENCODER}, нативные типы", len(responses.dumps(native)),
+             _time_per_call(lambda: responses.dumps(native), repeat)),
+        ))
+
+    print_table(
+        f"Сериализация ответа ({repeat} повторов, JSON_ENCODER={responses.JSON_ENCODER})",
+        ("ответ", "энкодер", "байт", "мкс (медиана)"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    main(args.repeat)
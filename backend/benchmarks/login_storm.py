@@ -0,0 +1,122 @@
+"""
+Шторм логинов: задержка постороннего эндпоинта (GET /users/me) во время параллельных
+POST /auth/login. bcrypt в event loop (как до пула) против PasswordHasherPool
+с потоками и процессами.
+
+    TEST_DATABASE_URL=... python -m benchmarks.login_storm --logins 8 --seconds 5
+"""
+import argparse
+import asyncio
+import logging
+import time
+from unittest import mock
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.common import benchmark_database, percentile, print_table
+from app import auth, security
+from app.db import engine as app_engine
+from app.main import app
+
+USERNAME = "storm"
+PASSWORD = "storm-password"
+TELEGRAM_ID = 100001
+
+# passlib с bcrypt 4.x пишет трассировку при чтении версии модуля; на работу она не влияет
+logging.getLogger("passlib").setLevel(logging.ERROR)
+
+
+async def _inline_verify(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+
+async def _storm(client: httpx.AsyncClient, logins: int, seconds: float) -> dict:
+    """
+    logins клиентов логинятся в цикле, пока проба последовательно запрашивает GET /users/me.
+    """
+    stop = asyncio.Event()
+    completed = 0
+
+    async def login_loop():
+        nonlocal completed
+        while not stop.is_set():
+            response = await client.post("/auth/login", data={"username": USERNAME, "password": PASSWORD})
+            assert response.status_code == 200, response.text
+            completed += 1
+
+    workers = [asyncio.create_task(login_loop()) for _ in range(logins)]
+    timings = []
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < seconds:
+            probe_started = time.perf_counter()
+            response = await client.get("/users/me", headers={"X-Telegram-User-ID": str(TELEGRAM_ID)})
+            assert response.status_code == 200, response.text
+            timings.append((time.perf_counter() - probe_started) * 1000)
+    finally:
+        stop.set()
+        await asyncio.gather(*workers)
+    return {
+        "logins_per_second": completed / (time.perf_counter() - started),
+        "p50_ms": percentile(timings, 50),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": max(timings),
+    }
+
+
+async def main(logins: int, seconds: float, rounds: int, workers: int) -> None:
+    async with benchmark_database() as (engine, _):
+        hashed_password = security.pwd_context.using(bcrypt__rounds=rounds).hash(PASSWORD)
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "INSERT INTO users (email, username, hashed_password, telegram_id) "
+                    "VALUES ('storm@example.com', :username, :hashed_password, :telegram_id)"
+                ),
+                {"username": USERNAME, "hashed_password": hashed_password, "telegram_id": TELEGRAM_ID},
+            )
+
+    modes = (
+        ("bcrypt в event loop (до)", None),
+        ("пул потоков", security.PasswordHasherPool("thread", workers, workers)),
+        ("пул процессов", security.PasswordHasherPool("process", workers, workers)),
+    )
+    rows = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            idle = await _storm(client, logins=0, seconds=min(seconds, 1))
+            rows.append(("без логинов", 0.0, idle["p50_ms"], idle["p99_ms"], idle["max_ms"], "-"))
+            for label, hasher in modes:
+                if hasher is None:
+                    patch = mock.patch.object(auth, "verify_password_async", _inline_verify)
+                else:
+                    patch = mock.patch.object(security, "password_hasher", hasher)
+                with patch:
+                    # Прогрев: запуск процессов пула и соединений не попадает в замер
+                    await _storm(client, logins=logins, seconds=0.5)
+                    result = await _storm(client, logins=logins, seconds=seconds)
+                if hasher is not None:
+                    hasher.shutdown()
+                rows.append((
+                    label, result["logins_per_second"], result["p50_ms"], result["p99_ms"], result["max_ms"],
+                    hasher.max_queued if hasher is not None else "-",
+                ))
+    finally:
+        await app_engine.dispose()
+
+    print_table(
+        f"GET /users/me во время {logins} параллельных логинов (bcrypt rounds={rounds}, {workers} воркеров пула)",
+        ("bcrypt", "логинов/с", "мс (медиана)", "мс (p99)", "мс (max)", "max очередь пула"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=8, help="Параллельных клиентов, выполняющих логин")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rounds", type=int, default=12, help="Стоимость bcrypt хеша пользователя")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.seconds, args.rounds, args.workers))
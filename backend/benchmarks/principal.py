@@ -0,0 +1,76 @@
+"""
+Загрузка текущего пользователя на каждый запрос: полный User со связями
+(как до облегченного Principal) против get_current_principal.
+
+    TEST_DATABASE_URL=... python -m benchmarks.principal --sessions 500
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from benchmarks.common import benchmark_database, measure, print_table, seed_history
+from app.crud import user as crud_user
+from app.models import SessionDay, SessionExercise, User, WorkoutSession
+
+TELEGRAM_ID = 100001
+
+# Связи, которые User раньше загружал на каждую проверку (lazy="selectin" по всему дереву)
+FULL_USER_GRAPH = (
+    selectinload(User.workout_plans),
+    selectinload(User.workout_sessions)
+    .selectinload(WorkoutSession.session_days)
+    .selectinload(SessionDay.session_exercises)
+    .selectinload(SessionExercise.session_sets),
+    selectinload(User.progress_entries),
+    selectinload(User.preferences),
+)
+
+
+async def main(sessions: int, repeat: int) -> None:
+    async with benchmark_database() as (engine, session_factory):
+        await seed_history(engine, users=1, sessions=sessions)
+
+        async def full_user():
+            async with session_factory() as db:
+                await db.execute(select(User).where(User.telegram_id == TELEGRAM_ID).options(*FULL_USER_GRAPH))
+
+        async def profile():
+            crud_user.telegram_principal_cache.clear()
+            async with session_factory() as db:
+                principal = await crud_user.get_principal_by_telegram_id(db, TELEGRAM_ID)
+                await crud_user.get_user_with_relationships(db, principal.id)
+
+        async def principal_miss():
+            crud_user.telegram_principal_cache.clear()
+            async with session_factory() as db:
+                await crud_user.get_principal_by_telegram_id(db, TELEGRAM_ID)
+
+        async def principal_hit():
+            async with session_factory() as db:
+                await crud_user.get_principal_by_telegram_id(db, TELEGRAM_ID)
+
+        rows = []
+        for label, fn in (
+            ("User со всеми связями (до)", full_user),
+            ("get_user_by_token_or_telegram_id, промах кэша", profile),
+            ("get_current_principal, промах кэша", principal_miss),
+            ("get_current_principal, кэш", principal_hit),
+        ):
+            result = await measure(fn, repeat)
+            rows.append((label, result["statements"], result["rows"], result["ms"], result["p99_ms"]))
+
+    print_table(
+        f"Аутентификация пользователя с {sessions} сессиями ({repeat} повторов)",
+        ("вариант", "выражений", "строк", "мс (медиана)", "мс (p99)"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.repeat))
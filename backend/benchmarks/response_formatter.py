@@ -0,0 +1,140 @@
+"""
+Обертка ответа в конверт {status_code, error, data, path, meta} для большого
+ActiveWorkoutSession: BaseHTTPMiddleware с накоплением тела через bytes +=, json.loads
+и JSONResponse (как до перехода на чистый ASGI) против ResponseFormatterMiddleware.
+
+Маршрут отдает готовые байты одним чанком и чанками по --chunk-size, middleware
+вызываются напрямую по ASGI, без HTTP-клиента. БД не нужна.
+
+    python -m benchmarks.response_formatter --days 3 --exercises 20 --sets 8
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from benchmarks.common import build_active_session, percentile, print_table
+from app.middleware.response_formatter import ResponseFormatterMiddleware
+from app.responses import dumps, loads
+
+PATH = "/sessions/active"
+
+
+class LegacyResponseFormatterMiddleware(BaseHTTPMiddleware):
+    """
+    Формирование конверта до перехода на чистый ASGI (только для сравнения).
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        response: Response = await call_next(request)
+        body_bytes = b""
+        async for chunk in response.body_iterator:
+            body_bytes += chunk
+        orig_headers = dict(response.headers)
+        payload = json.loads(body_bytes.decode("utf-8"))
+        new_content = {
+            "status_code": response.status_code,
+            "error": None,
+            "data": payload,
+            "path": str(request.url.path),
+            "meta": {"ts": int(time.time())},
+        }
+        new_resp = JSONResponse(content=new_content, status_code=response.status_code)
+        for k, v in orig_headers.items():
+            if k.lower() in ("content-length", "content-type"):
+                continue
+            new_resp.headers[k] = v
+        return new_resp
+
+
+def route(body: bytes, chunk_size: int):
+    """
+    ASGI-маршрут, отдающий body одним сообщением (chunk_size=0) или чанками.
+    """
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] if chunk_size else [body]
+    headers = [(b"content-type", b"application/json")]
+    if len(chunks) == 1:
+        headers.append((b"content-length", str(len(body)).encode()))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    return app
+
+
+async def call(app) -> bytes:
+    """
+    Выполняет GET PATH по ASGI и возвращает тело ответа.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": PATH, "raw_path": PATH.encode(), "query_string": b"", "root_path": "",
+        "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Клиент не отключается: ожидание отменит сам middleware
+        await asyncio.Event().wait()
+
+    body: List[bytes] = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def main(days: int, exercises: int, sets: int, chunk_size: int, repeat: int) -> None:
+    body = dumps(build_active_session(days, exercises, sets).model_dump(mode="json"))
+    rows = []
+    for chunking, size in (("одним чанком", 0), (f"чанками по {chunk_size} Б", chunk_size)):
+        expected = None
+        for label, wrap in (
+            ("без конверта", lambda app: app),
+            ("BaseHTTPMiddleware (до)", LegacyResponseFormatterMiddleware),
+            ("ResponseFormatterMiddleware", ResponseFormatterMiddleware),
+        ):
+            app = wrap(route(body, size))
+            output = await call(app)
+            if label != "без конверта":
+                data = loads(output)["data"]
+                if expected is None:
+                    expected = data
+                assert data == expected, "конверты различаются"
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await call(app)
+                timings.append((time.perf_counter() - started) * 1_000_000)
+            rows.append((f"{label}, {chunking}", len(output), percentile(timings, 50), percentile(timings, 99)))
+
+    print_table(
+        f"GET {PATH}: {days} x {exercises} x {sets} подходов, тело {len(body):,} Б ({repeat} повторов)",
+        ("вариант", "байт ответа", "мкс (медиана)", "мкс (p99)"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--exercises", type=int, default=20)
+    parser.add_argument("--sets", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.days, args.exercises, args.sets, args.chunk_size, args.repeat))
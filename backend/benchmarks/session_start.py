@@ -0,0 +1,142 @@
+"""
+Одновременный старт тренировок: create_session_from_plan с flush на каждом уровне
+и повторной загрузкой дерева (как до многострочных INSERT ... RETURNING) против текущей.
+
+Каждый из --users пользователей стартует день своего плана; все старты запускаются
+одновременно и делят пул соединений приложения (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+
+    TEST_DATABASE_URL=... python -m benchmarks.session_start --users 1000 --exercises 6 --sets 4
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from benchmarks.common import benchmark_database, percentile, print_table
+from app.crud import session as crud_session
+from app.models import SessionDay, SessionExercise, SessionSet, SessionStatus, WorkoutPlan, WorkoutSession
+from app.query_stats import track_queries
+from app.schemas.workout import WorkoutDay
+
+
+async def legacy_create_session_from_plan(
+        db: AsyncSession, user_id: int, workout_plan: WorkoutPlan, day_index: int,
+) -> WorkoutSession:
+    """
+    Создание сессии до перехода на многострочные INSERT (только для сравнения).
+    """
+    if await crud_session.get_active_session_version(db, user_id):
+        raise ValueError("User already has an active workout session.")
+    plan_workout_day = WorkoutDay.model_validate(workout_plan.days[day_index])
+
+    new_session = WorkoutSession(user_id=user_id, workout_plan_id=workout_plan.id, status=SessionStatus.IN_PROGRESS)
+    db.add(new_session)
+    await db.flush()
+    new_session_day = SessionDay(
+        workout_session_id=new_session.id, plan_day_name=plan_workout_day.day_name,
+        order=day_index, status=SessionStatus.PENDING,
+    )
+    db.add(new_session_day)
+    await db.flush()
+    for exercise_order, plan_exercise in enumerate(plan_workout_day.exercises):
+        new_session_exercise = SessionExercise(
+            session_day_id=new_session_day.id, plan_exercise_name=plan_exercise.name,
+            order=exercise_order, status=SessionStatus.PENDING,
+        )
+        db.add(new_session_exercise)
+        await db.flush()
+        for set_num in range(1, plan_exercise.sets + 1):
+            db.add(SessionSet(
+                session_exercise_id=new_session_exercise.id, order=set_num, status=SessionStatus.PENDING,
+                plan_reps_min=plan_exercise.reps[0], plan_reps_max=plan_exercise.reps[1],
+                plan_weight=plan_exercise.weight,
+            ))
+    await db.commit()
+    await db.refresh(new_session)
+    result = await db.execute(
+        select(WorkoutSession)
+        .where(WorkoutSession.id == new_session.id)
+        .options(
+            selectinload(WorkoutSession.session_days)
+            .selectinload(SessionDay.session_exercises)
+            .selectinload(SessionExercise.session_sets)
+        )
+    )
+    return result.scalar_one()
+
+
+def build_plan_days(exercises: int, sets: int) -> list:
+    return [{
+        "day_name": "День 1",
+        "exercises": [
+            {
+                "name": f"Упражнение {e + 1}", "muscle_group": "Грудь", "sets": sets, "reps": [8, 12],
+                "weight": 40.0, "equipment": None, "rest_seconds": 90,
+            }
+            for e in range(exercises)
+        ],
+    }]
+
+
+async def main(users: int, exercises: int, sets: int) -> None:
+    async with benchmark_database() as (engine, session_factory):
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "INSERT INTO users (id, email, username, hashed_password) "
+                "SELECT u, 'user' || u || '@example.com', 'user' || u, 'x' FROM generate_series(1, :users) AS u"
+            ), {"users": users})
+            await conn.execute(text(
+                "INSERT INTO workout_plans (user_id, name, days) "
+                "SELECT u, 'План', CAST(:days AS jsonb) FROM generate_series(1, :users) AS u"
+            ), {"users": users, "days": json.dumps(build_plan_days(exercises, sets))})
+        async with session_factory() as db:
+            plans = (await db.scalars(select(WorkoutPlan))).all()
+
+        async def start_all(create) -> list:
+            timings = []
+
+            async def start(plan: WorkoutPlan):
+                started = time.perf_counter()
+                async with session_factory() as db:
+                    await create(db, plan.user_id, plan, 0)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            await asyncio.gather(*(start(plan) for plan in plans))
+            return timings
+
+        rows = []
+        for label, create in (
+            ("flush на каждом уровне (до)", legacy_create_session_from_plan),
+            ("многострочные INSERT ... RETURNING", crud_session.create_session_from_plan),
+        ):
+            async with engine.begin() as conn:
+                await conn.execute(text("TRUNCATE workout_sessions RESTART IDENTITY CASCADE"))
+            with track_queries() as stats:
+                started = time.perf_counter()
+                timings = await start_all(create)
+                elapsed = time.perf_counter() - started
+            async with session_factory() as db:
+                created_sets = await db.scalar(select(func.count()).select_from(SessionSet))
+            assert created_sets == users * exercises * sets, created_sets
+            rows.append((
+                label, stats.statements / users, users / elapsed, percentile(timings, 50), percentile(timings, 99),
+            ))
+
+    print_table(
+        f"{users} одновременных стартов дня {exercises} x {sets} подходов",
+        ("вариант", "выражений на старт", "стартов/с", "мс (медиана)", "мс (p99)"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--exercises", type=int, default=6)
+    parser.add_argument("--sets", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.exercises, args.sets))
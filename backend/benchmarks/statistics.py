@@ -0,0 +1,123 @@
+"""
+GET /statistics/me для пользователя с длинной историей: четыре последовательных запроса
+по полному соединению сессий и подходов (как до единого выражения) против
+get_user_statistics по дневным агрегатам и рекордам и попадания в кэш ответов.
+
+    TEST_DATABASE_URL=... python -m benchmarks.statistics --sessions 10000
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import Date, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import benchmark_database, measure, print_table, seed_exercise_catalog, seed_history
+from app.crud import statistics as crud_statistics
+from app.models import Exercise, MuscleGroup, SessionDay, SessionExercise, SessionSet, SessionStatus, WorkoutSession
+
+USER_ID = 1
+
+
+def _legacy_sets_query(user_id: int, period: str, *columns):
+    """
+    Соединение сессий, дней, упражнений и подходов, по которому прежде строился каждый раздел.
+    """
+    query = (
+        select(*columns)
+        .select_from(WorkoutSession)
+        .join(SessionDay, WorkoutSession.id == SessionDay.workout_session_id)
+        .join(SessionExercise, SessionDay.id == SessionExercise.session_day_id)
+        .join(SessionSet, SessionExercise.id == SessionSet.session_exercise_id)
+        .where(
+            WorkoutSession.user_id == user_id,
+            WorkoutSession.status == SessionStatus.COMPLETED,
+            SessionSet.status == SessionStatus.COMPLETED,
+            SessionSet.reps_done.isnot(None),
+            SessionSet.weight_lifted.isnot(None),
+        )
+    )
+    days = {"last_month": 30, "last_week": 7}.get(period)
+    if days is not None:
+        query = query.where(WorkoutSession.started_at >= datetime.utcnow() - timedelta(days=days))
+    return query
+
+
+async def legacy_statistics(db: AsyncSession, user_id: int, period: str) -> None:
+    """
+    Четыре запроса прежнего get_user_statistics: сводка, рекорды, группы мышц, график.
+    """
+    volume = SessionSet.reps_done * SessionSet.weight_lifted
+    await db.execute(_legacy_sets_query(
+        user_id, period,
+        func.count(func.distinct(WorkoutSession.id)), func.sum(WorkoutSession.duration_minutes),
+        func.sum(volume), func.count(SessionSet.id), func.sum(SessionSet.reps_done),
+    ))
+    ranked = _legacy_sets_query(
+        user_id, period,
+        SessionExercise.plan_exercise_name, SessionSet.weight_lifted, SessionSet.reps_done, WorkoutSession.started_at,
+        func.row_number().over(
+            partition_by=SessionExercise.plan_exercise_name,
+            order_by=[desc(SessionSet.weight_lifted), desc(SessionSet.reps_done), desc(WorkoutSession.started_at)],
+        ).label("rn"),
+    ).subquery()
+    (await db.execute(select(ranked).where(ranked.c.rn == 1))).all()
+    (await db.execute(
+        _legacy_sets_query(user_id, period, MuscleGroup.name, func.sum(volume).label("volume_kg"))
+        .join(Exercise, SessionExercise.plan_exercise_name == Exercise.name)
+        .join(MuscleGroup, Exercise.primary_muscle_group_id == MuscleGroup.id)
+        .group_by(MuscleGroup.name)
+        .order_by(desc("volume_kg"))
+    )).all()
+    day = func.date(WorkoutSession.completed_at, type_=Date)
+    (await db.execute(
+        _legacy_sets_query(user_id, period, day.label("date"), func.sum(volume))
+        .where(WorkoutSession.completed_at.isnot(None))
+        .group_by("date")
+        .order_by("date")
+    )).all()
+
+
+async def main(sessions: int, users: int, repeat: int) -> None:
+    async with benchmark_database() as (engine, session_factory):
+        await seed_exercise_catalog(engine)
+        await seed_history(engine, users=users, sessions=sessions)
+        async with session_factory() as db:
+            await crud_statistics.rebuild_rollups(db, list(range(1, users + 1)))
+
+        rows = []
+        for period in crud_statistics.STATISTICS_PERIODS:
+            async def legacy():
+                async with session_factory() as db:
+                    await legacy_statistics(db, USER_ID, period)
+
+            async def current():
+                async with session_factory() as db:
+                    await crud_statistics.get_user_statistics(db, USER_ID, period)
+
+            async def cached():
+                async with session_factory() as db:
+                    await crud_statistics.get_cached_statistics(db, USER_ID, period)
+
+            for label, fn in (
+                ("4 запроса по подходам (до)", legacy),
+                ("get_user_statistics", current),
+                ("get_cached_statistics, кэш", cached),
+            ):
+                result = await measure(fn, repeat)
+                rows.append((f"{period}: {label}", result["statements"], result["ms"], result["p99_ms"]))
+
+    print_table(
+        f"Статистика пользователя с {sessions:,} сессиями ({repeat} повторов)",
+        ("вариант", "выражений", "мс (медиана)", "мс (p99)"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10000, help="Сессий у каждого пользователя")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.users, args.repeat))
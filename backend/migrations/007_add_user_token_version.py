@@ -0,0 +1,13 @@
+from yoyo import step
+
+__depends__ = {'006_add_stateful_workout_sessions'}
+
+steps = [
+    step(
+        """
+        -- Версия токенов пользователя: увеличение отзывает все ранее выданные JWT
+        ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0;
+        """,
+        "ALTER TABLE users DROP COLUMN token_version;"
+    )
+]
@@ -0,0 +1,13 @@
+from yoyo import step
+
+__depends__ = {'007_add_user_token_version'}
+
+steps = [
+    step(
+        """
+        -- Счетчик изменений сессии: используется для ETag активной тренировки
+        ALTER TABLE workout_sessions ADD COLUMN revision INTEGER NOT NULL DEFAULT 0;
+        """,
+        "ALTER TABLE workout_sessions DROP COLUMN revision;"
+    )
+]
@@ -0,0 +1,55 @@
+from yoyo import step
+
+__depends__ = {'008_add_session_revision'}
+
+# CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+__transactional__ = False
+
+steps = [
+    step(
+        """
+        -- Поиск сессий пользователя по статусу (активная сессия, маркеры версий)
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_workout_sessions_user_status
+            ON workout_sessions (user_id, status);
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_workout_sessions_user_status;"
+    ),
+    step(
+        """
+        -- Активная тренировка пользователя: незавершенных сессий мало, индекс компактный
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_workout_sessions_user_in_progress
+            ON workout_sessions (user_id) WHERE status = 'IN_PROGRESS';
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_workout_sessions_user_in_progress;"
+    ),
+    step(
+        """
+        -- Статистика: завершенные сессии пользователя с фильтром по периоду
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_workout_sessions_user_completed_started
+            ON workout_sessions (user_id, started_at) WHERE status = 'COMPLETED';
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_workout_sessions_user_completed_started;"
+    ),
+    step(
+        """
+        -- Внешние ключи дерева сессии: загрузка дерева, статистика и каскадное удаление
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_session_days_session_order
+            ON session_days (workout_session_id, "order");
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_session_days_session_order;"
+    ),
+    step(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_session_exercises_day_order
+            ON session_exercises (session_day_id, "order");
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_session_exercises_day_order;"
+    ),
+    step(
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_session_sets_exercise_order
+            ON session_sets (session_exercise_id, "order");
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_session_sets_exercise_order;"
+    ),
+]
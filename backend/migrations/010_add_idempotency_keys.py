@@ -0,0 +1,24 @@
+from yoyo import step
+
+__depends__ = {'009_add_session_indexes'}
+
+steps = [
+    step(
+        """
+        -- Ключи идемпотентности клиентских запросов (пакетная отметка подходов)
+        CREATE TABLE idempotency_keys (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            key VARCHAR(255) NOT NULL,
+            request_hash VARCHAR(64) NOT NULL,
+            status_code INTEGER,
+            response JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            CONSTRAINT uq_idempotency_keys_user_key UNIQUE (user_id, key)
+        );
+        CREATE INDEX ix_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+        """,
+        "DROP TABLE IF EXISTS idempotency_keys;"
+    )
+]
@@ -0,0 +1,25 @@
+from yoyo import step
+
+__depends__ = {'010_add_idempotency_keys'}
+
+# CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+__transactional__ = False
+
+steps = [
+    step(
+        """
+        -- История сессий: keyset-пагинация по (started_at, id) в обратном порядке.
+        -- Покрывает и фильтр статистики по периоду, поэтому заменяет индекс из 009.
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_workout_sessions_user_completed_history
+            ON workout_sessions (user_id, started_at, id) WHERE status = 'COMPLETED';
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_workout_sessions_user_completed_history;"
+    ),
+    step(
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_workout_sessions_user_completed_started;",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_workout_sessions_user_completed_started
+            ON workout_sessions (user_id, started_at) WHERE status = 'COMPLETED';
+        """
+    ),
+]
@@ -0,0 +1,17 @@
+from yoyo import step
+
+__depends__ = {'011_add_session_history_index'}
+
+# CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+__transactional__ = False
+
+steps = [
+    step(
+        """
+        -- Поиск брошенных тренировок по возрасту (app/session_reaper.py)
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_workout_sessions_in_progress_started
+            ON workout_sessions (started_at) WHERE status = 'IN_PROGRESS';
+        """,
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_workout_sessions_in_progress_started;"
+    ),
+]
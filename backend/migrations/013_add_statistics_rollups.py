@@ -0,0 +1,73 @@
+from yoyo import step
+
+__depends__ = {'012_add_stale_session_index'}
+
+steps = [
+    step(
+        """
+        -- Итоги завершенных сессий пользователя по дням (дата начала сессии)
+        CREATE TABLE user_daily_stats (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            workouts INTEGER NOT NULL DEFAULT 0,
+            duration_minutes INTEGER NOT NULL DEFAULT 0,
+            volume_kg NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            sets INTEGER NOT NULL DEFAULT 0,
+            reps INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        );
+
+        -- Объем по основной группе мышц упражнения, по дням
+        CREATE TABLE user_daily_muscle_volume (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            muscle_group_id INTEGER NOT NULL REFERENCES muscle_groups(id) ON DELETE CASCADE,
+            volume_kg NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, muscle_group_id)
+        );
+        """,
+        """
+        DROP TABLE IF EXISTS user_daily_muscle_volume;
+        DROP TABLE IF EXISTS user_daily_stats;
+        """
+    ),
+    step(
+        """
+        -- Заполнение по существующей истории (то же, что python -m app.statistics_rollup)
+        INSERT INTO user_daily_stats (user_id, day, workouts, duration_minutes, volume_kg, sets, reps)
+        SELECT user_id, day, count(*), COALESCE(sum(duration_minutes), 0), sum(volume_kg), sum(sets), sum(reps)
+        FROM (
+            SELECT ws.user_id, date(ws.started_at) AS day, ws.duration_minutes,
+                   sum(ss.reps_done * ss.weight_lifted) AS volume_kg, count(*) AS sets, sum(ss.reps_done) AS reps
+            FROM workout_sessions ws
+            JOIN session_days sd ON sd.workout_session_id = ws.id
+            JOIN session_exercises se ON se.session_day_id = sd.id
+            JOIN session_sets ss ON ss.session_exercise_id = se.id
+            WHERE ws.status = 'COMPLETED'
+              AND ss.status = 'COMPLETED'
+              AND ss.reps_done IS NOT NULL
+              AND ss.weight_lifted IS NOT NULL
+            GROUP BY ws.id
+        ) per_session
+        GROUP BY user_id, day;
+
+        INSERT INTO user_daily_muscle_volume (user_id, day, muscle_group_id, volume_kg)
+        SELECT ws.user_id, date(ws.started_at), e.primary_muscle_group_id, sum(ss.reps_done * ss.weight_lifted)
+        FROM workout_sessions ws
+        JOIN session_days sd ON sd.workout_session_id = ws.id
+        JOIN session_exercises se ON se.session_day_id = sd.id
+        JOIN session_sets ss ON ss.session_exercise_id = se.id
+        JOIN exercises e ON e.name = se.plan_exercise_name
+        WHERE ws.status = 'COMPLETED'
+          AND ss.status = 'COMPLETED'
+          AND ss.reps_done IS NOT NULL
+          AND ss.weight_lifted IS NOT NULL
+          AND e.primary_muscle_group_id IS NOT NULL
+        GROUP BY 1, 2, 3;
+        """,
+        """
+        DELETE FROM user_daily_muscle_volume;
+        DELETE FROM user_daily_stats;
+        """
+    ),
+]
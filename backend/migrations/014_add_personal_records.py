@@ -0,0 +1,38 @@
+from yoyo import step
+
+__depends__ = {'013_add_statistics_rollups'}
+
+steps = [
+    step(
+        """
+        -- Лучший подход пользователя в каждом упражнении (по весу, затем по повторениям)
+        CREATE TABLE user_personal_records (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            exercise_name VARCHAR(200) NOT NULL,
+            weight_lifted NUMERIC(6, 2) NOT NULL,
+            reps_done INTEGER NOT NULL,
+            achieved_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (user_id, exercise_name)
+        );
+        """,
+        "DROP TABLE IF EXISTS user_personal_records;"
+    ),
+    step(
+        """
+        -- Заполнение по существующей истории (то же, что python -m app.statistics_rollup)
+        INSERT INTO user_personal_records (user_id, exercise_name, weight_lifted, reps_done, achieved_at)
+        SELECT DISTINCT ON (ws.user_id, se.plan_exercise_name)
+               ws.user_id, se.plan_exercise_name, ss.weight_lifted, ss.reps_done, ws.started_at
+        FROM workout_sessions ws
+        JOIN session_days sd ON sd.workout_session_id = ws.id
+        JOIN session_exercises se ON se.session_day_id = sd.id
+        JOIN session_sets ss ON ss.session_exercise_id = se.id
+        WHERE ws.status = 'COMPLETED'
+          AND ss.status = 'COMPLETED'
+          AND ss.reps_done IS NOT NULL
+          AND ss.weight_lifted IS NOT NULL
+        ORDER BY ws.user_id, se.plan_exercise_name, ss.weight_lifted DESC, ss.reps_done DESC, ws.started_at;
+        """,
+        "DELETE FROM user_personal_records;"
+    ),
+]
@@ -0,0 +1,106 @@
+"""
+Создание тестовых данных напрямую в БД (для run_db).
+"""
+import ast
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import SessionDay, SessionExercise, SessionSet, SessionStatus, User, WorkoutSession
+
+
+async def create_user(db: AsyncSession, telegram_id: int, **values) -> int:
+    user = User(
+        email=f"user{telegram_id}@example.com",
+        username=f"user{telegram_id}",
+        hashed_password="x",
+        telegram_id=telegram_id,
+        **values,
+    )
+    db.add(user)
+    await db.commit()
+    return user.id
+
+
+def telegram_headers(telegram_id: int) -> Dict[str, str]:
+    return {"X-Telegram-User-ID": str(telegram_id)}
+
+
+async def create_session(
+        db: AsyncSession,
+        user_id: int,
+        status: SessionStatus = SessionStatus.IN_PROGRESS,
+        started_at: Optional[datetime] = None,
+        completed_at: Optional[datetime] = None,
+        days: int = 1,
+        exercises: int = 2,
+        sets: int = 3,
+        set_status: Optional[SessionStatus] = None,
+        reps_done: Optional[int] = None,
+        weight_lifted: Optional[float] = None,
+        exercise_names: Optional[list] = None,
+) -> WorkoutSession:
+    """
+    Сессия с деревом days x exercises x sets. Подходы завершенной сессии по умолчанию
+    COMPLETED (с reps_done/weight_lifted), активной — PENDING.
+    """
+    done = status != SessionStatus.IN_PROGRESS
+    set_status = set_status or (SessionStatus.COMPLETED if done else SessionStatus.PENDING)
+    node_status = SessionStatus.COMPLETED if done else SessionStatus.PENDING
+    session = WorkoutSession(
+        user_id=user_id,
+        status=status,
+        started_at=started_at or datetime.now(timezone.utc),
+        completed_at=completed_at,
+        duration_minutes=60 if done else None,
+        revision=0,
+    )
+    session.session_days = [
+        SessionDay(
+            plan_day_name=f"День {d + 1}",
+            order=d,
+            status=node_status,
+            session_exercises=[
+                SessionExercise(
+                    plan_exercise_name=(exercise_names or [f"Упражнение {e + 1}" for e in range(exercises)])[e],
+                    order=e,
+                    status=node_status,
+                    session_sets=[
+                        SessionSet(
+                            order=k,
+                            status=set_status,
+                            plan_reps_min=8,
+                            plan_reps_max=12,
+                            reps_done=reps_done if set_status == SessionStatus.COMPLETED else None,
+                            weight_lifted=weight_lifted if set_status == SessionStatus.COMPLETED else None,
+                        )
+                        for k in range(sets)
+                    ],
+                )
+                for e in range(exercises)
+            ],
+        )
+        for d in range(days)
+    ]
+    db.add(session)
+    await db.commit()
+    return session
+
+
+async def seed_exercise_catalog(db: AsyncSession) -> None:
+    """
+    Справочник мышечных групп и упражнений из миграции 002 (create_all его не заполняет).
+    """
+    # Модуль миграции исполняется только внутри yoyo: берем из него строку up_sql
+    source = (Path(__file__).parent.parent / "migrations" / "002_seed_muscles_exercises.py").read_text()
+    up_sql = next(
+        node.value.value for node in ast.parse(source).body
+        if isinstance(node, ast.Assign) and node.targets[0].id == "up_sql"
+    )
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    # Несколько выражений в одном тексте: выполняем простым протоколом драйвера
+    await raw.driver_connection.execute(up_sql)
+    await db.commit()
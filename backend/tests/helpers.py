@@ -0,0 +1,44 @@
+"""
+Вспомогательные функции тестов с PostgreSQL.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def run_with_session_factory(fn: Callable[[async_sessionmaker], Awaitable[Any]]) -> Any:
+    """
+    Выполняет fn(session_factory) с отдельным engine в новом event loop и возвращает результат.
+    Engine приложения не используется: его соединения привязаны к циклу TestClient.
+    """
+    async def main():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            return await fn(async_sessionmaker(engine, expire_on_commit=False))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def run_db(fn: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+    """
+    Выполняет fn(db) в отдельной сессии (см. run_with_session_factory).
+    """
+    async def with_session(session_factory):
+        async with session_factory() as db:
+            return await fn(db)
+
+    return run_with_session_factory(with_session)
+
+
+def response_data(response) -> Any:
+    """
+    Поле data ответа API (ответы обернуты в {"status_code", "error", "data"}).
+    """
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
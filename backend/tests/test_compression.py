@@ -0,0 +1,105 @@
+"""
+CompressionMiddleware: выбор кодировки, ETag сжатых ответов и отчет по маршрутам.
+"""
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.etag import etag_matches, not_modified_response, set_etag
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, _negotiate_encoding
+
+ETAG = '"v1"'
+BODY = b'{"items": [' + b", ".join(b'"item %d"' % i for i in range(200)) + b"]}"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0.8, br;q=0.9", "br"),
+    ("gzip;q=1.0, br;q=1.0", "br"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("*;q=0.5, gzip;q=0.2", "br"),
+    ("*", "br"),
+    ("gzip;q=0, br;q=0", None),
+    ("deflate", None),
+    ("", None),
+])
+def test_negotiate_encoding_prefers_highest_q(header, expected):
+    assert _negotiate_encoding(header) == expected
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(compression, "compression_stats", compression.CompressionStats())
+    app = FastAPI()
+
+    @app.get("/options/items")
+    async def items(request: Request):
+        if etag_matches(request, ETAG):
+            return not_modified_response(ETAG)
+        response = Response(content=BODY, media_type="application/json")
+        set_etag(response, ETAG)
+        return response
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    app.add_middleware(CompressionMiddleware, minimum_size=100, precompressed_paths=("/options/",))
+    return TestClient(app)
+
+
+def _raw(client, path, headers):
+    """
+    Тело ответа без автоматической распаковки httpx.
+    """
+    with client.stream("GET", path, headers=headers) as response:
+        return b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_compressed_response_has_weak_etag_and_revalidates(client, encoding, decompress):
+    headers = {"Accept-Encoding": encoding}
+    response = client.get("/options/items", headers=headers)
+    assert response.headers["content-encoding"] == encoding
+    assert decompress(_raw(client, "/options/items", headers)) == BODY
+    assert response.headers["etag"] == "W/" + ETAG
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    # Клиент присылает слабый ETag: сравнение слабое, приложение отвечает 304
+    revalidated = client.get("/options/items", headers={**headers, "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == "W/" + ETAG
+
+
+def test_identity_response_keeps_strong_etag(client):
+    response = client.get("/options/items", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY
+    assert response.headers["etag"] == ETAG
+
+
+def test_size_report_per_route(client):
+    client.get("/options/items", headers={"Accept-Encoding": "br"})
+    client.get("/options/items", headers={"Accept-Encoding": "br"})
+    client.get("/options/items", headers={"Accept-Encoding": "gzip"})
+    client.get("/options/items", headers={"Accept-Encoding": "identity"})
+    client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    report = compression.compression_stats.snapshot()
+    items = report["/options/items"]
+    assert items["responses"] == 4
+    assert items["compressed"] == 3
+    # Второй br-ответ с тем же ETag переиспользует сжатые байты
+    assert items["precompressed_hits"] == 1
+    assert items["encodings"] == {"br": 2, "gzip": 1, "identity": 1}
+    assert items["bytes_in"] == 4 * len(BODY)
+    assert items["max_bytes_in"] == len(BODY)
+    assert 0 < items["bytes_saved"] < items["bytes_in"]
+    assert items["compression_ratio"] < 1
+    assert report["/small"]["encodings"] == {"identity": 1}
+    assert report["/small"]["bytes_saved"] == 0
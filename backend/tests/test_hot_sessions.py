@@ -0,0 +1,70 @@
+"""
+Хранилище активных сессий в памяти (HOT_SESSION_STORE_ENABLED).
+"""
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.hot_sessions import hot_sessions
+from app.models import SessionSet, SessionStatus, WorkoutSession
+from tests.helpers import response_data, run_db
+from tests.factories import create_session, create_user, telegram_headers
+
+pytestmark = pytest.mark.db
+
+TELEGRAM_ID = 1001
+
+
+@pytest.fixture
+def hot_store(client, monkeypatch):
+    monkeypatch.setattr(settings, "HOT_SESSION_STORE_ENABLED", True)
+    return client
+
+
+def _seed_session():
+    async def seed(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        session = await create_session(db, user_id, exercises=1, sets=1)
+        return user_id, session.id, session.session_days[0].session_exercises[0].session_sets[0].id
+
+    return run_db(seed)
+
+
+def _session_status(session_id: int) -> SessionStatus:
+    async def load(db):
+        return await db.scalar(select(WorkoutSession.status).where(WorkoutSession.id == session_id))
+
+    return run_db(load)
+
+
+def test_finished_session_is_not_served_when_flush_fails(hot_store, monkeypatch):
+    user_id, session_id, set_id = _seed_session()
+    headers = telegram_headers(TELEGRAM_ID)
+    assert response_data(hot_store.get("/sessions/active", headers=headers))["id"] == session_id
+
+    async def failing_flush(hot):
+        raise ConnectionError("db is down")
+
+    monkeypatch.setattr(hot_sessions, "flush", failing_flush)
+    response = hot_store.post(f"/sessions/sets/{set_id}/complete", json={"reps_done": 10, "weight_lifted": 50},
+                              headers=headers)
+    assert response_data(response)["session_status"] == SessionStatus.COMPLETED.value
+
+    # Запись не удалась: сессия остается в памяти, но как активная больше не отдается,
+    # а повторная отметка не уходит в БД, где подход еще PENDING
+    assert hot_sessions.finishing(user_id)
+    for _ in range(2):
+        assert response_data(hot_store.get("/sessions/active", headers=headers)) is None
+    response = hot_store.post(f"/sessions/sets/{set_id}/skip", headers=headers)
+    assert response.status_code == 400
+    assert _session_status(session_id) == SessionStatus.IN_PROGRESS
+
+    # Следующий flush_all записывает сессию и вытесняет ее, хотя она недавно запрашивалась
+    monkeypatch.undo()
+    monkeypatch.setattr(settings, "HOT_SESSION_STORE_ENABLED", True)
+    hot_store.portal.call(hot_sessions.flush_all)
+    assert hot_sessions._sessions == {}
+    assert _session_status(session_id) == SessionStatus.COMPLETED
+    set_status = run_db(lambda db: db.scalar(select(SessionSet.status).where(SessionSet.id == set_id)))
+    assert set_status == SessionStatus.COMPLETED
+    assert response_data(hot_store.get("/sessions/active", headers=headers)) is None
@@ -0,0 +1,80 @@
+"""
+POST /sessions/sets/batch с заголовком Idempotency-Key.
+"""
+import pytest
+from sqlalchemy import func, select
+
+from app.models import IdempotencyKey, WorkoutSession
+from tests.factories import create_session, create_user, telegram_headers
+from tests.helpers import response_data, run_db
+
+pytestmark = pytest.mark.db
+
+TELEGRAM_ID = 5001
+
+
+@pytest.fixture
+def seeded(client):
+    async def seed(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        session = await create_session(db, user_id, exercises=1, sets=3)
+        set_ids = [s.id for s in session.session_days[0].session_exercises[0].session_sets]
+        return session.id, set_ids
+
+    return run_db(seed)
+
+
+def _headers(key: str):
+    return {**telegram_headers(TELEGRAM_ID), "Idempotency-Key": key}
+
+
+def _revision(session_id: int) -> int:
+    return run_db(lambda db: db.scalar(select(WorkoutSession.revision).where(WorkoutSession.id == session_id)))
+
+
+def _key_count() -> int:
+    return run_db(lambda db: db.scalar(select(func.count()).select_from(IdempotencyKey)))
+
+
+def test_replay_returns_stored_response(client, seeded):
+    session_id, set_ids = seeded
+    body = {"items": [{"set_id": set_ids[0], "action": "complete", "reps_done": 10, "weight_lifted": 50}]}
+
+    first = client.post("/sessions/sets/batch", json=body, headers=_headers("k1"))
+    assert response_data(first)["session_status"] == "in_progress"
+    assert "Idempotent-Replayed" not in first.headers
+    revision = _revision(session_id)
+
+    replay = client.post("/sessions/sets/batch", json=body, headers=_headers("k1"))
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    # Повтор не применяет подходы заново
+    assert _revision(session_id) == revision
+
+
+def test_key_reused_with_different_body_conflicts(client, seeded):
+    _, set_ids = seeded
+    first = {"items": [{"set_id": set_ids[0], "action": "skip"}]}
+    other = {"items": [{"set_id": set_ids[1], "action": "skip"}]}
+
+    response_data(client.post("/sessions/sets/batch", json=first, headers=_headers("k2")))
+    response = client.post("/sessions/sets/batch", json=other, headers=_headers("k2"))
+    assert response.status_code == 409
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_failed_request_releases_key(client, seeded):
+    session_id, set_ids = seeded
+    # Подход не существует: ошибка проверки откатывает резервирование ключа
+    missing = {"items": [{"set_id": set_ids[-1] + 100, "action": "skip"}]}
+    response = client.post("/sessions/sets/batch", json=missing, headers=_headers("k3"))
+    assert response.status_code == 404
+    assert _key_count() == 0
+
+    # Тот же ключ свободен для исправленного запроса (не 409 и не повтор ошибки)
+    fixed = {"items": [{"set_id": set_ids[0], "action": "skip"}]}
+    response = client.post("/sessions/sets/batch", json=fixed, headers=_headers("k3"))
+    assert response_data(response)["sets"][0]["status"] == "skipped"
+    assert "Idempotent-Replayed" not in response.headers
+    assert _key_count() == 1
@@ -0,0 +1,85 @@
+"""
+Число SQL-выражений на запрос для горячих маршрутов (query_budget).
+Бюджеты — текущие значения: рост числа выражений должен быть осознанным.
+"""
+import pytest
+
+from app.query_stats import query_budget
+from tests.factories import create_user, seed_exercise_catalog, telegram_headers
+from tests.helpers import response_data, run_db
+
+pytestmark = pytest.mark.db
+
+TELEGRAM_ID = 4001
+
+
+@pytest.fixture
+def headers(client):
+    async def seed(db):
+        await seed_exercise_catalog(db)
+        await create_user(
+            db, TELEGRAM_ID, weight=80, height=180, age=30, fitness_goal="набор_массы",
+            experience_level="средний", workouts_per_week=3,
+        )
+
+    run_db(seed)
+    headers = telegram_headers(TELEGRAM_ID)
+    # Принципал пользователя попадает в кэш: дальше аутентификация не обращается к БД
+    client.get("/sessions/active", headers=headers)
+    return headers
+
+
+def _start_session(client, headers):
+    plan = response_data(client.post("/workouts/generate", headers=headers))
+    return response_data(client.post(
+        "/sessions/start", json={"workout_plan_id": plan["id"], "day_index": 0}, headers=headers,
+    ))
+
+
+def _set_ids(session):
+    return [s["id"] for d in session["session_days"] for e in d["session_exercises"] for s in e["session_sets"]]
+
+
+def test_generate_plan_budget(client, headers):
+    with query_budget(6):
+        response_data(client.post("/workouts/generate", headers=headers))
+
+
+def test_active_session_budget(client, headers):
+    session = _start_session(client, headers)
+    # Проверка версии и загрузка дерева: сессия, дни, упражнения, подходы
+    with query_budget(5):
+        response = client.get("/sessions/active", headers=headers)
+    assert response_data(response)["id"] == session["id"]
+
+    # Условный запрос без изменений: только проверка версии
+    with query_budget(1):
+        response = client.get("/sessions/active", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+def test_set_update_budget(client, headers):
+    set_ids = _set_ids(_start_session(client, headers))
+    with query_budget(2):
+        response_data(client.post(
+            f"/sessions/sets/{set_ids[0]}/complete", json={"reps_done": 8, "weight_lifted": 40}, headers=headers,
+        ))
+    with query_budget(2):
+        response_data(client.post(f"/sessions/sets/{set_ids[1]}/skip", headers=headers))
+
+
+def test_finish_session_budget(client, headers):
+    session = _start_session(client, headers)
+    with query_budget(11):
+        finished = response_data(client.post(f"/sessions/{session['id']}/finish", headers=headers))
+    assert finished["status"] == "completed"
+
+
+def test_statistics_budget(client, headers):
+    session = _start_session(client, headers)
+    response_data(client.post(f"/sessions/{session['id']}/finish", headers=headers))
+    # Промах — одно выражение со всеми разделами, попадание в кэш — без обращения к БД
+    with query_budget(1):
+        response_data(client.get("/statistics/me", headers=headers))
+    with query_budget(0):
+        response_data(client.get("/statistics/me", headers=headers))
@@ -0,0 +1,66 @@
+"""
+Read-your-writes при настроенной реплике: LSN коммита в ответе на запись.
+"""
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import db as db_module
+from app.db import READ_AFTER_HEADER, _LSN_PATTERN, create_engine_from_settings, engine, get_session
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
+from tests.helpers import TEST_DATABASE_URL, run_db
+
+pytestmark = pytest.mark.db
+
+
+@pytest.fixture
+def client(clean_db, monkeypatch):
+    # "Реплика" — отдельный engine к той же БД: включает учет LSN в get_session
+    monkeypatch.setattr(db_module, "read_engine", create_engine_from_settings(TEST_DATABASE_URL))
+    app = FastAPI()
+
+    @app.post("/write")
+    async def write(db: AsyncSession = Depends(get_session)):
+        await db.execute(text("INSERT INTO muscle_groups (name) VALUES ('test')"))
+        await db.commit()
+        return {"ok": True}
+
+    @app.post("/read-only")
+    async def read_only(db: AsyncSession = Depends(get_session)):
+        await db.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    app.add_middleware(ReadYourWritesMiddleware)
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+
+
+def _wal_at_least(lsn: str) -> bool:
+    return run_db(lambda db: db.scalar(text("SELECT pg_current_wal_lsn() >= CAST(CAST(:lsn AS text) AS pg_lsn)"), {"lsn": lsn}))
+
+
+def test_write_returns_commit_lsn_from_its_own_connection(client):
+    before = run_db(lambda db: db.scalar(text("SELECT pg_current_wal_lsn()::text")))
+    pool = engine.sync_engine.pool
+    checkouts = pool.checkouts
+
+    response = client.post("/write")
+    assert response.status_code == 200
+    lsn = response.headers[READ_AFTER_HEADER]
+    assert _LSN_PATTERN.match(lsn)
+    # Позиция после коммита записи: дальше позиции до запроса
+    assert run_db(lambda db: db.scalar(
+        text("SELECT CAST(CAST(:lsn AS text) AS pg_lsn) > CAST(CAST(:before AS text) AS pg_lsn)"), {"lsn": lsn, "before": before},
+    ))
+    assert _wal_at_least(lsn)
+    # Позиция читается на соединении запроса: второе соединение не берется
+    assert pool.checkouts - checkouts == 1
+
+
+def test_request_without_commit_has_no_lsn(client):
+    response = client.post("/read-only")
+    assert response.status_code == 200
+    assert READ_AFTER_HEADER not in response.headers
@@ -0,0 +1,127 @@
+"""
+Сборщик брошенных тренировок (SessionReaper).
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.crud import session as crud_session
+from app.models import SessionDay, SessionExercise, SessionSet, SessionStatus, WorkoutSession
+from app.session_reaper import SessionReaper
+from tests.factories import create_session, create_user
+from tests.helpers import run_db, run_with_session_factory
+
+pytestmark = pytest.mark.db
+
+SETS_PER_SESSION = 2 * 2
+
+
+@pytest.fixture
+def seeded(clean_db):
+    """
+    Три брошенные сессии (20, 30 и 40 часов), свежая активная и старая завершенная.
+    :return: {название: (user_id, session_id)}
+    """
+    async def seed(db):
+        now = datetime.now(timezone.utc)
+        sessions = {}
+        for i, (name, hours, status) in enumerate([
+            ("stale_20h", 20, SessionStatus.IN_PROGRESS),
+            ("stale_30h", 30, SessionStatus.IN_PROGRESS),
+            ("stale_40h", 40, SessionStatus.IN_PROGRESS),
+            ("fresh", 1, SessionStatus.IN_PROGRESS),
+            ("completed", 50, SessionStatus.COMPLETED),
+        ]):
+            user_id = await create_user(db, 6000 + i)
+            started_at = now - timedelta(hours=hours)
+            session = await create_session(
+                db, user_id, status=status, started_at=started_at, exercises=2, sets=2,
+                completed_at=started_at + timedelta(hours=1) if status == SessionStatus.COMPLETED else None,
+            )
+            sessions[name] = (user_id, session.id)
+        return sessions
+
+    return run_db(seed)
+
+
+def _run_reaper(action: str, monkeypatch):
+    """
+    Один проход с пакетами по 2 сессии; возвращает (результат, user_ids по пакетам).
+    """
+    batches = []
+    crud_function = crud_session.finish_stale_sessions if action == "finish" else crud_session.cancel_stale_sessions
+
+    async def recording(db, cutoff, batch_size):
+        result = await crud_function(db, cutoff, batch_size)
+        batches.append(result[0] if action == "finish" else result)
+        return result
+
+    monkeypatch.setattr(crud_session, crud_function.__name__, recording)
+
+    async def run(session_factory):
+        reaper = SessionReaper(session_factory=session_factory, max_age_hours=12, batch_size=2, action=action)
+        return await reaper.run_once(), await reaper.run_once(), reaper.stats()
+
+    first, second, stats = run_with_session_factory(run)
+    return first, second, stats, batches
+
+
+def _session_states():
+    async def load(db):
+        rows = await db.execute(select(
+            WorkoutSession.id, WorkoutSession.status, WorkoutSession.completed_at, WorkoutSession.duration_minutes,
+        ))
+        sets = await db.execute(
+            select(SessionDay.workout_session_id, SessionSet.status)
+            .join(SessionExercise, SessionExercise.id == SessionSet.session_exercise_id)
+            .join(SessionDay, SessionDay.id == SessionExercise.session_day_id)
+        )
+        set_statuses = {}
+        for session_id, status in sets:
+            set_statuses.setdefault(session_id, set()).add(status)
+        return {row.id: (row.status, row.completed_at, row.duration_minutes, set_statuses[row.id]) for row in rows}
+
+    return run_db(load)
+
+
+def test_finish_reaps_only_stale_sessions_in_batches(seeded, monkeypatch):
+    before = _session_states()
+    first, second, stats, batches = _run_reaper("finish", monkeypatch)
+
+    assert first == {"action": "finish", "batches": 2, "sessions": 3, "sets_skipped": 3 * SETS_PER_SESSION}
+    # Сначала самые старые; пакет меньше batch_size завершает проход, второй проход пуст
+    assert [set(batch) for batch in batches] == [
+        {seeded["stale_40h"][0], seeded["stale_30h"][0]},
+        {seeded["stale_20h"][0]},
+        set(),
+    ]
+    assert second == {"action": "finish", "batches": 0, "sessions": 0, "sets_skipped": 0}
+    assert stats["runs"] == 2 and stats["sessions_finished"] == 3 and stats["batches"] == 2
+
+    after = _session_states()
+    for name in ("stale_20h", "stale_30h", "stale_40h"):
+        session_id = seeded[name][1]
+        assert after[session_id] == (SessionStatus.COMPLETED, None, None, {SessionStatus.SKIPPED})
+    for name in ("fresh", "completed"):
+        session_id = seeded[name][1]
+        assert after[session_id] == before[session_id]
+
+
+def test_cancel_deletes_only_stale_sessions_in_batches(seeded, monkeypatch):
+    before = _session_states()
+    first, second, stats, batches = _run_reaper("cancel", monkeypatch)
+
+    assert first == {"action": "cancel", "batches": 2, "sessions": 3, "sets_skipped": 0}
+    assert [set(batch) for batch in batches] == [
+        {seeded["stale_40h"][0], seeded["stale_30h"][0]},
+        {seeded["stale_20h"][0]},
+        set(),
+    ]
+    assert second["sessions"] == 0
+    assert stats["sessions_cancelled"] == 3
+
+    after = _session_states()
+    assert set(after) == {seeded["fresh"][1], seeded["completed"][1]}
+    for session_id in after:
+        assert after[session_id] == before[session_id]
@@ -0,0 +1,99 @@
+"""
+Отметка подходов: пересчет статусов, следующий подход, рекорды и число обращений к БД.
+"""
+import pytest
+from sqlalchemy import select
+
+from app.models import SessionDay, SessionExercise, SessionStatus, WorkoutSession
+from app.query_stats import query_budget
+from tests.factories import create_session, create_user, telegram_headers
+from tests.helpers import response_data, run_db
+
+pytestmark = pytest.mark.db
+
+TELEGRAM_ID = 2001
+
+
+def _seed_session(**kwargs):
+    async def seed(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        session = await create_session(db, user_id, days=2, exercises=2, sets=2, **kwargs)
+        set_ids = [
+            s.id for d in session.session_days for e in d.session_exercises for s in e.session_sets
+        ]
+        return session.id, set_ids
+
+    return run_db(seed)
+
+
+def _statuses(session_id: int):
+    async def load(db):
+        session = await db.scalar(select(WorkoutSession).where(WorkoutSession.id == session_id))
+        exercises = (await db.scalars(
+            select(SessionExercise.status)
+            .join(SessionDay, SessionDay.id == SessionExercise.session_day_id)
+            .where(SessionDay.workout_session_id == session_id)
+            .order_by(SessionDay.order, SessionExercise.order)
+        )).all()
+        days = (await db.scalars(
+            select(SessionDay.status).where(SessionDay.workout_session_id == session_id).order_by(SessionDay.order)
+        )).all()
+        return session.status, session.revision, list(days), list(exercises)
+
+    return run_db(load)
+
+
+def test_complete_sets_rolls_up_statuses_in_two_statements(client):
+    session_id, set_ids = _seed_session()
+    headers = telegram_headers(TELEGRAM_ID)
+    # Прогрев: принципал пользователя попадает в кэш и не учитывается в бюджете
+    response_data(client.get("/sessions/active", headers=headers))
+
+    # Одинаковые упражнения в обоих днях: во втором дне веса ниже, рекордов нет
+    weights = [50, 60, 40, 45, 30, 70, 20, 20]
+    expected_records = [True, True, True, True, False, True, False, False]
+    for i, (set_id, weight) in enumerate(zip(set_ids, weights)):
+        last = i == len(set_ids) - 1
+        with query_budget(2 if not last else 10) as stats:
+            result = response_data(client.post(
+                f"/sessions/sets/{set_id}/complete", json={"reps_done": 10, "weight_lifted": weight},
+                headers=headers,
+            ))
+        assert result["id"] == set_id
+        assert result["status"] == SessionStatus.COMPLETED.value
+        assert result["new_personal_record"] is expected_records[i], i
+        if last:
+            assert result["next_set"] is None
+            assert result["session_status"] == SessionStatus.COMPLETED.value
+        else:
+            assert stats.statements == 2
+            assert result["next_set"]["id"] == set_ids[i + 1]
+            assert result["next_set"]["plan_exercise_name"] == f"Упражнение {(i + 1) // 2 % 2 + 1}"
+            assert result["session_status"] == SessionStatus.IN_PROGRESS.value
+
+        session_status, revision, days, exercises = _statuses(session_id)
+        assert revision == i + 1
+        assert exercises == [
+            SessionStatus.COMPLETED if (e + 1) * 2 <= i + 1 else SessionStatus.PENDING for e in range(4)
+        ]
+        assert days == [SessionStatus.COMPLETED if (d + 1) * 4 <= i + 1 else SessionStatus.PENDING for d in range(2)]
+        assert session_status == (SessionStatus.COMPLETED if last else SessionStatus.IN_PROGRESS)
+
+
+def test_skipped_sets_complete_exercise_without_records(client):
+    session_id, set_ids = _seed_session()
+    headers = telegram_headers(TELEGRAM_ID)
+
+    for set_id in set_ids[:2]:
+        result = response_data(client.post(f"/sessions/sets/{set_id}/skip", headers=headers))
+        assert result["status"] == SessionStatus.SKIPPED.value
+        assert result["new_personal_record"] is False
+    assert result["next_set"]["id"] == set_ids[2]
+    _, _, days, exercises = _statuses(session_id)
+    assert exercises[:2] == [SessionStatus.COMPLETED, SessionStatus.PENDING]
+    assert days == [SessionStatus.PENDING, SessionStatus.PENDING]
+
+    response = client.post(f"/sessions/sets/{set_ids[0]}/skip", headers=headers)
+    assert response.status_code == 400
+    _, revision, _, _ = _statuses(session_id)
+    assert revision == 2
@@ -0,0 +1,137 @@
+"""
+GET /statistics/me: кэш готовых ответов и семантика разделов статистики.
+"""
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+
+from app.crud import statistics as crud_statistics
+from app.models import SessionStatus
+from app.query_stats import query_budget
+from tests.factories import create_session, create_user, telegram_headers
+from tests.helpers import response_data, run_db
+
+pytestmark = pytest.mark.db
+
+TELEGRAM_ID = 3001
+
+
+def _seed():
+    async def seed(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        now = datetime.now(timezone.utc)
+        await create_session(
+            db, user_id, status=SessionStatus.COMPLETED,
+            started_at=now - timedelta(days=2, hours=1), completed_at=now - timedelta(days=2),
+            reps_done=10, weight_lifted=50,
+        )
+        active = await create_session(db, user_id, exercises=1, sets=1)
+        await crud_statistics.rebuild_rollups(db, [user_id])
+        return active.session_days[0].session_exercises[0].session_sets[0].id
+
+    return run_db(seed)
+
+
+@pytest.mark.parametrize("period", crud_statistics.STATISTICS_PERIODS)
+def test_cache_hit_does_not_touch_db_and_write_invalidates(client, period):
+    set_id = _seed()
+    headers = telegram_headers(TELEGRAM_ID)
+    params = {"period": period}
+
+    first = client.get("/statistics/me", params=params, headers=headers)
+    assert response_data(first)["summary"]["total_workouts"] == 1
+
+    with query_budget(0):
+        second = client.get("/statistics/me", params=params, headers=headers)
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+    # Последний подход завершает сессию: после коммита кэш пользователя сброшен
+    response_data(client.post(
+        f"/sessions/sets/{set_id}/complete", json={"reps_done": 5, "weight_lifted": 100}, headers=headers,
+    ))
+    third = client.get("/statistics/me", params=params, headers=headers)
+    assert response_data(third)["summary"]["total_workouts"] == 2
+    assert third.headers["ETag"] != first.headers["ETag"]
+
+
+@pytest.mark.parametrize("period", crud_statistics.STATISTICS_PERIODS)
+def test_personal_record_tie_goes_to_latest_set(clean_db, period):
+    now = datetime.now(timezone.utc)
+
+    async def run(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        values = {"status": SessionStatus.COMPLETED, "exercises": 1, "sets": 1, "reps_done": 10, "weight_lifted": 50}
+        await create_session(db, user_id, started_at=now - timedelta(days=5), completed_at=now - timedelta(days=5), **values)
+        await crud_statistics.rebuild_rollups(db, [user_id])
+        # Равный подход в более поздней сессии, добавленной так же, как при ее завершении
+        latest = await create_session(
+            db, user_id, started_at=now - timedelta(days=2), completed_at=now - timedelta(days=2), **values
+        )
+        await crud_statistics.add_sessions_to_rollups(db, [latest.id])
+        await db.commit()
+        incremental = await crud_statistics.get_user_statistics(db, user_id, period)
+        await crud_statistics.rebuild_rollups(db, [user_id])
+        rebuilt = await crud_statistics.get_user_statistics(db, user_id, period)
+        return latest.started_at, incremental, rebuilt
+
+    started_at, incremental, rebuilt = run_db(run)
+    for statistics in (incremental, rebuilt):
+        [record] = statistics.summary.personal_records
+        assert (record.max_weight_kg, record.reps) == (50, 10)
+        assert datetime.fromisoformat(record.date) == started_at
+
+
+def test_rollups_key_sessions_by_start_day(clean_db):
+    today = datetime.combine(datetime.now(timezone.utc).date(), time.min, tzinfo=timezone.utc)
+
+    async def run(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        values = {"status": SessionStatus.COMPLETED, "exercises": 1, "sets": 2, "reps_done": 10, "weight_lifted": 50}
+        # Через полночь UTC (БД тестов в UTC): день сессии — день начала
+        await create_session(
+            db, user_id, started_at=today - timedelta(days=3, hours=-22),
+            completed_at=today - timedelta(days=2, hours=-2), **values
+        )
+        # Завершенная сессия без completed_at учитывается
+        await create_session(db, user_id, started_at=today - timedelta(days=5, hours=-10), **values)
+        # Сессия без выполненных подходов не учитывается
+        await create_session(
+            db, user_id, started_at=today - timedelta(days=4, hours=-10),
+            completed_at=today - timedelta(days=4, hours=-11), set_status=SessionStatus.SKIPPED, **values
+        )
+        await crud_statistics.rebuild_rollups(db, [user_id])
+        return await crud_statistics.get_user_statistics(db, user_id, "all_time")
+
+    statistics = run_db(run)
+    assert statistics.summary.total_workouts == 2
+    # Длительность — по одной на сессию, а не на каждый подход
+    assert statistics.summary.total_duration_minutes == 120
+    assert statistics.summary.total_sets == 4
+    assert [(point["date"], point["value_kg"]) for point in statistics.progress_charts["overall_volume"]] == [
+        ((today - timedelta(days=5)).date().isoformat(), 1000),
+        ((today - timedelta(days=3)).date().isoformat(), 1000),
+    ]
+
+
+@pytest.mark.parametrize("period, days", [("last_week", 7), ("last_month", 30)])
+def test_period_starts_at_midnight_of_its_first_day(clean_db, period, days):
+    first_day = datetime.combine(
+        (datetime.now(timezone.utc) - timedelta(days=days)).date(), time.min, tzinfo=timezone.utc
+    )
+
+    async def run(db):
+        user_id = await create_user(db, TELEGRAM_ID)
+        for started_at, weight_lifted in ((first_day, 50), (first_day - timedelta(minutes=1), 100)):
+            await create_session(
+                db, user_id, status=SessionStatus.COMPLETED, started_at=started_at, completed_at=started_at,
+                exercises=1, sets=1, reps_done=10, weight_lifted=weight_lifted,
+            )
+        await crud_statistics.rebuild_rollups(db, [user_id])
+        return await crud_statistics.get_user_statistics(db, user_id, period)
+
+    statistics = run_db(run)
+    # Все разделы видят одну и ту же границу: первый день целиком, предыдущий — нет
+    assert statistics.summary.total_workouts == 1
+    assert [record.max_weight_kg for record in statistics.summary.personal_records] == [50]
+    assert [point["date"] for point in statistics.progress_charts["overall_volume"]] == [first_day.date().isoformat()]
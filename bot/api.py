@@ -3,11 +3,14 @@ import asyncio
 from dotenv import load_dotenv
 import os
 from typing import Optional, Any, Dict
-from config import API_BASE_URL  
+from cache import TTLCache
+from config import API_BASE_URL, ETAG_CACHE_SIZE, ETAG_CACHE_TTL, READ_AFTER_TTL
 
 load_dotenv()
 
 
+READ_AFTER_HEADER = "X-Read-After-LSN"
+
 USE_FAKE_BACKEND = False  # локальный режим (можно включить для теста без бэкенда)
 
 
@@ -40,6 +43,11 @@ class BackendAPI:
         self._token: Optional[str] = None
         self._token_lock = asyncio.Lock()
         self._session: Optional[aiohttp.ClientSession] = None
+        # (telegram_id, path) -> (ETag, последний ответ) для условных GET-запросов
+        self._etag_cache = TTLCache(maxsize=ETAG_CACHE_SIZE, ttl=ETAG_CACHE_TTL)
+        # telegram_id -> LSN последней записи (X-Read-After-LSN): повторяется в следующих
+        # запросах, чтобы чтение с реплики видело собственные изменения на любом воркере API
+        self._read_after = TTLCache(maxsize=ETAG_CACHE_SIZE, ttl=READ_AFTER_TTL)
 
     async def _session_obj(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
@@ -80,8 +88,41 @@ class BackendAPI:
         headers = {}
         if telegram_id:
             headers["X-Telegram-User-ID"] = str(telegram_id)
+            read_after = self._read_after.get(telegram_id)
+            if read_after:
+                headers[READ_AFTER_HEADER] = read_after
         return headers
 
+    def remember_write(self, resp: aiohttp.ClientResponse, telegram_id: Optional[int] = None) -> None:
+        """
+        Запоминает LSN из ответа на запись (заголовок X-Read-After-LSN).
+        """
+        lsn = resp.headers.get(READ_AFTER_HEADER)
+        if telegram_id and lsn:
+            self._read_after.set(telegram_id, lsn)
+
+    async def _get_json_conditional(self, path: str, telegram_id: Optional[int] = None):
+        """
+        GET с If-None-Match: при ответе 304 возвращает закэшированный ранее ответ.
+        """
+        s = await self._session_obj()
+        headers = await self._headers(telegram_id=telegram_id)
+        cache_key = (telegram_id, path)
+        cached = self._etag_cache.get(cache_key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        async with s.get(f"{API_BASE_URL}{path}", headers=headers) as resp:
+            if resp.status == 304 and cached:
+                return cached[1]
+            result = await resp.json()
+            etag = resp.headers.get("ETag")
+            if resp.status == 200 and etag:
+                self._etag_cache.set(cache_key, (etag, result))
+            else:
+                self._etag_cache.invalidate(cache_key)
+            return result
+
     # Убрал старый update_profile — теперь используем прямой PATCH в fsm_onboarding.py
 
     async def get_workout_plan(self, telegram_id: Optional[int] = None):
@@ -89,11 +130,8 @@ class BackendAPI:
             await asyncio.sleep(0.1)
             return _fake_plan
 
-        s = await self._session_obj()
-        headers = await self._headers(telegram_id=telegram_id)
-        async with s.get(f"{API_BASE_URL}/workouts/", headers=headers) as resp:
-            result = await resp.json()
-            return result.get("data") if isinstance(result, dict) else None
+        result = await self._get_json_conditional("/workouts/", telegram_id=telegram_id)
+        return result.get("data") if isinstance(result, dict) else None
 
     async def generate_plan(self, telegram_id: Optional[int] = None):
         if USE_FAKE_BACKEND:
@@ -103,6 +141,7 @@ class BackendAPI:
         s = await self._session_obj()
         headers = await self._headers(telegram_id=telegram_id)
         async with s.post(f"{API_BASE_URL}/workouts/generate", headers=headers) as resp:
+            self.remember_write(resp, telegram_id)
             result = await resp.json()
             return result.get("data") if isinstance(result, dict) else None
 
@@ -119,6 +158,7 @@ class BackendAPI:
         headers = await self._headers(telegram_id=telegram_id)
         payload = {"workout_plan_id": workout_plan_id, "day_index": day_index}
         async with s.post(f"{API_BASE_URL}/sessions/start", headers=headers, json=payload) as resp:
+            self.remember_write(resp, telegram_id)
             return await resp.json()
 
     async def get_active_session(self, telegram_id: Optional[int] = None):
@@ -126,10 +166,7 @@ class BackendAPI:
             await asyncio.sleep(0.1)
             return _fake_active_session
 
-        s = await self._session_obj()
-        headers = await self._headers(telegram_id=telegram_id)
-        async with s.get(f"{API_BASE_URL}/sessions/active", headers=headers) as resp:
-            return await resp.json()
+        return await self._get_json_conditional("/sessions/active", telegram_id=telegram_id)
 
     async def complete_set(self, set_id: int, reps_done: int, weight_lifted: float = 0.0, telegram_id: Optional[int] = None):
         if USE_FAKE_BACKEND:
@@ -142,6 +179,7 @@ class BackendAPI:
             headers=headers,
             json={"reps_done": reps_done, "weight_lifted": weight_lifted}
         ) as resp:
+            self.remember_write(resp, telegram_id)
             return await resp.json()
 
     async def skip_set(self, set_id: int, telegram_id: Optional[int] = None):
@@ -151,6 +189,7 @@ class BackendAPI:
         s = await self._session_obj()
         headers = await self._headers(telegram_id=telegram_id)
         async with s.post(f"{API_BASE_URL}/sessions/sets/{set_id}/skip", headers=headers) as resp:
+            self.remember_write(resp, telegram_id)
             return await resp.json()
 
 
@@ -14,4 +14,11 @@ WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
 
 # URLs
 API_BASE_URL = os.getenv("API_BASE_URL", "http://backend:8000")
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
\ No newline at end of file
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+# Кэш ETag для условных GET-запросов к API: не больше ETAG_CACHE_SIZE записей (LRU),
+# каждая живет ETAG_CACHE_TTL секунд
+ETAG_CACHE_SIZE = int(os.getenv("ETAG_CACHE_SIZE", "5000"))
+ETAG_CACHE_TTL = float(os.getenv("ETAG_CACHE_TTL", "3600"))
+
+# Сколько секунд повторять LSN последней записи пользователя (X-Read-After-LSN) в запросах к API
+READ_AFTER_TTL = float(os.getenv("READ_AFTER_TTL", "60"))
@@ -128,6 +128,7 @@ async def session_duration(message: Message, state: FSMContext):
         s = await backend._session_obj()
         headers = await backend._headers(telegram_id=message.from_user.id)
         async with s.patch(f"{API_BASE_URL}/users/me", json=profile, headers=headers) as resp:
+            backend.remember_write(resp, message.from_user.id)
             result = await resp.json()
 
         if resp.status >= 400:
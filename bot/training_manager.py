@@ -296,6 +296,30 @@ def find_pending_set(session: Dict[str, Any]):
 
     return None, None
 
+async def resolve_next_set(result: Any, user_id: int):
+    """
+    Возвращает (следующий сет, название упражнения) после отметки сета.
+    Backend присылает следующий сет в ответе (поле next_set), поэтому повторно
+    запрашивать активную сессию нужно только если поля нет (ошибка или фейковый backend).
+    """
+    data = result.get("data") if isinstance(result, dict) else None
+    if isinstance(data, dict) and "next_set" in data:
+        next_set = data["next_set"]
+        if not next_set:
+            return None, None
+        return next_set, next_set.get("plan_exercise_name") or "Упражнение"
+
+    session_resp = await backend.get_active_session(telegram_id=user_id)
+    session = session_resp.get("data") if isinstance(session_resp, dict) else None
+    if not session or (not session.get("session_days") and not session.get("exercises")):
+        return None, None
+
+    active_sessions[user_id] = session
+    next_set, next_ex = find_pending_set(session)
+    if not next_set:
+        return None, None
+    return next_set, next_ex.get("plan_exercise_name") or next_ex.get("name") or "Упражнение"
+
 # ----------------------------
 # Завершение сета
 # ----------------------------
@@ -338,36 +362,20 @@ async def process_weight(message: Message, state: FSMContext):
     user_id = message.from_user.id
 
     try:
-        await backend.complete_set(set_id, reps_done=reps_done, weight_lifted=weight_lifted, telegram_id=user_id)
+        result = await backend.complete_set(set_id, reps_done=reps_done, weight_lifted=weight_lifted, telegram_id=user_id)
     except Exception as e:
         await message.answer(f"Ошибка: {e}")
         return await state.clear()
 
     await state.clear()
 
-    session_resp = await backend.get_active_session(telegram_id=user_id)
-    session = session_resp.get("data") if isinstance(session_resp, dict) else None
-
-    if not session or (not session.get("session_days") and not session.get("exercises")):
-        active_sessions.pop(user_id, None)
-        await message.answer(f"🎉 Тренировка завершена! {random.choice(MOTIVATION)}")
-        await message.answer("Выберите день для следующей тренировки:", reply_markup=make_weekday_kb())
-        return
-
-    active_sessions[user_id] = session
-
-    next_set, next_ex = find_pending_set(session)
+    next_set, exercise_name = await resolve_next_set(result, user_id)
     if not next_set:
         active_sessions.pop(user_id, None)
         await message.answer(f"🎉 Тренировка завершена! {random.choice(MOTIVATION)}")
         await message.answer("Выберите день для следующей тренировки:", reply_markup=make_weekday_kb())
         return
 
-    day_title = "Тренировка"
-    if "session_days" in session and session["session_days"]:
-        day_title = session["session_days"][0].get("title", day_title)
-
-    exercise_name = next_ex.get("plan_exercise_name") or next_ex.get("name") or "Упражнение"
     reps_text = format_set_text(next_set)
 
     text = (
@@ -393,23 +401,11 @@ async def cb_skip_set(callback: types.CallbackQuery):
         return await callback.message.answer("Неверный сет.")
 
     try:
-        await backend.skip_set(set_id, telegram_id=user_id)
+        result = await backend.skip_set(set_id, telegram_id=user_id)
     except Exception as e:
         return await callback.message.answer(f"Ошибка: {e}")
 
-    session_resp = await backend.get_active_session(telegram_id=user_id)
-    session = session_resp.get("data") if isinstance(session_resp, dict) else None
-
-    if not session or (not session.get("session_days") and not session.get("exercises")):
-        active_sessions.pop(user_id, None)
-        await callback.message.edit_reply_markup(reply_markup=None)
-        await callback.message.answer(f"🎉 Тренировка завершена! {random.choice(MOTIVATION)}")
-        await callback.message.answer("Выберите день для следующей тренировки:", reply_markup=make_weekday_kb())
-        return
-
-    active_sessions[user_id] = session
-
-    next_set, next_ex = find_pending_set(session)
+    next_set, exercise_name = await resolve_next_set(result, user_id)
     if not next_set:
         active_sessions.pop(user_id, None)
         await callback.message.edit_reply_markup(reply_markup=None)
@@ -417,7 +413,6 @@ async def cb_skip_set(callback: types.CallbackQuery):
         await callback.message.answer("Выберите день для следующей тренировки:", reply_markup=make_weekday_kb())
         return
 
-    exercise_name = next_ex.get("plan_exercise_name") or next_ex.get("name") or "Упражнение"
     reps_text = format_set_text(next_set)
 
     text = (
@@ -8,6 +8,24 @@ function getAccessToken(): string | null {
   }
 }
 
+// LSN последней записи (X-Read-After-LSN): повторяется в следующих запросах,
+// чтобы чтение с реплики БД видело собственные изменения на любом воркере API
+const READ_AFTER_HEADER = 'X-Read-After-LSN';
+let readAfterLsn: string | null = null;
+
+async function apiFetch(url: string, init: RequestInit = {}): Promise<Response> {
+  const headers = new Headers(init.headers);
+  if (readAfterLsn) {
+    headers.set(READ_AFTER_HEADER, readAfterLsn);
+  }
+  const response = await fetch(url, { ...init, headers });
+  const lsn = response.headers.get(READ_AFTER_HEADER);
+  if (lsn) {
+    readAfterLsn = lsn;
+  }
+  return response;
+}
+
 async function parseJson<T>(response: Response): Promise<T> {
   const payload = await response.json();
   if (payload && typeof payload === 'object' && 'data' in (payload as any)) {
@@ -172,7 +190,7 @@ export async function fetchCurrentUser(): Promise<UserProfile | null> {
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/users/me`, {
+  const response = await apiFetch(`${API_BASE_URL}/users/me`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -190,7 +208,7 @@ export async function login(username: string, password: string): Promise<AuthTok
   formData.append('username', username);
   formData.append('password', password);
 
-  const response = await fetch(`${API_BASE_URL}/auth/login`, {
+  const response = await apiFetch(`${API_BASE_URL}/auth/login`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/x-www-form-urlencoded',
@@ -206,7 +224,7 @@ export async function login(username: string, password: string): Promise<AuthTok
 }
 
 export async function registerUser(payload: UserCreatePayload): Promise<UserProfile> {
-  const response = await fetch(`${API_BASE_URL}/auth/register`, {
+  const response = await apiFetch(`${API_BASE_URL}/auth/register`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -229,7 +247,7 @@ export async function updateCurrentUserProfile(
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/users/me`, {
+  const response = await apiFetch(`${API_BASE_URL}/users/me`, {
     method: 'PATCH',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -246,7 +264,7 @@ export async function updateCurrentUserProfile(
 }
 
 export async function fetchRestrictionRules(): Promise<RestrictionRule[]> {
-  const response = await fetch(`${API_BASE_URL}/options/restriction-rules`);
+  const response = await apiFetch(`${API_BASE_URL}/options/restriction-rules`);
   if (!response.ok) {
     throw new Error('Failed to load restriction rules');
   }
@@ -254,7 +272,7 @@ export async function fetchRestrictionRules(): Promise<RestrictionRule[]> {
 }
 
 export async function fetchMuscleFocuses(): Promise<MuscleFocus[]> {
-  const response = await fetch(`${API_BASE_URL}/options/muscle-focuses`);
+  const response = await apiFetch(`${API_BASE_URL}/options/muscle-focuses`);
   if (!response.ok) {
     throw new Error('Failed to load muscle focuses');
   }
@@ -267,7 +285,7 @@ export async function fetchMyPreferences(): Promise<UserPreferencesResponse | nu
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/preferences/me`, {
+  const response = await apiFetch(`${API_BASE_URL}/preferences/me`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -286,7 +304,7 @@ export async function logoutUser(): Promise<void> {
     return;
   }
 
-  await fetch(`${API_BASE_URL}/auth/logout`, {
+  await apiFetch(`${API_BASE_URL}/auth/logout`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -303,7 +321,7 @@ export async function updateMyPreferences(params: {
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/preferences/me`, {
+  const response = await apiFetch(`${API_BASE_URL}/preferences/me`, {
     method: 'PUT',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -325,7 +343,7 @@ export async function fetchWorkoutPlan(): Promise<WorkoutPlan | null> {
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/workouts/`, {
+  const response = await apiFetch(`${API_BASE_URL}/workouts/`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -344,7 +362,7 @@ export async function generateWorkoutPlan(): Promise<WorkoutPlan> {
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/workouts/generate`, {
+  const response = await apiFetch(`${API_BASE_URL}/workouts/generate`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -364,7 +382,7 @@ export async function fetchActiveSession(): Promise<ActiveWorkoutSession | null>
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/sessions/active`, {
+  const response = await apiFetch(`${API_BASE_URL}/sessions/active`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -383,7 +401,7 @@ export async function startSession(planId: number, dayIndex: number): Promise<Ac
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/sessions/start`, {
+  const response = await apiFetch(`${API_BASE_URL}/sessions/start`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -405,7 +423,7 @@ export async function completeSet(setId: number, repsDone: number, weightLifted:
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/sessions/sets/${setId}/complete`, {
+  const response = await apiFetch(`${API_BASE_URL}/sessions/sets/${setId}/complete`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -427,7 +445,7 @@ export async function skipSet(setId: number): Promise<SessionSet> {
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/sessions/sets/${setId}/skip`, {
+  const response = await apiFetch(`${API_BASE_URL}/sessions/sets/${setId}/skip`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -447,7 +465,7 @@ export async function finishSession(sessionId: number): Promise<ActiveWorkoutSes
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/sessions/${sessionId}/finish`, {
+  const response = await apiFetch(`${API_BASE_URL}/sessions/${sessionId}/finish`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -467,7 +485,7 @@ export async function cancelSession(sessionId: number): Promise<void> {
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/sessions/${sessionId}/cancel`, {
+  const response = await apiFetch(`${API_BASE_URL}/sessions/${sessionId}/cancel`, {
     method: 'POST',
     headers: {
       Authorization: `Bearer ${token}`,
@@ -485,7 +503,7 @@ export async function fetchStatistics(period = 'all_time'): Promise<StatisticsRe
     return null;
   }
 
-  const response = await fetch(`${API_BASE_URL}/statistics/me?period=${encodeURIComponent(period)}`, {
+  const response = await apiFetch(`${API_BASE_URL}/statistics/me?period=${encodeURIComponent(period)}`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -509,7 +527,7 @@ export async function getTelegramLink(): Promise<TelegramLinkResponse> {
     throw new Error('Not authorized');
   }
 
-  const response = await fetch(`${API_BASE_URL}/auth/telegram-link`, {
+  const response = await apiFetch(`${API_BASE_URL}/auth/telegram-link`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },